@@ -0,0 +1,129 @@
+from fastapi import FastAPI, Depends
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from typing import List, Optional
+from uuid import uuid4
+import argparse
+import statistics
+import time
+
+from database import SessionLocal
+from dependencies import get_db
+from main import app
+from models.all import TrackedObject as TrackedObjectModel, CustomObjectType as CustomObjectTypeModel, DataSource
+from schemas.all import TrackedObjectWithTypeInfo
+
+BENCHMARK_SOURCE_NAME = "benchmark_objects"
+BENCHMARK_TYPES = ["vessel", "aircraft", "vehicle", "buoy"]
+
+# GET /objects/ as it was before the orjson path: ORM rows validated through
+# response_model and encoded with the stdlib JSONResponse
+baseline = FastAPI(default_response_class=JSONResponse)
+
+@baseline.get("/objects/", response_model=List[TrackedObjectWithTypeInfo])
+def get_objects_baseline(
+    skip: int = 0,
+    limit: int = 100,
+    type: Optional[str] = None,
+    source_id: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    query = db.query(TrackedObjectModel)
+    if type is not None:
+        query = query.filter(TrackedObjectModel.type == type)
+    if source_id:
+        query = query.filter(TrackedObjectModel.source_id == source_id)
+    objects = query.offset(skip).limit(limit).all()
+
+    custom_types = db.query(CustomObjectTypeModel).filter(
+        CustomObjectTypeModel.name.in_([obj.type for obj in objects]),
+        CustomObjectTypeModel.is_active == True
+    ).all()
+    type_lookup = {t.name: t for t in custom_types}
+    for obj in objects:
+        obj.custom_type = type_lookup.get(obj.type)
+    return objects
+
+def seed(db, count: int) -> str:
+    """
+    Create the benchmark data source and its objects, returns the source ID.
+    Objects already seeded by an earlier run are kept.
+    """
+    source = db.query(DataSource).filter(DataSource.name == BENCHMARK_SOURCE_NAME).first()
+    if source is None:
+        source = DataSource(
+            id=str(uuid4()),
+            name=BENCHMARK_SOURCE_NAME,
+            description="Objects seeded by benchmark_objects.py",
+            type="benchmark",
+            connection_info={},
+            is_active=False
+        )
+        db.add(source)
+        db.commit()
+
+    for start in range(0, count, 1000):
+        db.execute(insert(TrackedObjectModel).values([
+            {
+                "id": str(uuid4()),
+                "object_id": f"bench-{i}",
+                "name": f"Benchmark object {i}",
+                "type": BENCHMARK_TYPES[i % len(BENCHMARK_TYPES)],
+                "additional_info": {"name": f"Benchmark object {i}", "ref": str(i), "benchmark": "yes"},
+                "source_id": source.id,
+            }
+            for i in range(start, min(start + 1000, count))
+        ]).on_conflict_do_nothing(index_elements=[TrackedObjectModel.object_id, TrackedObjectModel.type]))
+    db.commit()
+    return source.id
+
+def cleanup(db, source_id: str):
+    db.query(TrackedObjectModel).filter(TrackedObjectModel.source_id == source_id).delete(synchronize_session=False)
+    db.query(DataSource).filter(DataSource.id == source_id).delete(synchronize_session=False)
+    db.commit()
+
+def measure(client: TestClient, params: dict, runs: int) -> List[float]:
+    # One untimed request warms the connection pool and the route
+    client.get("/objects/", params=params).raise_for_status()
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = client.get("/objects/", params=params)
+        timings.append(time.perf_counter() - start)
+        response.raise_for_status()
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Time GET /objects/ against the response_model/stdlib json path it replaced")
+    parser.add_argument("--objects", type=int, default=10000, help="Objects seeded and requested")
+    parser.add_argument("--runs", type=int, default=20, help="Timed requests per variant")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded objects afterwards")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        source_id = seed(db, args.objects)
+        params = {"source_id": source_id, "limit": args.objects}
+        # Without the context manager the startup hooks (scheduler, connectors) do not run
+        results = {
+            "before": measure(TestClient(baseline), params, args.runs),
+            "after": measure(TestClient(app), params, args.runs),
+        }
+        if not args.keep:
+            cleanup(db, source_id)
+    finally:
+        db.close()
+
+    for name, timings in results.items():
+        timings.sort()
+        print(
+            f"{name:>6}: median {statistics.median(timings) * 1000:.1f} ms, "
+            f"p95 {timings[int(len(timings) * 0.95) - 1] * 1000:.1f} ms, "
+            f"min {timings[0] * 1000:.1f} ms ({args.objects} objects, {args.runs} runs)"
+        )
+    print(f"speedup: {statistics.median(results['before']) / statistics.median(results['after']):.2f}x (median)")
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,9 @@ class Settings(BaseSettings):
     # Debug settings
     DEBUG: bool = os.getenv("DEBUG", "False").lower() in ("true", "1", "t")
     
+    # Worker processes started by main.py, also read by "uvicorn --workers" when not given
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+    
     # CORS settings
     ALLOWED_HOSTS: List[str] = os.getenv("ALLOWED_HOSTS", "localhost,127.0.0.1").split(",")
     
@@ -24,6 +27,108 @@ class Settings(BaseSettings):
     # Media settings
     MEDIA_DIR: str = "media"
     
+    # HTTP caching settings
+    HTTP_CACHE_REVALIDATE_SECONDS: float = float(os.getenv("HTTP_CACHE_REVALIDATE_SECONDS", "5"))
+    
+    # Responses smaller than this many bytes are sent uncompressed
+    COMPRESSION_MINIMUM_SIZE: int = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+    
+    # Vector tile settings
+    TILE_CACHE_SIZE: int = int(os.getenv("TILE_CACHE_SIZE", "512"))
+    TILE_CACHE_TTL_SECONDS: float = float(os.getenv("TILE_CACHE_TTL_SECONDS", "30"))
+    TILE_CLUSTER_MAX_ZOOM: int = int(os.getenv("TILE_CLUSTER_MAX_ZOOM", "12"))  # Objects are clustered below this zoom
+    TILE_CLUSTER_CELL_PX: int = int(os.getenv("TILE_CLUSTER_CELL_PX", "64"))  # Cluster cell size in screen pixels
+    
+    # Cluster endpoint settings
+    CLUSTER_CELLS_PER_TILE: int = int(os.getenv("CLUSTER_CELLS_PER_TILE", "4"))  # Grid cells across one map tile
+    CLUSTER_RESYNC_SECONDS: float = float(os.getenv("CLUSTER_RESYNC_SECONDS", "300"))
+    
+    # Ingest settings
+    INGEST_DEDUP_CACHE_SIZE: int = int(os.getenv("INGEST_DEDUP_CACHE_SIZE", "100000"))  # Recent reading keys kept in memory
+    UPSERT_CHUNK_ROWS: int = int(os.getenv("UPSERT_CHUNK_ROWS", "5000"))  # Rows per multi-row INSERT, keeps statements below PostgreSQL's 65535 parameters
+    DWELL_SPEED_METERS_PER_SECOND: float = float(os.getenv("DWELL_SPEED_METERS_PER_SECOND", "0.5"))  # Slower steps count as dwelling
+    SENSOR_CACHE_SECONDS: float = float(os.getenv("SENSOR_CACHE_SECONDS", "60"))  # Sensors held in memory for ingest
+    
+    # Geofence settings
+    GEOFENCE_GRID_CELL_DEGREES: float = float(os.getenv("GEOFENCE_GRID_CELL_DEGREES", "0.1"))
+    GEOFENCE_MAX_CELLS_PER_FENCE: int = int(os.getenv("GEOFENCE_MAX_CELLS_PER_FENCE", "10000"))  # Larger fences are only bbox-checked
+    GEOFENCE_RESYNC_SECONDS: float = float(os.getenv("GEOFENCE_RESYNC_SECONDS", "300"))
+    
+    # Proximity detection settings
+    PROXIMITY_THRESHOLD_METERS: float = float(os.getenv("PROXIMITY_THRESHOLD_METERS", "500"))  # Alert when the closest approach is within this distance
+    PROXIMITY_HORIZON_SECONDS: float = float(os.getenv("PROXIMITY_HORIZON_SECONDS", "300"))  # How far ahead the closest approach is predicted
+    PROXIMITY_CELL_METERS: float = float(os.getenv("PROXIMITY_CELL_METERS", "5000"))  # Spatial hash cell size, also the look-ahead range
+    PROXIMITY_STALE_SECONDS: float = float(os.getenv("PROXIMITY_STALE_SECONDS", "120"))
+    PROXIMITY_ALERT_COOLDOWN_SECONDS: float = float(os.getenv("PROXIMITY_ALERT_COOLDOWN_SECONDS", "60"))  # Per pair of objects
+    PROXIMITY_INTERVAL_SECONDS: float = float(os.getenv("PROXIMITY_INTERVAL_SECONDS", "1"))
+    PROXIMITY_OBJECT_TYPES: str = os.getenv("PROXIMITY_OBJECT_TYPES", "")  # Comma separated, empty for all types
+    PROXIMITY_SPEED_SCALE: float = float(os.getenv("PROXIMITY_SPEED_SCALE", "1"))  # Converts additional_data speed to m/s (0.514444 for knots)
+    
+    # Track estimation settings
+    KALMAN_MEASUREMENT_SIGMA_METERS: float = float(os.getenv("KALMAN_MEASUREMENT_SIGMA_METERS", "15"))  # Default position error of a reading
+    KALMAN_ACCELERATION_SIGMA: float = float(os.getenv("KALMAN_ACCELERATION_SIGMA", "1"))  # Unmodelled acceleration, m/s^2
+    KALMAN_OUTLIER_CHI2: float = float(os.getenv("KALMAN_OUTLIER_CHI2", "13.8"))  # Gate on the innovation, 99.9% for 2 degrees of freedom
+    KALMAN_MAX_OUTLIERS: int = int(os.getenv("KALMAN_MAX_OUTLIERS", "3"))  # Consecutive outliers before a track restarts
+    KALMAN_BOOTSTRAP_READINGS: int = int(os.getenv("KALMAN_BOOTSTRAP_READINGS", "20"))  # Latest readings a predicted track is built from
+    KALMAN_MAX_TRACKS: int = int(os.getenv("KALMAN_MAX_TRACKS", "100000"))  # Ingest tracks per worker, least recently updated are reused
+    FUSION_OBJECT_TYPES: str = os.getenv("FUSION_OBJECT_TYPES", "")  # Comma separated types checked against tracks, empty for all
+    
+    # Stored position plausibility settings
+    FUSION_MAX_SPEED_METERS_PER_SECOND: float = float(os.getenv("FUSION_MAX_SPEED_METERS_PER_SECOND", "350"))  # Faster implied moves are not stored
+    FUSION_POSITION_TOLERANCE_METERS: float = float(os.getenv("FUSION_POSITION_TOLERANCE_METERS", "100"))  # Allowed on top, for position noise
+    FUSION_RESET_SECONDS: float = float(os.getenv("FUSION_RESET_SECONDS", "600"))  # After this long any reading is stored again
+    
+    # Rollup settings
+    ROLLUP_INTERVAL_SECONDS: float = float(os.getenv("ROLLUP_INTERVAL_SECONDS", "60"))
+    ROLLUP_LAG_SECONDS: float = float(os.getenv("ROLLUP_LAG_SECONDS", "30"))  # Newer readings wait for the next refresh
+    
+    # Snapshot and replay settings
+    CHECKPOINT_INTERVAL_SECONDS: float = float(os.getenv("CHECKPOINT_INTERVAL_SECONDS", "3600"))  # Bounds the deltas read per snapshot
+    CHECKPOINT_RETENTION_DAYS: int = int(os.getenv("CHECKPOINT_RETENTION_DAYS", "30"))
+    REPLAY_PAGE_SIZE: int = int(os.getenv("REPLAY_PAGE_SIZE", "1000"))
+    REPLAY_MAX_SPEED: float = float(os.getenv("REPLAY_MAX_SPEED", "1000"))
+    
+    # Sensor and source health settings
+    HEALTH_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("HEALTH_FLUSH_INTERVAL_SECONDS", "10"))
+    HEALTH_RATE_WINDOW_SECONDS: float = float(os.getenv("HEALTH_RATE_WINDOW_SECONDS", "60"))
+    HEALTH_STALE_SECONDS: float = float(os.getenv("HEALTH_STALE_SECONDS", "300"))  # Silence before a sensor or source is reported stale
+    
+    # Data source connector settings
+    CONNECTORS_ENABLED: bool = os.getenv("CONNECTORS_ENABLED", "True").lower() in ("true", "1", "t")
+    CONNECTOR_SYNC_SECONDS: float = float(os.getenv("CONNECTOR_SYNC_SECONDS", "30"))  # Picks up sources changed on other workers
+    CONNECTOR_MAX_CONCURRENCY: int = int(os.getenv("CONNECTOR_MAX_CONCURRENCY", "2"))  # Batches in flight per source, overridable in connection_info
+    CONNECTOR_BATCH_SIZE: int = int(os.getenv("CONNECTOR_BATCH_SIZE", "500"))
+    CONNECTOR_FLUSH_SECONDS: float = float(os.getenv("CONNECTOR_FLUSH_SECONDS", "1"))  # Longest wait to fill a batch
+    CONNECTOR_QUEUE_SIZE: int = int(os.getenv("CONNECTOR_QUEUE_SIZE", "10000"))
+    CONNECTOR_BACKOFF_INITIAL_SECONDS: float = float(os.getenv("CONNECTOR_BACKOFF_INITIAL_SECONDS", "1"))
+    CONNECTOR_BACKOFF_MAX_SECONDS: float = float(os.getenv("CONNECTOR_BACKOFF_MAX_SECONDS", "60"))
+    # Hosts rest and websocket sources may be pulled from, "*" for any; none allowed when empty
+    CONNECTOR_ALLOWED_HOSTS: List[str] = [host.strip().lower() for host in os.getenv("CONNECTOR_ALLOWED_HOSTS", "").split(",") if host.strip()]
+    CONNECTOR_FILE_ROOT: str = os.getenv("CONNECTOR_FILE_ROOT", "")  # Directory file-tail sources are confined to, disabled when empty
+    
+    # Rate limit and admission settings
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))  # Buckets and stats kept per worker, least recently used go first
+    RATE_LIMIT_DEFAULT_PER_SECOND: float = float(os.getenv("RATE_LIMIT_DEFAULT_PER_SECOND", "0"))  # For sources without a limit, 0 for none
+    RATE_LIMIT_UNKNOWN_PER_SECOND: float = float(os.getenv("RATE_LIMIT_UNKNOWN_PER_SECOND", "20"))  # Shared by readings naming no known source
+    RATE_LIMIT_SENSOR_PER_SECOND: float = float(os.getenv("RATE_LIMIT_SENSOR_PER_SECOND", "0"))  # For sensors of sources without a limit, 0 for none
+    RATE_LIMIT_CACHE_SECONDS: float = float(os.getenv("RATE_LIMIT_CACHE_SECONDS", "60"))
+    INGEST_MAX_IN_FLIGHT: int = int(os.getenv("INGEST_MAX_IN_FLIGHT", "8"))  # Readings processed at once per worker, keep below the DB pool size
+    INGEST_CRITICAL_RESERVED: int = int(os.getenv("INGEST_CRITICAL_RESERVED", "2"))  # Of those, slots only critical sources may use
+    INGEST_BUSY_RETRY_SECONDS: float = float(os.getenv("INGEST_BUSY_RETRY_SECONDS", "1"))
+    
+    # WebSocket connection settings
+    WS_MAX_CONNECTIONS: int = int(os.getenv("WS_MAX_CONNECTIONS", "10000"))  # Per worker, further clients are closed with 1013
+    WS_SEND_QUEUE_SIZE: int = int(os.getenv("WS_SEND_QUEUE_SIZE", "1000"))  # Messages waiting per connection
+    WS_MAX_QUEUED_BYTES: int = int(os.getenv("WS_MAX_QUEUED_BYTES", "1048576"))  # Per connection, slower clients are closed
+    WS_PING_INTERVAL_SECONDS: float = float(os.getenv("WS_PING_INTERVAL_SECONDS", "20"))  # Protocol-level pings sent by uvicorn
+    WS_PING_TIMEOUT_SECONDS: float = float(os.getenv("WS_PING_TIMEOUT_SECONDS", "20"))  # Clients not answering a ping in time are closed
+    
+    # Validation log settings
+    LOG_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("LOG_FLUSH_INTERVAL_SECONDS", "5"))
+    LOG_RETENTION_DAYS: int = int(os.getenv("LOG_RETENTION_DAYS", "30"))
+    LOG_RETENTION_INTERVAL_SECONDS: float = float(os.getenv("LOG_RETENTION_INTERVAL_SECONDS", "3600"))
+    LOG_ARCHIVE_DIR: str = os.getenv("LOG_ARCHIVE_DIR", "archive/logs")
+    
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,45 @@
+from typing import Any, Dict, List, Sequence
+from datetime import datetime
+import calendar
+
+# Coordinates are sent as integers in units of 1e-5 degrees (about 1.1 m)
+COORDINATE_SCALE = 100000
+
+QUANTIZED_FIELDS = ("latitude", "longitude")
+
+def _epoch_seconds(value: datetime) -> int:
+    return calendar.timegm(value.utctimetuple())
+
+def encode_positions(fields: List[str], rows: Sequence[Sequence[Any]]) -> Dict[str, Any]:
+    """
+    Encode position rows column by column for compact transfer.
+    Coordinates are quantized to integers and timestamps become integer epoch
+    seconds, delta-encoded against the previous row after sorting by time.
+    Clients rebuild a row as value / scale for coordinates and a running sum
+    for timestamps.
+    """
+    if "timestamp" in fields:
+        ts_index = fields.index("timestamp")
+        rows = sorted(rows, key=lambda row: row[ts_index] or datetime.min)
+
+    columns: Dict[str, List[Any]] = {}
+    for i, field in enumerate(fields):
+        values = [row[i] for row in rows]
+        if field in QUANTIZED_FIELDS:
+            values = [round(v * COORDINATE_SCALE) if v is not None else None for v in values]
+        elif field == "timestamp":
+            deltas = []
+            previous = 0
+            for v in values:
+                current = _epoch_seconds(v) if v is not None else previous
+                deltas.append(current - previous)
+                previous = current
+            values = deltas
+        columns[field] = values
+
+    return {
+        "fields": fields,
+        "count": len(rows),
+        "scale": COORDINATE_SCALE,
+        "columns": columns,
+    }
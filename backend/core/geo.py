@@ -0,0 +1,59 @@
+from typing import Tuple
+import math
+
+# Mean earth radius used for distances
+EARTH_RADIUS_METERS = 6371008.8
+
+# Web Mercator cannot represent the poles
+MAX_MERCATOR_LATITUDE = 85.05112878
+
+def lonlat_to_tile_fraction(longitude: float, latitude: float, zoom: int) -> Tuple[float, float]:
+    """
+    Convert a WGS84 position to fractional tile coordinates at a zoom level
+    """
+    n = 1 << zoom
+    latitude = max(-MAX_MERCATOR_LATITUDE, min(MAX_MERCATOR_LATITUDE, latitude))
+    lat_rad = math.radians(latitude)
+    x = (longitude + 180.0) / 360.0 * n
+    y = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+    return x, y
+
+def lonlat_to_tile(longitude: float, latitude: float, zoom: int) -> Tuple[int, int]:
+    """
+    Get the x/y of the tile containing a position at a zoom level
+    """
+    n = 1 << zoom
+    x, y = lonlat_to_tile_fraction(longitude, latitude, zoom)
+    return min(int(x), n - 1), min(int(y), n - 1)
+
+def tile_bounds(zoom: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """
+    Get the (min_lon, min_lat, max_lon, max_lat) bounds of a tile
+    """
+    n = 1 << zoom
+    min_lon = x / n * 360.0 - 180.0
+    max_lon = (x + 1) / n * 360.0 - 180.0
+    max_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    min_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return min_lon, min_lat, max_lon, max_lat
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Great-circle distance in metres between two positions
+    """
+    dlat = math.radians(lat2 - lat1) / 2
+    dlon = math.radians(lon2 - lon1) / 2
+    a = math.sin(dlat) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(min(a, 1.0)))
+
+def bearing(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Initial bearing in degrees (0-360, clockwise from north) from one position to another
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dlon = math.radians(lon2 - lon1)
+    degrees = math.degrees(math.atan2(
+        math.sin(dlon) * math.cos(phi2),
+        math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(dlon)
+    ))
+    return degrees + 360.0 if degrees < 0 else degrees
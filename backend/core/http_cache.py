@@ -0,0 +1,126 @@
+from fastapi import Request, Response
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import Any, Callable, Dict, Optional, Tuple
+from datetime import timezone
+from email.utils import formatdate, parsedate_to_datetime
+from collections import defaultdict
+import hashlib
+import threading
+import time
+
+from config import settings
+from core.serialization import dumps
+
+def make_etag(body: bytes) -> str:
+    """
+    Build a strong ETag from a response body
+    """
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+def conditional_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    last_modified: Optional[float] = None,
+    cache_control: str = "no-cache",
+) -> Response:
+    """
+    Return 304 Not Modified if the client already has this representation,
+    otherwise the full JSON body with caching headers
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        if "*" in tags or etag in tags:
+            return Response(status_code=304, headers=headers)
+    elif last_modified is not None and request.headers.get("if-modified-since"):
+        try:
+            since = parsedate_to_datetime(request.headers["if-modified-since"]).timestamp()
+            if int(last_modified) <= since:
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+class ResponseCache:
+    """
+    Cache of serialized read responses keyed by table version.
+    Write endpoints bump a table's version through invalidate(). Writes made by
+    other workers are picked up by re-checking count(*) and max(updated_at) of the
+    table at most once every HTTP_CACHE_REVALIDATE_SECONDS.
+    Last-Modified is the table's max(updated_at), the same in every worker.
+    Deletes do not advance it, so the ETag remains the validator that catches them.
+    """
+    max_entries = 1024
+
+    def __init__(self, revalidate_seconds: float):
+        self.revalidate_seconds = revalidate_seconds
+        self._versions: Dict[str, int] = defaultdict(int)
+        self._fingerprints: Dict[str, Tuple[Any, Any]] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._entries: Dict[Tuple[str, str], Tuple[int, str, bytes, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self, table: str):
+        """
+        Mark all cached responses built from a table as stale
+        """
+        with self._lock:
+            self._versions[table] += 1
+            self._checked_at.pop(table, None)
+
+    def _current_version(self, db: Session, model) -> int:
+        table = model.__tablename__
+        now = time.monotonic()
+        if now - self._checked_at.get(table, float("-inf")) < self.revalidate_seconds:
+            return self._versions[table]
+
+        fingerprint = tuple(db.query(func.count(), func.max(model.updated_at)).one())
+        with self._lock:
+            previous = self._fingerprints.get(table)
+            if previous is not None and previous != fingerprint:
+                self._versions[table] += 1
+            self._fingerprints[table] = fingerprint
+            self._checked_at[table] = now
+            return self._versions[table]
+
+    def _last_modified(self, table: str) -> Optional[float]:
+        """
+        Time of the table's newest update as a Unix timestamp, from the last revalidation
+        """
+        fingerprint = self._fingerprints.get(table)
+        if fingerprint is None or fingerprint[1] is None:
+            return None
+        # updated_at holds naive UTC
+        return fingerprint[1].replace(tzinfo=timezone.utc).timestamp()
+
+    def respond(self, request: Request, db: Session, model, build: Callable[[], Any]) -> Response:
+        """
+        Serve a cached response for the model's table, building and serializing it
+        only when the table changed since the cached copy was made
+        """
+        table = model.__tablename__
+        key = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+        version = self._current_version(db, model)
+
+        entry = self._entries.get((table, key))
+        if entry is None or entry[0] != version:
+            body = dumps(build())
+            entry = (version, make_etag(body), body, self._last_modified(table))
+            with self._lock:
+                # Keep the cache bounded when clients vary query parameters a lot
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+                self._entries[(table, key)] = entry
+
+        _, etag, body, last_modified = entry
+        return conditional_response(request, body, etag, last_modified=last_modified)
+
+# Create a singleton instance
+response_cache = ResponseCache(settings.HTTP_CACHE_REVALIDATE_SECONDS)
@@ -0,0 +1,49 @@
+from typing import Callable, List, Tuple
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Scheduler:
+    """
+    Runs periodic background jobs on the application's event loop.
+    Jobs are plain synchronous functions and run in a worker thread so
+    database work does not block request handling.
+    """
+    def __init__(self):
+        self._jobs: List[Tuple[float, Callable[[], None]]] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def every(self, seconds: float, func: Callable[[], None]):
+        """
+        Register a job to run every given number of seconds
+        """
+        self._jobs.append((seconds, func))
+
+    async def _run(self, seconds: float, func: Callable[[], None]):
+        while True:
+            await asyncio.sleep(seconds)
+            try:
+                await asyncio.to_thread(func)
+            except Exception:
+                logger.exception(f"Scheduled job {func.__name__} failed")
+
+    def start(self):
+        """
+        Start all registered jobs
+        """
+        for seconds, func in self._jobs:
+            self._tasks.append(asyncio.create_task(self._run(seconds, func)))
+        logger.info(f"Scheduler started with {len(self._tasks)} jobs")
+
+    async def stop(self):
+        """
+        Cancel all running jobs
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+# Create a singleton instance
+scheduler = Scheduler()
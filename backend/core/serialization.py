@@ -0,0 +1,23 @@
+from typing import Any, Dict, Iterable, List, Type
+from pydantic import BaseModel
+import orjson
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode content to JSON bytes using orjson
+    """
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+def model_to_dict(instance: Any, schema: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    Copy the attributes named by a response schema off an ORM instance.
+    Used for trusted data where full Pydantic validation is not needed.
+    """
+    return {field: getattr(instance, field) for field in schema.model_fields}
+
+def models_to_dicts(instances: Iterable[Any], schema: Type[BaseModel]) -> List[Dict[str, Any]]:
+    """
+    Copy the attributes named by a response schema off a list of ORM instances
+    """
+    fields = list(schema.model_fields)
+    return [{field: getattr(instance, field) for field in fields} for instance in instances]
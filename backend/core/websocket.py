@@ -1,57 +1,193 @@
 from fastapi import WebSocket
-from typing import Dict
+from typing import Any, Dict, Optional
+import asyncio
+import time
 import logging
 
+from config import settings
+from core.ids import uuid7
+from core.serialization import dumps
+
 logger = logging.getLogger(__name__)
 
+# Close codes
+CLOSE_GOING_AWAY = 1001
+CLOSE_TRY_AGAIN_LATER = 1013
+
+class Connection:
+    """
+    One accepted WebSocket with a server-generated ID.
+    Outgoing messages go through a bounded queue drained by the connection's
+    own writer task, so a slow client never holds up a broadcast; the bytes
+    waiting in the queue, not counting the message being sent, are what the
+    connection costs beyond its socket.
+    """
+    __slots__ = (
+        "id", "client_id", "websocket", "subscribed", "connected_at", "last_seen",
+        "outbox", "queued_bytes", "sent_messages", "sent_bytes", "writer", "closed"
+    )
+
+    def __init__(self, websocket: WebSocket, client_id: str, subscribed: bool, queue_size: int):
+        self.id = uuid7()
+        self.client_id = client_id
+        self.websocket = websocket
+        self.subscribed = subscribed  # Receives broadcasts
+        self.connected_at = time.monotonic()
+        self.last_seen = self.connected_at
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.queued_bytes = 0
+        self.sent_messages = 0
+        self.sent_bytes = 0
+        self.writer: Optional[asyncio.Task] = None
+        self.closed = False
+
+    def info(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "id": self.id,
+            "client_id": self.client_id,
+            "subscribed": self.subscribed,
+            "connected_seconds": now - self.connected_at,
+            "idle_seconds": now - self.last_seen,
+            "queued_messages": self.outbox.qsize(),
+            "queued_bytes": self.queued_bytes,
+            "sent_messages": self.sent_messages,
+            "sent_bytes": self.sent_bytes,
+        }
+
 class WebSocketManager:
     """
-    WebSocket connection manager to handle multiple client connections
+    WebSocket connection manager to handle multiple client connections.
+    Connections are keyed by a server-generated ID, so clients reusing a
+    client_id (such as two tabs) each keep their own socket. Dead peers are
+    detected by the server's protocol-level ping/pong, configured through
+    uvicorn's ws_ping_interval and ws_ping_timeout, so clients only ever
+    receive JSON. New connections beyond WS_MAX_CONNECTIONS and clients
+    whose queued messages exceed WS_MAX_QUEUED_BYTES are closed with 1013
+    (try again later).
     """
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
+    def __init__(self, max_connections: int, queue_size: int, max_queued_bytes: int):
+        self.max_connections = max_connections
+        self.queue_size = queue_size
+        self.max_queued_bytes = max_queued_bytes
+        self.active_connections: Dict[str, Connection] = {}
+        self.rejected = 0
+        self.dropped = 0
+        self._queued_bytes = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        """
+        Remember the event loop serving the connections, used by publish()
+        """
+        self._loop = loop
+
+    async def stop(self):
+        """
+        Close all connections
+        """
+        for connection in list(self.active_connections.values()):
+            await self._close(connection, CLOSE_GOING_AWAY, "Server shutting down")
+
+    def publish(self, message):
+        """
+        Broadcast a message from synchronous code, such as request handlers
+        running in the thread pool. Does not wait for the sends to finish.
+        """
+        if self._loop is None or self._loop.is_closed():
+            return
+        # Encoded in the calling thread, the event loop only queues it
+        payload = dumps(message).decode()
+        self._loop.call_soon_threadsafe(self._broadcast_payload, payload)
 
-    async def connect(self, websocket: WebSocket, client_id: str):
+    async def connect(self, websocket: WebSocket, client_id: str, subscribed: bool = True) -> Optional[Connection]:
         """
-        Connect a client to the WebSocket
+        Accept a client's WebSocket. Returns None when the connection limit is
+        reached; the socket is then closed with 1013.
         """
         await websocket.accept()
-        self.active_connections[client_id] = websocket
-        logger.info(f"Client {client_id} connected. Total active connections: {len(self.active_connections)}")
+        if len(self.active_connections) >= self.max_connections:
+            self.rejected += 1
+            await websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason="Too many connections")
+            logger.warning(f"Rejected client {client_id}, {len(self.active_connections)} connections open")
+            return None
+
+        connection = Connection(websocket, client_id, subscribed, self.queue_size)
+        connection.writer = asyncio.create_task(self._write(connection))
+        self.active_connections[connection.id] = connection
+        self._enqueue(connection, dumps({"type": "connected", "connection_id": connection.id}).decode())
+        logger.info(f"Client {client_id} connected as {connection.id}. Total active connections: {len(self.active_connections)}")
+        return connection
 
-    def disconnect(self, client_id: str):
+    def disconnect(self, connection: Connection):
         """
         Disconnect a client from the WebSocket
         """
-        if client_id in self.active_connections:
-            del self.active_connections[client_id]
-            logger.info(f"Client {client_id} disconnected. Total active connections: {len(self.active_connections)}")
+        if self.active_connections.pop(connection.id, None) is None:
+            return
+        connection.closed = True
+        if connection.writer is not None:
+            connection.writer.cancel()
+        # Discard unsent messages, which also releases close() waiting for them
+        while not connection.outbox.empty():
+            connection.outbox.get_nowait()
+            connection.outbox.task_done()
+        self._queued_bytes -= connection.queued_bytes
+        connection.queued_bytes = 0
+        logger.info(f"Client {connection.client_id} ({connection.id}) disconnected. Total active connections: {len(self.active_connections)}")
 
-    async def send_personal_message(self, message, client_id: str):
+    async def close(self, connection: Connection, code: int = 1000, reason: str = ""):
         """
-        Send a message to a specific client
+        Close a connection once its queued messages are sent
+        """
+        if not connection.closed:
+            await connection.outbox.join()
+        await self._close(connection, code, reason)
+
+    async def receive_text(self, connection: Connection) -> str:
         """
-        if client_id in self.active_connections:
-            await self.active_connections[client_id].send_json(message)
-            logger.debug(f"Message sent to client {client_id}")
+        Next message from a client
+        """
+        data = await connection.websocket.receive_text()
+        connection.last_seen = time.monotonic()
+        return data
+
+    async def send(self, connection: Connection, message):
+        """
+        Send a message to one client, waiting while its queue is full.
+        Like broadcasts, a message that takes the queue over
+        WS_MAX_QUEUED_BYTES closes the client instead.
+        """
+        if connection.closed:
+            return
+        payload = dumps(message).decode()
+        await connection.outbox.put(payload)
+        if connection.closed:
+            # Closed while waiting, the queue was already discarded
+            return
+        if not self._within_limit(connection, len(payload)):
+            self.dropped += 1
+            self._drop(connection, CLOSE_TRY_AGAIN_LATER, "Client too slow")
+            return
+        self._add_bytes(connection, len(payload))
+
+    async def send_personal_message(self, message, connection_id: str):
+        """
+        Send a message to a specific connection
+        """
+        connection = self.active_connections.get(connection_id)
+        if connection is not None:
+            await self.send(connection, message)
+            logger.debug(f"Message sent to connection {connection_id}")
         else:
-            logger.warning(f"Attempted to send message to disconnected client {client_id}")
+            logger.warning(f"Attempted to send message to disconnected connection {connection_id}")
 
     async def broadcast(self, message):
         """
         Broadcast a message to all connected clients
         """
-        disconnected_clients = []
-        for client_id, connection in self.active_connections.items():
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                logger.error(f"Error sending message to client {client_id}: {str(e)}")
-                disconnected_clients.append(client_id)
-        
-        # Clean up any disconnected clients
-        for client_id in disconnected_clients:
-            self.disconnect(client_id)
+        # Encode once for all clients instead of once per send
+        self._broadcast_payload(dumps(message).decode())
 
     async def broadcast_object_update(self, object_id: str, data: dict):
         """
@@ -64,5 +200,85 @@ class WebSocketManager:
         }
         await self.broadcast(message)
 
+    def stats(self) -> Dict[str, Any]:
+        """
+        Connection counts and memory held in send queues
+        """
+        connections = list(self.active_connections.values())
+        return {
+            "connections": len(connections),
+            "max_connections": self.max_connections,
+            "queued_bytes": self._queued_bytes,
+            "max_queued_bytes_per_connection": self.max_queued_bytes,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "largest_queues": [
+                connection.info()
+                for connection in sorted(connections, key=lambda c: c.queued_bytes, reverse=True)[:10]
+            ],
+        }
+
+    def _broadcast_payload(self, payload: str):
+        for connection in list(self.active_connections.values()):
+            if connection.subscribed:
+                self._enqueue(connection, payload)
+
+    def _within_limit(self, connection: Connection, size: int) -> bool:
+        # A message larger than the limit on its own still goes out once the queue is empty
+        return connection.queued_bytes == 0 or connection.queued_bytes + size <= self.max_queued_bytes
+
+    def _add_bytes(self, connection: Connection, size: int):
+        connection.queued_bytes += size
+        self._queued_bytes += size
+
+    def _enqueue(self, connection: Connection, payload: str):
+        if connection.closed:
+            return
+        # Broadcast payloads are shared between queues, so this overstates memory rather than understating it
+        if not self._within_limit(connection, len(payload)) or connection.outbox.full():
+            self.dropped += 1
+            self._drop(connection, CLOSE_TRY_AGAIN_LATER, "Client too slow")
+            return
+        connection.outbox.put_nowait(payload)
+        self._add_bytes(connection, len(payload))
+
+    async def _write(self, connection: Connection):
+        try:
+            while True:
+                payload = await connection.outbox.get()
+                # No longer waiting once taken, so a large message being sent does not count against later ones
+                self._add_bytes(connection, -len(payload))
+                try:
+                    await connection.websocket.send_text(payload)
+                finally:
+                    connection.outbox.task_done()
+                connection.sent_messages += 1
+                connection.sent_bytes += len(payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending message to client {connection.client_id} ({connection.id}): {str(e)}")
+            self.disconnect(connection)
+
+    def _drop(self, connection: Connection, code: int, reason: str):
+        # Removed at once so nothing more is queued, the close itself runs on the loop
+        self.disconnect(connection)
+        asyncio.ensure_future(self._close_socket(connection, code, reason))
+
+    async def _close(self, connection: Connection, code: int, reason: str):
+        self.disconnect(connection)
+        await self._close_socket(connection, code, reason)
+
+    async def _close_socket(self, connection: Connection, code: int, reason: str):
+        try:
+            await connection.websocket.close(code=code, reason=reason)
+        except Exception:
+            # Already closed by the client
+            pass
+
 # Create a singleton instance
-websocket_manager = WebSocketManager() 
\ No newline at end of file
+websocket_manager = WebSocketManager(
+    max_connections=settings.WS_MAX_CONNECTIONS,
+    queue_size=settings.WS_SEND_QUEUE_SIZE,
+    max_queued_bytes=settings.WS_MAX_QUEUED_BYTES
+)
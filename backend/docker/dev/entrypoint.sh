@@ -17,8 +17,8 @@ if [ "$DEBUG" = "True" ]; then
     python populate_db.py
   fi
   echo "Starting in development mode..."
-  exec uvicorn main:app --host 0.0.0.0 --port 8000 --reload
+  exec uvicorn main:app --host 0.0.0.0 --port 8000 --ws-ping-interval "${WS_PING_INTERVAL_SECONDS:-20}" --ws-ping-timeout "${WS_PING_TIMEOUT_SECONDS:-20}" --reload
 else
   echo "Starting in production mode..."
-  exec uvicorn main:app --host 0.0.0.0 --port 8000
+  exec uvicorn main:app --host 0.0.0.0 --port 8000 --ws-ping-interval "${WS_PING_INTERVAL_SECONDS:-20}" --ws-ping-timeout "${WS_PING_TIMEOUT_SECONDS:-20}"
 fi
\ No newline at end of file
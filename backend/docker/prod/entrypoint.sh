@@ -19,4 +19,4 @@ fi
 
 echo "Starting FastAPI server in production mode..."
 # Execute uvicorn with proper parameters to keep the process running
-exec uvicorn main:app --host 0.0.0.0 --port 8000
\ No newline at end of file
+exec uvicorn main:app --host 0.0.0.0 --port 8000 --ws-ping-interval "${WS_PING_INTERVAL_SECONDS:-20}" --ws-ping-timeout "${WS_PING_TIMEOUT_SECONDS:-20}"
\ No newline at end of file
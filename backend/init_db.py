@@ -1,14 +1,285 @@
+from sqlalchemy import text
 from database import engine
-from models.all import Base, DataSource, TrackedObject
+from models.all import Base, DataSource, TrackedObject, TAGS_TSVECTOR_SQL
+from services.history_service import OSM_SENSOR_ID
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Identifier columns converted from text to native uuid, as (table, column)
+UUID_COLUMNS = [
+    ("custom_object_types", "id"),
+    ("sensors", "id"),
+    ("data_sources", "id"),
+    ("tracked_objects", "id"),
+    ("tracked_objects", "source_id"),
+    ("sensor_data", "id"),
+    ("sensor_data", "tracked_object_id"),
+    ("sensor_data", "sensor_id"),
+    ("data_validation_logs", "id"),
+    ("object_locations", "id"),
+    ("object_locations", "object_id"),
+    ("object_states", "tracked_object_id"),
+]
+
+# Foreign keys dropped while column types change, as (table, column, referenced table, on delete)
+UUID_FOREIGN_KEYS = [
+    ("tracked_objects", "source_id", "data_sources", ""),
+    ("sensor_data", "tracked_object_id", "tracked_objects", ""),
+    ("sensor_data", "sensor_id", "sensors", ""),
+    ("object_locations", "object_id", "tracked_objects", ""),
+    ("object_states", "tracked_object_id", "tracked_objects", " ON DELETE CASCADE"),
+]
+
+UUID_PATTERN = "^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$"
+
+def _uuid_primary_keys_migration() -> str:
+    """
+    Build the statement converting text identifiers to native uuid columns.
+    Objects pointing at a non-UUID source (such as the old "auto_created"
+    placeholder) are moved to a real "auto_created" data source first.
+    Runs before create_all so new tables reference uuid columns.
+    """
+    drop_fks = "\n            ".join(
+        f"ALTER TABLE IF EXISTS {table} DROP CONSTRAINT IF EXISTS {table}_{column}_fkey;"
+        for table, column, _, _ in UUID_FOREIGN_KEYS
+    )
+    alter_columns = "\n            ".join(
+        f"ALTER TABLE IF EXISTS {table} ALTER COLUMN {column} TYPE uuid USING {column}::uuid;"
+        for table, column in UUID_COLUMNS
+    )
+    # Primary keys are already indexed, the extra ix_<table>_id indexes only cost writes
+    drop_indexes = "\n            ".join(
+        f"DROP INDEX IF EXISTS ix_{table}_id;"
+        for table in dict.fromkeys(table for table, _ in UUID_COLUMNS)
+    )
+    add_fks = "\n            ".join(
+        f"ALTER TABLE IF EXISTS {table} ADD CONSTRAINT {table}_{column}_fkey FOREIGN KEY ({column}) REFERENCES {referenced} (id){on_delete};"
+        for table, column, referenced, on_delete in UUID_FOREIGN_KEYS
+    )
+    return f"""
+    DO $$
+    DECLARE
+        auto_source_id text;
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'tracked_objects' AND column_name = 'id' AND data_type <> 'uuid'
+        ) THEN
+            {drop_fks}
+
+            IF EXISTS (SELECT 1 FROM tracked_objects WHERE source_id IS NOT NULL AND source_id !~ '{UUID_PATTERN}') THEN
+                SELECT id INTO auto_source_id FROM data_sources
+                WHERE name = 'auto_created' AND id ~ '{UUID_PATTERN}' LIMIT 1;
+                IF auto_source_id IS NULL THEN
+                    auto_source_id := gen_random_uuid()::text;
+                    INSERT INTO data_sources (id, name, description, type, connection_info, is_active, created_at, updated_at)
+                    VALUES (auto_source_id, 'auto_created', 'Objects created from incoming data without a known source',
+                            'auto', '{{}}'::jsonb, true, now(), now());
+                END IF;
+                UPDATE tracked_objects SET source_id = auto_source_id
+                WHERE source_id IS NOT NULL AND source_id !~ '{UUID_PATTERN}';
+            END IF;
+            DELETE FROM data_sources WHERE id !~ '{UUID_PATTERN}';
+
+            {alter_columns}
+            {drop_indexes}
+            {add_fks}
+        END IF;
+    END $$
+    """
+
+# Idempotent statements run before create_all
+PRE_CREATE_MIGRATIONS = [
+    _uuid_primary_keys_migration(),
+    # Trigram operator classes used by the object search indexes
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+]
+
+# Idempotent statements run after create_all to bring existing databases up to date
+MIGRATIONS = [
+    # Seed object_states from the latest sensor reading of each object
+    """
+    INSERT INTO object_states (tracked_object_id, latitude, longitude, altitude, timestamp, updated_at)
+    SELECT DISTINCT ON (tracked_object_id) tracked_object_id, latitude, longitude, altitude, timestamp, now()
+    FROM sensor_data
+    WHERE tracked_object_id IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM object_states)
+    ORDER BY tracked_object_id, timestamp DESC
+    ON CONFLICT (tracked_object_id) DO NOTHING
+    """,
+    # Remove duplicate readings, then enforce the (object, sensor, timestamp) natural key
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'uq_sensor_data_reading') THEN
+            DELETE FROM sensor_data a USING sensor_data b
+            WHERE a.tracked_object_id = b.tracked_object_id
+              AND a.raw_sensor_id = b.raw_sensor_id
+              AND a.timestamp = b.timestamp
+              AND a.ctid > b.ctid;
+            CREATE UNIQUE INDEX uq_sensor_data_reading ON sensor_data (tracked_object_id, raw_sensor_id, timestamp);
+        END IF;
+    END $$
+    """,
+    # Aggregation columns for repeated validation log occurrences
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'data_validation_logs' AND column_name = 'fingerprint'
+        ) THEN
+            ALTER TABLE data_validation_logs
+                ADD COLUMN fingerprint varchar,
+                ADD COLUMN count integer NOT NULL DEFAULT 1,
+                ADD COLUMN first_seen timestamp,
+                ADD COLUMN last_seen timestamp;
+            UPDATE data_validation_logs SET first_seen = created_at, last_seen = created_at;
+        END IF;
+    END $$
+    """,
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_data_validation_logs_open_fingerprint
+    ON data_validation_logs (fingerprint) WHERE resolved = false
+    """,
+    # Composite indexes for filtered, newest-first log listing
+    "CREATE INDEX IF NOT EXISTS ix_data_validation_logs_created_at_id ON data_validation_logs (created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_data_validation_logs_log_type_created_at ON data_validation_logs (log_type, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_data_validation_logs_object_id_created_at ON data_validation_logs (object_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_data_validation_logs_sensor_id_created_at ON data_validation_logs (sensor_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_data_validation_logs_unresolved_created_at ON data_validation_logs (created_at, id) WHERE resolved = false",
+    "CREATE INDEX IF NOT EXISTS ix_data_validation_logs_resolved_last_seen ON data_validation_logs ((coalesce(last_seen, created_at)), id) WHERE resolved = true",
+    "DROP INDEX IF EXISTS ix_data_validation_logs_log_type",
+    "DROP INDEX IF EXISTS ix_data_validation_logs_object_id",
+    "DROP INDEX IF EXISTS ix_data_validation_logs_sensor_id",
+    # Object search indexes
+    "CREATE INDEX IF NOT EXISTS ix_tracked_objects_additional_info ON tracked_objects USING gin (additional_info jsonb_path_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_tracked_objects_name_trgm ON tracked_objects USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_tracked_objects_object_id_trgm ON tracked_objects USING gin (object_id gin_trgm_ops)",
+    f"CREATE INDEX IF NOT EXISTS ix_tracked_objects_tag_words ON tracked_objects USING gin (({TAGS_TSVECTOR_SQL}))",
+    # Replaced by ix_tracked_objects_tag_words, which also covers tag keys
+    "DROP INDEX IF EXISTS ix_tracked_objects_tags_tsv",
+    # Per-object history ordered by time
+    "CREATE INDEX IF NOT EXISTS ix_sensor_data_object_timestamp ON sensor_data (tracked_object_id, timestamp)",
+    # Readings of a time window across all objects
+    "CREATE INDEX IF NOT EXISTS ix_sensor_data_timestamp_id ON sensor_data (timestamp, id)",
+    # States changed since a point in time, pulled by the proximity detector
+    "CREATE INDEX IF NOT EXISTS ix_object_states_updated_at ON object_states (updated_at)",
+    # Memberships of a batch of objects, looked up on every ingest
+    "CREATE INDEX IF NOT EXISTS ix_geofence_memberships_object ON geofence_memberships (tracked_object_id)",
+    # Move object_locations history into sensor_data and drop the old table
+    f"""
+    DO $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM information_schema.tables WHERE table_name = 'object_locations') THEN
+            INSERT INTO sensor_data (id, tracked_object_id, sensor_id, raw_sensor_id, latitude, longitude, altitude, additional_data, timestamp)
+            SELECT id::uuid, object_id::uuid, NULL, '{OSM_SENSOR_ID}', latitude, longitude, altitude, NULL, coalesce(timestamp, now())
+            FROM object_locations
+            WHERE object_id IS NOT NULL
+            ON CONFLICT DO NOTHING;
+
+            INSERT INTO object_states (tracked_object_id, latitude, longitude, altitude, timestamp, updated_at)
+            SELECT DISTINCT ON (object_id) object_id::uuid, latitude, longitude, altitude, timestamp, now()
+            FROM object_locations
+            WHERE object_id IS NOT NULL AND timestamp IS NOT NULL
+            ORDER BY object_id, timestamp DESC
+            ON CONFLICT (tracked_object_id) DO UPDATE SET
+                latitude = excluded.latitude,
+                longitude = excluded.longitude,
+                altitude = excluded.altitude,
+                timestamp = excluded.timestamp,
+                updated_at = excluded.updated_at
+            WHERE object_states.timestamp < excluded.timestamp;
+
+            DROP TABLE object_locations;
+        END IF;
+    END $$
+    """,
+    # Sensor accuracy used to weight readings during fusion
+    "ALTER TABLE sensors ADD COLUMN IF NOT EXISTS accuracy double precision",
+    # Rate limits and priority of data sources
+    """
+    ALTER TABLE data_sources
+        ADD COLUMN IF NOT EXISTS rate_limit double precision,
+        ADD COLUMN IF NOT EXISTS rate_limit_burst integer,
+        ADD COLUMN IF NOT EXISTS sensor_rate_limit double precision,
+        ADD COLUMN IF NOT EXISTS is_critical boolean NOT NULL DEFAULT false
+    """,
+    # Metrics derived from consecutive positions
+    """
+    ALTER TABLE object_states
+        ADD COLUMN IF NOT EXISTS speed double precision,
+        ADD COLUMN IF NOT EXISTS heading double precision,
+        ADD COLUMN IF NOT EXISTS distance_total double precision NOT NULL DEFAULT 0,
+        ADD COLUMN IF NOT EXISTS dwell_seconds double precision NOT NULL DEFAULT 0
+    """,
+    # Merge duplicate (object_id, type) objects into the oldest one, then enforce uniqueness
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'uq_tracked_objects_object_id_type') THEN
+            CREATE TEMP TABLE tracked_object_merges ON COMMIT DROP AS
+            SELECT id AS duplicate_id, keeper_id FROM (
+                SELECT id, first_value(id) OVER (PARTITION BY object_id, type ORDER BY created_at, id) AS keeper_id
+                FROM tracked_objects
+                WHERE object_id IS NOT NULL AND type IS NOT NULL
+            ) ranked
+            WHERE id <> keeper_id;
+
+            -- Readings of two duplicates sharing a natural key would collide on the keeper
+            DELETE FROM sensor_data a
+            USING sensor_data b, tracked_object_merges ma, tracked_object_merges mb
+            WHERE a.tracked_object_id = ma.duplicate_id
+              AND b.tracked_object_id = mb.duplicate_id
+              AND ma.keeper_id = mb.keeper_id
+              AND a.raw_sensor_id = b.raw_sensor_id
+              AND a.timestamp = b.timestamp
+              AND a.id > b.id;
+            UPDATE sensor_data s SET tracked_object_id = m.keeper_id
+            FROM tracked_object_merges m
+            WHERE s.tracked_object_id = m.duplicate_id
+              AND NOT EXISTS (
+                  SELECT 1 FROM sensor_data k
+                  WHERE k.tracked_object_id = m.keeper_id
+                    AND k.raw_sensor_id = s.raw_sensor_id
+                    AND k.timestamp = s.timestamp
+              );
+            DELETE FROM sensor_data s USING tracked_object_merges m WHERE s.tracked_object_id = m.duplicate_id;
+
+            INSERT INTO object_states (tracked_object_id, latitude, longitude, altitude, timestamp, updated_at)
+            SELECT DISTINCT ON (m.keeper_id) m.keeper_id, o.latitude, o.longitude, o.altitude, o.timestamp, now()
+            FROM object_states o JOIN tracked_object_merges m ON m.duplicate_id = o.tracked_object_id
+            ORDER BY m.keeper_id, o.timestamp DESC
+            ON CONFLICT (tracked_object_id) DO UPDATE SET
+                latitude = excluded.latitude,
+                longitude = excluded.longitude,
+                altitude = excluded.altitude,
+                timestamp = excluded.timestamp,
+                updated_at = excluded.updated_at
+            WHERE object_states.timestamp < excluded.timestamp;
+
+            DELETE FROM tracked_objects t USING tracked_object_merges m WHERE t.id = m.duplicate_id;
+            CREATE UNIQUE INDEX uq_tracked_objects_object_id_type ON tracked_objects (object_id, type);
+        END IF;
+    END $$
+    """,
+]
+
+def run_migrations(statements):
+    logger.info("Running database migrations...")
+    with engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+    logger.info("Database migrations completed successfully.")
+
 def init_db():
+    run_migrations(PRE_CREATE_MIGRATIONS)
     logger.info("Creating database tables...")
     Base.metadata.create_all(bind=engine)
     logger.info("Database tables created successfully.")
+    run_migrations(MIGRATIONS)
 
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    init_db()
@@ -1,13 +1,28 @@
 import os
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from brotli_asgi import BrotliMiddleware
+from sqlalchemy.exc import DataError
 from fastapi.staticfiles import StaticFiles
+import asyncio
+import math
 import logging
 
 from config import settings
+from core.scheduler import scheduler
+from core.websocket import websocket_manager
+from services.validation_log_service import flush_validation_logs
+from services.log_retention_service import archive_old_logs
+from services.proximity_service import detect_proximity
+from services.rollup_service import refresh_rollups
+from services.snapshot_service import take_state_checkpoint
+from services.health_service import flush_health
+from services.connector_service import connector_supervisor
+from services.admission_service import RateLimited
 
 # Import routers
-from routers import objects, data_sources, websockets, sensors, logs, object_types
+from routers import objects, data_sources, websockets, sensors, logs, object_types, tiles, geofences, stats
 
 # Configure logging
 logging.basicConfig(
@@ -24,6 +39,7 @@ app = FastAPI(
     version=settings.APP_VERSION,
     docs_url="/api/docs" if settings.DEBUG else None,
     redoc_url="/api/redoc" if settings.DEBUG else None,
+    default_response_class=ORJSONResponse,
 )
 
 # Configure CORS - more restrictive in production
@@ -34,6 +50,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["Authorization", "Content-Type", "Access-Control-Allow-Headers", "Access-Control-Allow-Origin", "Accept"],
+    expose_headers=["X-Next-Cursor"],
+)
+
+# Compress large responses with brotli, falling back to gzip for clients without br support
+app.add_middleware(
+    BrotliMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_fallback=True,
 )
 
 # Ensure directories exist
@@ -45,6 +69,20 @@ try:
 except Exception as e:
     logger.error(f"Error mounting static directories: {e}")
 
+# Malformed values such as non-UUID identifiers are rejected by the database
+@app.exception_handler(DataError)
+async def data_error_handler(request: Request, exc: DataError):
+    return ORJSONResponse(status_code=400, content={"detail": str(exc.orig).split("\n")[0]})
+
+# Readings over a source's rate limit or beyond the ingest capacity
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    return ORJSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))}
+    )
+
 # Basic root endpoint
 @app.get("/")
 async def root():
@@ -62,16 +100,40 @@ app.include_router(websockets.router)
 app.include_router(sensors.router)
 app.include_router(logs.router)
 app.include_router(object_types.router)
+app.include_router(tiles.router)
+app.include_router(geofences.router)
+app.include_router(stats.router)
 
 @app.on_event("startup")
 async def startup_event():
     logger.info("Application startup")
     # You could add database connection validation here
+    
+    # Lets request handlers running in the thread pool broadcast events
+    websocket_manager.bind_loop(asyncio.get_running_loop())
+    
+    # Register background jobs
+    scheduler.every(settings.LOG_FLUSH_INTERVAL_SECONDS, flush_validation_logs)
+    scheduler.every(settings.LOG_RETENTION_INTERVAL_SECONDS, archive_old_logs)
+    scheduler.every(settings.PROXIMITY_INTERVAL_SECONDS, detect_proximity)
+    scheduler.every(settings.ROLLUP_INTERVAL_SECONDS, refresh_rollups)
+    scheduler.every(settings.CHECKPOINT_INTERVAL_SECONDS, take_state_checkpoint)
+    scheduler.every(settings.HEALTH_FLUSH_INTERVAL_SECONDS, flush_health)
+    scheduler.start()
+    
+    # Pull data from rest, websocket and file-tail sources
+    if settings.CONNECTORS_ENABLED:
+        connector_supervisor.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Application shutdown")
-    # You could close connections here
+    await scheduler.stop()
+    await connector_supervisor.stop()
+    await websocket_manager.stop()
+    
+    # Write anything still held in memory
+    flush_validation_logs()
 
 if __name__ == "__main__":
     import uvicorn
@@ -80,5 +142,7 @@ if __name__ == "__main__":
         host="0.0.0.0", 
         port=8000, 
         reload=settings.DEBUG,
-        workers=1 if settings.DEBUG else 4  # Use multiple workers in production
+        workers=settings.WEB_CONCURRENCY,  # Rate limits are split between the same number of workers
+        ws_ping_interval=settings.WS_PING_INTERVAL_SECONDS,
+        ws_ping_timeout=settings.WS_PING_TIMEOUT_SECONDS
     )
\ No newline at end of file
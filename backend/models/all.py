@@ -1,8 +1,9 @@
-from sqlalchemy import Column, String, ForeignKey, DateTime, Text, Boolean, Integer, Float, Enum
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import Column, String, ForeignKey, DateTime, Text, Boolean, Integer, BigInteger, Float, Enum, Index, text
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import relationship
 from database import Base
 from uuid import uuid4
+from core.ids import uuid7
 from datetime import datetime
 import enum
 
@@ -13,10 +14,14 @@ class ObjectType(str, enum.Enum):
     DRONE = "drone"
     OTHER = "other"
 
+# Full-text document of tracked object tag keys and string values, shared by the index and search queries.
+# to_tsvector on jsonb would cover the values only.
+TAGS_TSVECTOR_SQL = "jsonb_to_tsvector('simple', coalesce(additional_info, '{}'::jsonb), '[\"key\", \"string\"]')"
+
 class CustomObjectType(Base):
     __tablename__ = "custom_object_types"
 
-    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid4()))
+    id = Column(UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid4()))
     name = Column(String, index=True, unique=True)  # The type string identifier (e.g., "ship", "car")
     display_name = Column(String)  # User-friendly name (e.g., "Ship", "Car")
     description = Column(Text, nullable=True)
@@ -29,11 +34,12 @@ class CustomObjectType(Base):
 class Sensor(Base):
     __tablename__ = "sensors"
 
-    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid4()))
+    id = Column(UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid4()))
     sensor_id = Column(String, index=True, unique=True)  # External sensor ID
     name = Column(String, index=True)
     description = Column(Text, nullable=True)
     type = Column(String)  # Sensor type
+    accuracy = Column(Float, nullable=True)  # Position error of one reading in metres (one standard deviation)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -44,12 +50,16 @@ class Sensor(Base):
 class DataSource(Base):
     __tablename__ = "data_sources"
 
-    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid4()))
+    id = Column(UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid4()))
     name = Column(String, index=True)
     description = Column(Text, nullable=True)
     type = Column(String)  # "websocket", "rest", etc.
     connection_info = Column(JSONB)  # Store connection details as JSON
     is_active = Column(Boolean, default=True)
+    rate_limit = Column(Float, nullable=True)  # Readings per second accepted from the source, None for no limit
+    rate_limit_burst = Column(Integer, nullable=True)  # Readings accepted at once after a quiet period, defaults to one second's worth
+    sensor_rate_limit = Column(Float, nullable=True)  # Readings per second per sensor of the source
+    is_critical = Column(Boolean, default=False)  # Admitted from reserved capacity under overload
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -59,25 +69,63 @@ class DataSource(Base):
 class TrackedObject(Base):
     __tablename__ = "tracked_objects"
 
-    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid4()))
+    id = Column(UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid4()))
     object_id = Column(String, index=True)  # External object ID
     name = Column(String, index=True, nullable=True)
     type = Column(String, index=True)  # Type string (e.g., "ship", "car")
     additional_info = Column(JSONB, nullable=True)  # Additional information
-    source_id = Column(String, ForeignKey("data_sources.id"))
+    source_id = Column(UUID(as_uuid=False), ForeignKey("data_sources.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # Conflict target for batched upserts of source elements
+        Index("uq_tracked_objects_object_id_type", "object_id", "type", unique=True),
+        # Tag containment (@>) and jsonpath (@?) lookups
+        Index("ix_tracked_objects_additional_info", "additional_info", postgresql_using="gin", postgresql_ops={"additional_info": "jsonb_path_ops"}),
+        # Substring search on names and external IDs (requires pg_trgm)
+        Index("ix_tracked_objects_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_tracked_objects_object_id_trgm", "object_id", postgresql_using="gin", postgresql_ops={"object_id": "gin_trgm_ops"}),
+        # Word search over tag keys and values
+        Index("ix_tracked_objects_tag_words", text(TAGS_TSVECTOR_SQL), postgresql_using="gin"),
+    )
+
     # Relationships
     source = relationship("DataSource", back_populates="tracked_objects")
     sensor_data = relationship("SensorData", back_populates="tracked_object")
+    state = relationship("ObjectState", back_populates="tracked_object", uselist=False, cascade="all, delete-orphan")
+
+class ObjectState(Base):
+    __tablename__ = "object_states"
+
+    # One row per tracked object holding its latest known position
+    tracked_object_id = Column(UUID(as_uuid=False), ForeignKey("tracked_objects.id", ondelete="CASCADE"), primary_key=True)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    altitude = Column(Float, nullable=True)
+    timestamp = Column(DateTime)  # Timestamp of the reading the position came from
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Derived from consecutive positions when the state is updated
+    speed = Column(Float, nullable=True)  # m/s over the last step
+    heading = Column(Float, nullable=True)  # Degrees clockwise from north of the last step that moved
+    distance_total = Column(Float, nullable=False, default=0.0, server_default=text("0"))  # Metres travelled
+    dwell_seconds = Column(Float, nullable=False, default=0.0, server_default=text("0"))  # Time spent below the dwell speed
+
+    __table_args__ = (
+        Index("ix_object_states_lat_lon", "latitude", "longitude"),
+        # States changed since a point in time, pulled by the proximity detector
+        Index("ix_object_states_updated_at", "updated_at"),
+    )
+
+    # Relationships
+    tracked_object = relationship("TrackedObject", back_populates="state")
 
 class SensorData(Base):
     __tablename__ = "sensor_data"
     
-    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid4()))
-    tracked_object_id = Column(String, ForeignKey("tracked_objects.id"))
-    sensor_id = Column(String, ForeignKey("sensors.id"), nullable=True)
+    id = Column(UUID(as_uuid=False), primary_key=True, default=uuid7)  # Time-ordered for append-friendly inserts
+    tracked_object_id = Column(UUID(as_uuid=False), ForeignKey("tracked_objects.id"))
+    sensor_id = Column(UUID(as_uuid=False), ForeignKey("sensors.id"), nullable=True)
     raw_sensor_id = Column(String, index=True)  # Original sensor ID from the data
     latitude = Column(Float)
     longitude = Column(Float)
@@ -85,6 +133,15 @@ class SensorData(Base):
     additional_data = Column(JSONB, nullable=True)  # Additional sensor data
     timestamp = Column(DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Natural key of a reading, makes ingest idempotent
+        Index("uq_sensor_data_reading", "tracked_object_id", "raw_sensor_id", "timestamp", unique=True),
+        # Per-object history ordered by time
+        Index("ix_sensor_data_object_timestamp", "tracked_object_id", "timestamp"),
+        # Readings of a time window across all objects, for snapshots and replay
+        Index("ix_sensor_data_timestamp_id", "timestamp", "id"),
+    )
+    
     # Relationships
     tracked_object = relationship("TrackedObject", back_populates="sensor_data")
     sensor = relationship("Sensor", back_populates="sensor_data")
@@ -92,24 +149,147 @@ class SensorData(Base):
 class DataValidationLog(Base):
     __tablename__ = "data_validation_logs"
     
-    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid4()))
-    log_type = Column(String, index=True)  # error, warning, info
+    id = Column(UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid4()))
+    log_type = Column(String)  # error, warning, info
     message = Column(Text)
     raw_data = Column(JSONB, nullable=True)  # The raw data that caused the issue
-    object_id = Column(String, nullable=True, index=True)
-    sensor_id = Column(String, nullable=True, index=True)
+    object_id = Column(String, nullable=True)
+    sensor_id = Column(String, nullable=True)
     resolved = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Aggregation of repeated occurrences, raw_data holds the latest sample
+    fingerprint = Column(String, nullable=True)  # Hash of (log_type, message, object_id, sensor_id)
+    count = Column(Integer, nullable=False, default=1)
+    first_seen = Column(DateTime, default=datetime.utcnow)
+    last_seen = Column(DateTime, default=datetime.utcnow)
 
-class ObjectLocation(Base):
-    __tablename__ = "object_locations"
-    
-    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid4()))
-    object_id = Column(String, ForeignKey("tracked_objects.id"), index=True)
+    __table_args__ = (
+        # At most one open row per fingerprint, occurrences are added to it
+        Index("uq_data_validation_logs_open_fingerprint", "fingerprint", unique=True, postgresql_where=text("resolved = false")),
+        # Each filter of the log list paired with its created_at, id ordering
+        Index("ix_data_validation_logs_created_at_id", "created_at", "id"),
+        Index("ix_data_validation_logs_log_type_created_at", "log_type", "created_at", "id"),
+        Index("ix_data_validation_logs_object_id_created_at", "object_id", "created_at", "id"),
+        Index("ix_data_validation_logs_sensor_id_created_at", "sensor_id", "created_at", "id"),
+        Index("ix_data_validation_logs_unresolved_created_at", "created_at", "id", postgresql_where=text("resolved = false")),
+        # Resolved logs in order of last activity, archived by the retention job
+        Index("ix_data_validation_logs_resolved_last_seen", text("coalesce(last_seen, created_at)"), text("id"), postgresql_where=text("resolved = true")),
+    )
+
+class Geofence(Base):
+    __tablename__ = "geofences"
+
+    id = Column(UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid4()))
+    name = Column(String, index=True)
+    description = Column(Text, nullable=True)
+    coordinates = Column(JSONB)  # GeoJSON Polygon rings of [longitude, latitude], first ring is the outline
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class GeofenceMembership(Base):
+    __tablename__ = "geofence_memberships"
+
+    # Objects currently inside a fence, a row is added on enter and removed on exit
+    geofence_id = Column(UUID(as_uuid=False), ForeignKey("geofences.id", ondelete="CASCADE"), primary_key=True)
+    tracked_object_id = Column(UUID(as_uuid=False), ForeignKey("tracked_objects.id", ondelete="CASCADE"), primary_key=True)
+    entered_at = Column(DateTime)
+
+    __table_args__ = (
+        # Memberships of a batch of objects, looked up on every ingest
+        Index("ix_geofence_memberships_object", "tracked_object_id"),
+    )
+
+class GeofenceEvent(Base):
+    __tablename__ = "geofence_events"
+
+    id = Column(UUID(as_uuid=False), primary_key=True, default=uuid7)
+    geofence_id = Column(UUID(as_uuid=False), ForeignKey("geofences.id", ondelete="CASCADE"))
+    tracked_object_id = Column(UUID(as_uuid=False), ForeignKey("tracked_objects.id", ondelete="CASCADE"))
+    event = Column(String)  # "enter" or "exit"
+    latitude = Column(Float)
+    longitude = Column(Float)
+    timestamp = Column(DateTime)  # Timestamp of the reading that caused the transition
+
+    __table_args__ = (
+        Index("ix_geofence_events_geofence_timestamp", "geofence_id", "timestamp"),
+        Index("ix_geofence_events_object_timestamp", "tracked_object_id", "timestamp"),
+    )
+
+class RollupWatermark(Base):
+    __tablename__ = "rollup_watermarks"
+
+    # sensor_data rows with IDs below last_id have been added to the rollups
+    name = Column(String, primary_key=True)
+    last_id = Column(UUID(as_uuid=False))
+    processed_until = Column(DateTime)  # Insert time covered by last_id
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ReadingRollup(Base):
+    __tablename__ = "reading_rollups"
+
+    # Reading counts per time bucket, source, object type and sensor
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    granularity = Column(String, nullable=False)  # "minute", "hour" or "day"
+    bucket = Column(DateTime, nullable=False)  # Start of the bucket, by reading timestamp
+    source_id = Column(UUID(as_uuid=False), nullable=True)
+    object_type = Column(String, nullable=True)
+    raw_sensor_id = Column(String, nullable=True)
+    reading_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index(
+            "uq_reading_rollups_key", "granularity", "bucket", "source_id", "object_type", "raw_sensor_id",
+            unique=True, postgresql_nulls_not_distinct=True
+        ),
+    )
+
+class ObjectRollup(Base):
+    __tablename__ = "object_rollups"
+
+    # Per-object summary of the readings in a time bucket
+    granularity = Column(String, primary_key=True)  # "hour" or "day"
+    tracked_object_id = Column(UUID(as_uuid=False), ForeignKey("tracked_objects.id", ondelete="CASCADE"), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    reading_count = Column(Integer, nullable=False, default=0)
+    first_timestamp = Column(DateTime)
+    last_timestamp = Column(DateTime)
+    min_latitude = Column(Float)
+    max_latitude = Column(Float)
+    min_longitude = Column(Float)
+    max_longitude = Column(Float)
+    sum_latitude = Column(Float)  # Sums give the mean position without rescanning readings
+    sum_longitude = Column(Float)
+
+class StateCheckpoint(Base):
+    __tablename__ = "state_checkpoints"
+
+    id = Column(UUID(as_uuid=False), primary_key=True, default=uuid7)
+    taken_at = Column(DateTime, index=True)  # Entries hold the latest position at or before this time
+    object_count = Column(Integer, default=0)
+
+class StateCheckpointEntry(Base):
+    __tablename__ = "state_checkpoint_entries"
+
+    checkpoint_id = Column(UUID(as_uuid=False), ForeignKey("state_checkpoints.id", ondelete="CASCADE"), primary_key=True)
+    tracked_object_id = Column(UUID(as_uuid=False), primary_key=True)
     latitude = Column(Float)
     longitude = Column(Float)
     altitude = Column(Float, nullable=True)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime)
+
+class IngestHealth(Base):
+    __tablename__ = "ingest_health"
 
-    # Relationship
-    object = relationship("TrackedObject", backref="locations")
+    kind = Column(String, primary_key=True)  # "sensor" or "source"
+    key = Column(String, primary_key=True)  # External sensor ID or data source ID
+    last_seen = Column(DateTime, index=True)  # When a reading was last received, not the reading's own time
+    message_count = Column(BigInteger, default=0)
+    error_count = Column(BigInteger, default=0)
+    message_rate = Column(Float, default=0.0)  # Messages per second over the last completed window
+    error_rate = Column(Float, default=0.0)  # Share of messages with validation problems over the same window
+    window_start = Column(DateTime)
+    window_messages = Column(BigInteger, default=0)
+    window_errors = Column(BigInteger, default=0)
+    is_stale = Column(Boolean, default=False)
+    updated_at = Column(DateTime)
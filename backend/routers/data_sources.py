@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from typing import List
 
 from dependencies import get_db
-from schemas.all import DataSource, DataSourceCreate, DataSourceUpdate, TrackedObject
+from schemas.all import DataSource, DataSourceCreate, DataSourceUpdate, TrackedObject, IngestHealth
 from models.all import DataSource as DataSourceModel
 from models.all import TrackedObject as TrackedObjectModel
 from services.data_source_service import DataSourceService
+from services.health_service import HealthService, SOURCE
+from services.admission_service import admission_controller
+from core.http_cache import response_cache
+from core.serialization import models_to_dicts
 
 router = APIRouter(
     prefix="/api/data-sources",
@@ -15,13 +19,25 @@ router = APIRouter(
 
 @router.get("", response_model=List[DataSource])
 async def get_data_sources(
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """
     Get all data sources
     """
     data_source_service = DataSourceService(db)
-    return data_source_service.get_all_data_sources()
+    return response_cache.respond(
+        request, db, DataSourceModel,
+        lambda: models_to_dicts(data_source_service.get_all_data_sources(), DataSource)
+    )
+
+@router.get("/rate-limits")
+async def get_rate_limit_stats():
+    """
+    Readings admitted, rate limited and shed under overload per data source
+    and sensor since this worker started
+    """
+    return admission_controller.stats()
 
 @router.get("/{source_id}", response_model=DataSource)
 async def get_data_source(
@@ -46,7 +62,10 @@ async def create_data_source(
     Create a new data source
     """
     data_source_service = DataSourceService(db)
-    return data_source_service.create_data_source(source.dict())
+    try:
+        return data_source_service.create_data_source(source.dict())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.put("/{source_id}", response_model=DataSource)
 async def update_data_source(
@@ -58,7 +77,10 @@ async def update_data_source(
     Update an existing data source
     """
     data_source_service = DataSourceService(db)
-    db_source = data_source_service.update_data_source(source_id, source_update.dict(exclude_unset=True))
+    try:
+        db_source = data_source_service.update_data_source(source_id, source_update.dict(exclude_unset=True))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not db_source:
         raise HTTPException(status_code=404, detail="Data source not found")
     return db_source
@@ -128,4 +150,16 @@ async def get_source_objects(
         .limit(limit)\
         .all()
     
-    return objects 
\ No newline at end of file
+    return objects 
+@router.get("/{source_id}/health", response_model=IngestHealth)
+async def get_source_health(
+    source_id: str,
+    db: Session = Depends(get_db)
+):
+    """
+    Get last-seen time, message rate and error rate of a data source
+    """
+    data_source_service = DataSourceService(db)
+    if not data_source_service.get_data_source_by_id(source_id):
+        raise HTTPException(status_code=404, detail="Data source not found")
+    return HealthService(db).get_health(SOURCE, source_id)
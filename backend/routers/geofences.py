@@ -0,0 +1,77 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime
+from dependencies import get_db
+from schemas.all import Geofence, GeofenceCreate, GeofenceUpdate, GeofenceEvent
+from services.geofence_service import GeofenceService
+from uuid import uuid4
+
+router = APIRouter(
+    prefix="/geofences",
+    tags=["geofences"],
+    responses={404: {"description": "Not found"}},
+)
+
+@router.post("/", response_model=Geofence)
+def create_geofence(geofence: GeofenceCreate, db: Session = Depends(get_db)):
+    try:
+        return GeofenceService(db).create_geofence(dict(geofence.dict(), id=str(uuid4())))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/", response_model=List[Geofence])
+def get_geofences(
+    skip: int = 0,
+    limit: int = 100,
+    is_active: Optional[bool] = None,
+    db: Session = Depends(get_db)
+):
+    return GeofenceService(db).get_geofences(is_active=is_active, skip=skip, limit=limit)
+
+@router.get("/events", response_model=List[GeofenceEvent])
+def get_all_geofence_events(
+    object_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    return GeofenceService(db).get_events(tracked_object_id=object_id, since=since, limit=limit, offset=offset)
+
+@router.get("/{geofence_id}", response_model=Geofence)
+def get_geofence(geofence_id: str, db: Session = Depends(get_db)):
+    geofence = GeofenceService(db).get_geofence(geofence_id)
+    if geofence is None:
+        raise HTTPException(status_code=404, detail="Geofence not found")
+    return geofence
+
+@router.put("/{geofence_id}", response_model=Geofence)
+def update_geofence(geofence_id: str, geofence: GeofenceUpdate, db: Session = Depends(get_db)):
+    try:
+        updated = GeofenceService(db).update_geofence(geofence_id, geofence.dict(exclude_unset=True))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Geofence not found")
+    return updated
+
+@router.delete("/{geofence_id}")
+def delete_geofence(geofence_id: str, db: Session = Depends(get_db)):
+    if not GeofenceService(db).delete_geofence(geofence_id):
+        raise HTTPException(status_code=404, detail="Geofence not found")
+    return {"detail": "Geofence deleted"}
+
+@router.get("/{geofence_id}/events", response_model=List[GeofenceEvent])
+def get_geofence_events(
+    geofence_id: str,
+    object_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    service = GeofenceService(db)
+    if service.get_geofence(geofence_id) is None:
+        raise HTTPException(status_code=404, detail="Geofence not found")
+    return service.get_events(geofence_id=geofence_id, tracked_object_id=object_id, since=since, limit=limit, offset=offset)
@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import datetime
 from dependencies import get_db
-from schemas.all import DataValidationLog, DataValidationLogCreate, DataValidationLogUpdate
+from schemas.all import DataValidationLog, DataValidationLogCreate, DataValidationLogUpdate, DataValidationLogBulkFilter
 from models.all import DataValidationLog as DataValidationLogModel
 from uuid import uuid4
 
@@ -12,6 +15,42 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+def _parse_cursor(cursor: str):
+    """
+    Parse a "<created_at>,<id>" keyset pagination cursor
+    """
+    try:
+        created_at, log_id = cursor.split(",", 1)
+        return datetime.fromisoformat(created_at), log_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _bulk_query(db: Session, filters: DataValidationLogBulkFilter):
+    """
+    Build the query selecting the logs matched by a bulk filter
+    """
+    query = db.query(DataValidationLogModel)
+    
+    if filters.ids is not None:
+        query = query.filter(DataValidationLogModel.id.in_(filters.ids))
+    
+    if filters.log_type:
+        query = query.filter(DataValidationLogModel.log_type == filters.log_type)
+    
+    if filters.object_id:
+        query = query.filter(DataValidationLogModel.object_id == filters.object_id)
+    
+    if filters.sensor_id:
+        query = query.filter(DataValidationLogModel.sensor_id == filters.sensor_id)
+    
+    if filters.resolved is not None:
+        query = query.filter(DataValidationLogModel.resolved == filters.resolved)
+    
+    if filters.older_than:
+        query = query.filter(DataValidationLogModel.created_at < filters.older_than)
+    
+    return query
+
 @router.post("/", response_model=DataValidationLog)
 def create_log(log: DataValidationLogCreate, db: Session = Depends(get_db)):
     db_log = DataValidationLogModel(
@@ -30,14 +69,21 @@ def create_log(log: DataValidationLogCreate, db: Session = Depends(get_db)):
 
 @router.get("/", response_model=List[DataValidationLog])
 def get_logs(
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
     log_type: Optional[str] = None,
     object_id: Optional[str] = None,
     sensor_id: Optional[str] = None,
     resolved: Optional[bool] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
+    """
+    List logs newest first.
+    Pass the X-Next-Cursor header of a page as "cursor" to get the next page
+    without the cost of an offset.
+    """
     query = db.query(DataValidationLogModel)
     
     # Apply filters if provided
@@ -53,10 +99,50 @@ def get_logs(
     if resolved is not None:
         query = query.filter(DataValidationLogModel.resolved == resolved)
     
-    # Order by created_at (newest first)
-    query = query.order_by(DataValidationLogModel.created_at.desc())
+    if cursor:
+        cursor_created_at, cursor_id = _parse_cursor(cursor)
+        query = query.filter(
+            tuple_(DataValidationLogModel.created_at, DataValidationLogModel.id) < tuple_(cursor_created_at, cursor_id)
+        )
+    
+    # Order by created_at (newest first), id breaks ties for keyset pagination
+    query = query.order_by(DataValidationLogModel.created_at.desc(), DataValidationLogModel.id.desc())
     
-    return query.offset(skip).limit(limit).all()
+    if not cursor and skip:
+        query = query.offset(skip)
+    
+    logs = query.limit(limit).all()
+    if len(logs) == limit:
+        last = logs[-1]
+        response.headers["X-Next-Cursor"] = f"{last.created_at.isoformat()},{last.id}"
+    
+    return logs
+
+@router.post("/bulk-resolve")
+def bulk_resolve_logs(filters: DataValidationLogBulkFilter, db: Session = Depends(get_db)):
+    """
+    Mark all logs matching the filter as resolved with a single UPDATE
+    """
+    if not filters.dict(exclude_none=True):
+        raise HTTPException(status_code=400, detail="At least one filter is required")
+    
+    updated = _bulk_query(db, filters).filter(DataValidationLogModel.resolved == False).update(
+        {DataValidationLogModel.resolved: True}, synchronize_session=False
+    )
+    db.commit()
+    return {"updated": updated}
+
+@router.post("/bulk-delete")
+def bulk_delete_logs(filters: DataValidationLogBulkFilter, db: Session = Depends(get_db)):
+    """
+    Delete all logs matching the filter with a single DELETE
+    """
+    if not filters.dict(exclude_none=True):
+        raise HTTPException(status_code=400, detail="At least one filter is required")
+    
+    deleted = _bulk_query(db, filters).delete(synchronize_session=False)
+    db.commit()
+    return {"deleted": deleted}
 
 @router.get("/{log_id}", response_model=DataValidationLog)
 def get_log(log_id: str, db: Session = Depends(get_db)):
@@ -76,7 +162,12 @@ def update_log(log_id: str, log: DataValidationLogUpdate, db: Session = Depends(
     for key, value in update_data.items():
         setattr(db_log, key, value)
     
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Reopening a log while newer occurrences are counted on another open row
+        db.rollback()
+        raise HTTPException(status_code=409, detail="An open log with the same fingerprint already exists")
     db.refresh(db_log)
     return db_log
 
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from dependencies import get_db
 from models.all import CustomObjectType as CustomObjectTypeModel, ObjectType
 from schemas.all import CustomObjectType, CustomObjectTypeCreate, CustomObjectTypeUpdate, IconOption, ColorOption
+from core.http_cache import response_cache, conditional_response, make_etag
+from core.serialization import dumps, models_to_dicts
 from uuid import uuid4
 import logging
 
@@ -48,27 +50,38 @@ AVAILABLE_COLORS = [
     {"name": "black", "displayName": "Black", "value": "#000000"},
 ]
 
+# The icon and color lists are static, so serialize them once
+ICONS_BODY = dumps(AVAILABLE_ICONS)
+ICONS_ETAG = make_etag(ICONS_BODY)
+COLORS_BODY = dumps(AVAILABLE_COLORS)
+COLORS_ETAG = make_etag(COLORS_BODY)
+STATIC_CACHE_CONTROL = "public, max-age=86400"
+
 @router.get("/", response_model=List[CustomObjectType])
 def get_object_types(
+    request: Request,
     skip: int = 0, 
     limit: int = 100,
     include_inactive: bool = False,
     db: Session = Depends(get_db)
 ):
-    query = db.query(CustomObjectTypeModel)
-    
-    if not include_inactive:
-        query = query.filter(CustomObjectTypeModel.is_active == True)
+    def build():
+        query = db.query(CustomObjectTypeModel)
+        
+        if not include_inactive:
+            query = query.filter(CustomObjectTypeModel.is_active == True)
+        
+        return models_to_dicts(query.offset(skip).limit(limit).all(), CustomObjectType)
     
-    return query.offset(skip).limit(limit).all()
+    return response_cache.respond(request, db, CustomObjectTypeModel, build)
 
 @router.get("/icons", response_model=List[IconOption])
-def get_available_icons():
-    return AVAILABLE_ICONS
+def get_available_icons(request: Request):
+    return conditional_response(request, ICONS_BODY, ICONS_ETAG, cache_control=STATIC_CACHE_CONTROL)
 
 @router.get("/colors", response_model=List[ColorOption])
-def get_available_colors():
-    return AVAILABLE_COLORS
+def get_available_colors(request: Request):
+    return conditional_response(request, COLORS_BODY, COLORS_ETAG, cache_control=STATIC_CACHE_CONTROL)
 
 @router.get("/{type_id}", response_model=CustomObjectType)
 def get_object_type(type_id: str, db: Session = Depends(get_db)):
@@ -90,6 +103,7 @@ def create_object_type(obj_type: CustomObjectTypeCreate, db: Session = Depends(g
                 setattr(existing, key, value)
             existing.is_active = True
             db.commit()
+            response_cache.invalidate(CustomObjectTypeModel.__tablename__)
             db.refresh(existing)
             return existing
     
@@ -106,6 +120,7 @@ def create_object_type(obj_type: CustomObjectTypeCreate, db: Session = Depends(g
         )
         db.add(db_type)
         db.commit()
+        response_cache.invalidate(CustomObjectTypeModel.__tablename__)
         db.refresh(db_type)
         return db_type
     except Exception as e:
@@ -125,6 +140,7 @@ def update_object_type(type_id: str, obj_type: CustomObjectTypeUpdate, db: Sessi
             setattr(db_type, key, value)
         
         db.commit()
+        response_cache.invalidate(CustomObjectTypeModel.__tablename__)
         db.refresh(db_type)
         return db_type
     except Exception as e:
@@ -141,6 +157,7 @@ def delete_object_type(type_id: str, db: Session = Depends(get_db)):
         # Soft delete by setting is_active to False
         db_type.is_active = False
         db.commit()
+        response_cache.invalidate(CustomObjectTypeModel.__tablename__)
         return {"detail": "Object type deactivated"}
     except Exception as e:
         db.rollback()
@@ -179,6 +196,7 @@ def initialize_default_types(db: Session = Depends(get_db)):
     
     if created_types:
         db.commit()
+        response_cache.invalidate(CustomObjectTypeModel.__tablename__)
         for t in created_types:
             db.refresh(t)
     
@@ -1,10 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import ORJSONResponse, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime
+from typing import List, Optional, Literal
+from datetime import datetime, timezone
 from dependencies import get_db
-from schemas.all import TrackedObject, TrackedObjectCreate, TrackedObjectUpdate, SensorData, SensorDataCreate, IncomingSensorData, DataValidationLogCreate, ObjectType, TrackedObjectWithTypeInfo
-from models.all import TrackedObject as TrackedObjectModel, SensorData as SensorDataModel, Sensor as SensorModel, DataValidationLog as DataValidationLogModel, CustomObjectType as CustomObjectTypeModel, DataSource as DataSourceModel
+from schemas.all import TrackedObject, TrackedObjectCreate, TrackedObjectUpdate, SensorData, SensorDataCreate, IncomingSensorData, DataValidationLogCreate, ObjectType, TrackedObjectWithTypeInfo, CustomObjectType, ObjectCluster, PredictedPosition, TrackedObjectDetail
+from models.all import TrackedObject as TrackedObjectModel, SensorData as SensorDataModel, Sensor as SensorModel, DataValidationLog as DataValidationLogModel, CustomObjectType as CustomObjectTypeModel, DataSource as DataSourceModel, ObjectState as ObjectStateModel
+from core.serialization import model_to_dict, models_to_dicts
+from core.compact import encode_positions
+from services.cluster_service import cluster_index, MAX_CLUSTER_ZOOM
+from services.ingest_service import IngestService
+from services.search_service import SearchService
+from services.history_service import HistoryStore
+from services.track_service import TrackService
+from services.snapshot_service import SnapshotService
+from services.admission_service import admission_controller, source_limits
+import msgpack
 from uuid import uuid4
 import logging
 
@@ -14,6 +26,34 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# Columns that can be requested from the map endpoint
+MAP_FIELDS = {
+    "id": TrackedObjectModel.id,
+    "object_id": TrackedObjectModel.object_id,
+    "name": TrackedObjectModel.name,
+    "type": TrackedObjectModel.type,
+    "source_id": TrackedObjectModel.source_id,
+    "latitude": ObjectStateModel.latitude,
+    "longitude": ObjectStateModel.longitude,
+    "altitude": ObjectStateModel.altitude,
+    "timestamp": ObjectStateModel.timestamp,
+}
+
+DEFAULT_MAP_FIELDS = ["id", "name", "type", "latitude", "longitude"]
+
+# SQLSTATE of unique constraint violations
+UNIQUE_VIOLATION = "23505"
+
+def _parse_bbox(bbox: str):
+    """
+    Parse a "min_lon,min_lat,max_lon,max_lat" bounding box string
+    """
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be min_lon,min_lat,max_lon,max_lat")
+    return min_lon, min_lat, max_lon, max_lat
+
 @router.post("/", response_model=TrackedObject)
 def create_object(object: TrackedObjectCreate, db: Session = Depends(get_db)):
     db_object = TrackedObjectModel(
@@ -25,7 +65,13 @@ def create_object(object: TrackedObjectCreate, db: Session = Depends(get_db)):
         source_id=object.source_id
     )
     db.add(db_object)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if getattr(e.orig, "pgcode", None) != UNIQUE_VIOLATION:
+            raise
+        raise HTTPException(status_code=409, detail="An object with this object_id and type already exists")
     db.refresh(db_object)
     return db_object
 
@@ -55,16 +101,118 @@ def get_objects(
         CustomObjectTypeModel.is_active == True
     ).all()
     
-    # Create a lookup dictionary
-    type_lookup = {t.name: t for t in custom_types}
+    # Create a lookup dictionary of pre-built type dicts
+    type_lookup = {t.name: model_to_dict(t, CustomObjectType) for t in custom_types}
     
-    # Add custom_type to each object
+    # Rows come straight from the database, so build the response dicts directly
+    # and skip response_model validation
+    content = []
     for obj in objects:
-        obj.custom_type = type_lookup.get(obj.type)
+        obj_data = model_to_dict(obj, TrackedObject)
+        obj_data["custom_type"] = type_lookup.get(obj.type)
+        content.append(obj_data)
+    
+    return ORJSONResponse(content=content)
+
+@router.get("/map")
+def get_objects_map(
+    fields: Optional[str] = None,
+    type: Optional[str] = None,
+    source_id: Optional[str] = None,
+    bbox: Optional[str] = None,
+    limit: int = 10000,
+    format: Literal["json", "compact", "msgpack"] = "json",
+    db: Session = Depends(get_db)
+):
+    """
+    Compact object positions for map views.
+    Only the requested columns are selected and each object is returned as an
+    array in the order given by "fields". The "compact" and "msgpack" formats
+    return columns with quantized coordinates and delta-encoded timestamps.
+    """
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else DEFAULT_MAP_FIELDS
+    unknown = [f for f in selected if f not in MAP_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    
+    query = db.query(*(MAP_FIELDS[f] for f in selected)).select_from(TrackedObjectModel).join(
+        ObjectStateModel, ObjectStateModel.tracked_object_id == TrackedObjectModel.id
+    )
+    
+    # Apply filters if provided
+    if type is not None:
+        query = query.filter(TrackedObjectModel.type == type)
+    
+    if source_id:
+        query = query.filter(TrackedObjectModel.source_id == source_id)
     
-    return objects
+    if bbox:
+        min_lon, min_lat, max_lon, max_lat = _parse_bbox(bbox)
+        query = query.filter(
+            ObjectStateModel.latitude.between(min_lat, max_lat),
+            ObjectStateModel.longitude.between(min_lon, max_lon)
+        )
+    
+    rows = [tuple(row) for row in query.limit(limit).all()]
+    
+    if format == "compact":
+        return ORJSONResponse(content=encode_positions(selected, rows))
+    if format == "msgpack":
+        return Response(
+            content=msgpack.packb(encode_positions(selected, rows), use_bin_type=True),
+            media_type="application/x-msgpack"
+        )
+    return ORJSONResponse(content={"fields": selected, "objects": rows})
 
-@router.get("/{object_id}", response_model=TrackedObjectWithTypeInfo)
+@router.get("/clusters", response_model=List[ObjectCluster])
+def get_object_clusters(
+    bbox: str,
+    zoom: int = Query(..., ge=0, le=MAX_CLUSTER_ZOOM),
+    type: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Grid clusters of current object positions with counts per type and centroid
+    """
+    clusters = cluster_index.get_clusters(db, zoom, _parse_bbox(bbox), type)
+    return ORJSONResponse(content=clusters)
+
+@router.get("/search", response_model=List[TrackedObject])
+def search_objects(
+    q: Optional[str] = None,
+    tag: List[str] = Query(default=[]),
+    type: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """
+    Search objects by name, external object ID and tag words with "q", and
+    filter by tags with one or more "tag=key:value" or "tag=key" parameters
+    """
+    if not q and not tag:
+        raise HTTPException(status_code=400, detail="Provide q or at least one tag")
+    
+    objects = SearchService(db).search(q=q, tags=tag, type=type, limit=limit, offset=skip)
+    return ORJSONResponse(content=models_to_dicts(objects, TrackedObject))
+
+@router.get("/snapshot")
+def get_objects_snapshot(
+    at: datetime,
+    bbox: Optional[str] = None,
+    type: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Last known position of every object at a past time, built from the
+    nearest earlier state checkpoint and the readings after it
+    """
+    if at.tzinfo is not None:
+        at = at.astimezone(timezone.utc).replace(tzinfo=None)
+    objects = SnapshotService(db).snapshot(at, _parse_bbox(bbox) if bbox else None, type)
+    return ORJSONResponse(content={"at": at, "objects": objects})
+
+@router.get("/{object_id}", response_model=TrackedObjectDetail)
 def get_object(object_id: str, db: Session = Depends(get_db)):
     db_object = db.query(TrackedObjectModel).filter(TrackedObjectModel.id == object_id).first()
     if db_object is None:
@@ -79,7 +227,7 @@ def get_object(object_id: str, db: Session = Depends(get_db)):
     db_object.custom_type = custom_type
     return db_object
 
-@router.get("/by-object-id/{external_object_id}", response_model=TrackedObjectWithTypeInfo)
+@router.get("/by-object-id/{external_object_id}", response_model=TrackedObjectDetail)
 def get_object_by_external_id(external_object_id: str, db: Session = Depends(get_db)):
     db_object = db.query(TrackedObjectModel).filter(TrackedObjectModel.object_id == external_object_id).first()
     if db_object is None:
@@ -105,7 +253,14 @@ def update_object(object_id: str, object: TrackedObjectUpdate, db: Session = Dep
     for key, value in update_data.items():
         setattr(db_object, key, value)
     
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError as e:
+        # Changing the type can collide with another object of the same object_id
+        db.rollback()
+        if getattr(e.orig, "pgcode", None) != UNIQUE_VIOLATION:
+            raise
+        raise HTTPException(status_code=409, detail="An object with this object_id and type already exists")
     db.refresh(db_object)
     return db_object
 
@@ -127,26 +282,20 @@ def add_sensor_data(object_id: str, data: SensorDataCreate, db: Session = Depend
     if db_object is None:
         raise HTTPException(status_code=404, detail="Object not found")
     
-    # Create and add sensor data
-    db_data = SensorDataModel(
-        id=str(uuid4()),
-        tracked_object_id=object_id,
+    # Try to associate with a known sensor if it exists
+    sensor = db.query(SensorModel).filter(SensorModel.sensor_id == data.raw_sensor_id).first()
+    
+    # Store the reading; resending the same reading returns the stored row
+    db_data, _ = IngestService(db).store_reading(
+        db_object,
         raw_sensor_id=data.raw_sensor_id,
+        sensor_id=sensor.id if sensor else None,
         latitude=data.latitude,
         longitude=data.longitude,
         altitude=data.altitude,
         additional_data=data.additional_data,
-        timestamp=data.timestamp or datetime.utcnow()
+        timestamp=data.timestamp
     )
-    
-    # Try to associate with a known sensor if it exists
-    sensor = db.query(SensorModel).filter(SensorModel.sensor_id == data.raw_sensor_id).first()
-    if sensor:
-        db_data.sensor_id = sensor.id
-    
-    db.add(db_data)
-    db.commit()
-    db.refresh(db_data)
     return db_data
 
 @router.get("/{object_id}/sensor-data", response_model=List[SensorData])
@@ -155,6 +304,7 @@ def get_object_sensor_data(
     skip: int = 0, 
     limit: int = 100,
     since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
     db: Session = Depends(get_db)
 ):
     # Verify object exists
@@ -162,137 +312,33 @@ def get_object_sensor_data(
     if db_object is None:
         raise HTTPException(status_code=404, detail="Object not found")
     
-    # Build the query
-    query = db.query(SensorDataModel).filter(SensorDataModel.tracked_object_id == object_id)
-    
-    # Apply time filter if provided
-    if since:
-        query = query.filter(SensorDataModel.timestamp >= since)
-    
-    # Get sensor data for this object
-    data = query.order_by(SensorDataModel.timestamp.desc()).offset(skip).limit(limit).all()
+    # Get the position history for this object
+    return HistoryStore(db).get_history(object_id, since=since, until=until, limit=limit, offset=skip)
+
+@router.get("/{object_id}/predicted", response_model=PredictedPosition)
+def get_predicted_position(
+    object_id: str,
+    at: Optional[datetime] = Query(None, description="Time to predict the position for, defaults to now"),
+    db: Session = Depends(get_db)
+):
+    # Verify object exists
+    db_object = db.query(TrackedObjectModel).filter(TrackedObjectModel.id == object_id).first()
+    if db_object is None:
+        raise HTTPException(status_code=404, detail="Object not found")
     
-    return data
+    if at is not None and at.tzinfo is not None:
+        at = at.astimezone(timezone.utc).replace(tzinfo=None)
+    prediction = TrackService(db).predict(object_id, at)
+    if prediction is None:
+        raise HTTPException(status_code=404, detail="No readings to predict from")
+    return dict(prediction, object_id=object_id)
 
 # Endpoint for handling incoming sensor data
 @router.post("/incoming-data", response_model=SensorData)
 def process_incoming_sensor_data(data: IncomingSensorData, db: Session = Depends(get_db)):
-    # Convert type to lowercase for consistency
-    object_type = data.object_type.lower().strip()
-    
-    # Check if we have styling for this type
-    # If not, we'll still process it - just without custom styling
-    custom_type = db.query(CustomObjectTypeModel).filter(
-        CustomObjectTypeModel.name == object_type,
-        CustomObjectTypeModel.is_active == True
-    ).first()
-    
-    if not custom_type:
-        # Log unknown type as informational - not stopping processing
-        # Process the data to make it JSON serializable
-        raw_data = data.dict()
-        if "timestamp" in raw_data and raw_data["timestamp"]:
-            raw_data["timestamp"] = raw_data["timestamp"].isoformat()
-            
-        log_entry = DataValidationLogModel(
-            id=str(uuid4()),
-            log_type="info",
-            message=f"No styling found for object type: {data.object_type}",
-            raw_data=raw_data,
-            object_id=data.object_id,
-            sensor_id=data.sensor_id
-        )
-        db.add(log_entry)
-        db.commit()
-    
-    # Check if sensor exists
-    sensor = db.query(SensorModel).filter(SensorModel.sensor_id == data.sensor_id).first()
-    sensor_id = sensor.id if sensor else None
-    
-    if not sensor:
-        # Log unknown sensor
-        # Process the data to make it JSON serializable
-        raw_data = data.dict()
-        if "timestamp" in raw_data and raw_data["timestamp"]:
-            raw_data["timestamp"] = raw_data["timestamp"].isoformat()
-            
-        log_entry = DataValidationLogModel(
-            id=str(uuid4()),
-            log_type="warning",
-            message=f"Unknown sensor ID: {data.sensor_id}",
-            raw_data=raw_data,
-            object_id=data.object_id,
-            sensor_id=data.sensor_id
-        )
-        db.add(log_entry)
-        db.commit()
-    
-    # Look for existing object with this object_id
-    tracked_object = db.query(TrackedObjectModel).filter(TrackedObjectModel.object_id == data.object_id).first()
-    
-    if tracked_object:
-        # Check for mismatched object information
-        if (data.object_name and tracked_object.name and data.object_name != tracked_object.name) or \
-           (object_type != tracked_object.type):
-            # Process the data to make it JSON serializable
-            raw_data = data.dict()
-            if "timestamp" in raw_data and raw_data["timestamp"]:
-                raw_data["timestamp"] = raw_data["timestamp"].isoformat()
-                
-            log_entry = DataValidationLogModel(
-                id=str(uuid4()),
-                log_type="warning",
-                message=f"Mismatched object information for object ID: {data.object_id}",
-                raw_data=raw_data,
-                object_id=data.object_id,
-                sensor_id=data.sensor_id
-            )
-            db.add(log_entry)
-            db.commit()
-            
-            # Continue processing but don't update the object
-    else:
-        # Get source_id from additional_data if available, otherwise use default
-        source_id = "auto_created"
-        if data.additional_data and "source" in data.additional_data:
-            # Try to find a data source with this name
-            source_name = data.additional_data["source"]
-            data_source = db.query(DataSourceModel).filter(DataSourceModel.name == source_name).first()
-            if data_source:
-                source_id = data_source.id
-            else:
-                # Look for data sources with this name in their description
-                data_source = db.query(DataSourceModel).filter(DataSourceModel.description.ilike(f"%{source_name}%")).first()
-                if data_source:
-                    source_id = data_source.id
-        
-        # Create new tracked object
-        tracked_object = TrackedObjectModel(
-            id=str(uuid4()),
-            object_id=data.object_id,
-            name=data.object_name,
-            type=object_type,
-            additional_info={},
-            source_id=source_id
-        )
-        db.add(tracked_object)
-        db.commit()
-        db.refresh(tracked_object)
-    
-    # Create sensor data entry
-    sensor_data = SensorDataModel(
-        id=str(uuid4()),
-        tracked_object_id=tracked_object.id,
-        sensor_id=sensor_id,
-        raw_sensor_id=data.sensor_id,
-        latitude=data.latitude,
-        longitude=data.longitude,
-        altitude=data.altitude,
-        additional_data=data.additional_data,
-        timestamp=data.timestamp or datetime.utcnow()
-    )
-    db.add(sensor_data)
-    db.commit()
-    db.refresh(sensor_data)
-    
-    return sensor_data 
\ No newline at end of file
+    # Limits apply to the data source named in additional_data, if any. The
+    # name is only claimed by the client, so it gets no critical capacity.
+    source = source_limits.by_name(db, (data.additional_data or {}).get("source"))
+    with admission_controller.admit(source, data.sensor_id, claimed=True):
+        # Duplicate deliveries of a reading return the already stored row
+        return IngestService(db).process_incoming(data)
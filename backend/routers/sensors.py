@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Literal
 from dependencies import get_db
-from schemas.all import Sensor, SensorCreate, SensorUpdate
+from schemas.all import Sensor, SensorCreate, SensorUpdate, IngestHealth
 from models.all import Sensor as SensorModel
+from core.http_cache import response_cache
+from core.serialization import models_to_dicts
+from services.fusion_service import sensor_registry
+from services.health_service import HealthService, SENSOR
 from uuid import uuid4
 
 router = APIRouter(
@@ -26,31 +30,52 @@ def create_sensor(sensor: SensorCreate, db: Session = Depends(get_db)):
         name=sensor.name,
         description=sensor.description,
         type=sensor.type,
+        accuracy=sensor.accuracy,
         is_active=sensor.is_active
     )
     db.add(db_sensor)
     db.commit()
+    response_cache.invalidate(SensorModel.__tablename__)
+    sensor_registry.invalidate()
     db.refresh(db_sensor)
     return db_sensor
 
 @router.get("/", response_model=List[Sensor])
 def get_sensors(
+    request: Request,
     skip: int = 0, 
     limit: int = 100, 
     is_active: Optional[bool] = None,
     type: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    query = db.query(SensorModel)
+    def build():
+        query = db.query(SensorModel)
+        
+        # Apply filters if provided
+        if is_active is not None:
+            query = query.filter(SensorModel.is_active == is_active)
+        
+        if type:
+            query = query.filter(SensorModel.type == type)
+        
+        return models_to_dicts(query.offset(skip).limit(limit).all(), Sensor)
     
-    # Apply filters if provided
-    if is_active is not None:
-        query = query.filter(SensorModel.is_active == is_active)
-    
-    if type:
-        query = query.filter(SensorModel.type == type)
-    
-    return query.offset(skip).limit(limit).all()
+    return response_cache.respond(request, db, SensorModel, build)
+
+@router.get("/health", response_model=List[IngestHealth])
+def get_fleet_health(
+    kind: Optional[Literal["sensor", "source"]] = None,
+    stale: Optional[bool] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """
+    Last-seen time, message rate and error rate of every sensor and data
+    source that has reported, longest silent first
+    """
+    return HealthService(db).list_health(kind=kind, stale=stale, skip=skip, limit=limit)
 
 @router.get("/{sensor_id}", response_model=Sensor)
 def get_sensor(sensor_id: str, db: Session = Depends(get_db)):
@@ -59,6 +84,13 @@ def get_sensor(sensor_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Sensor not found")
     return db_sensor
 
+@router.get("/{sensor_id}/health", response_model=IngestHealth)
+def get_sensor_health(sensor_id: str, db: Session = Depends(get_db)):
+    db_sensor = db.query(SensorModel).filter(SensorModel.id == sensor_id).first()
+    if db_sensor is None:
+        raise HTTPException(status_code=404, detail="Sensor not found")
+    return HealthService(db).get_health(SENSOR, db_sensor.sensor_id)
+
 @router.get("/by-sensor-id/{external_sensor_id}", response_model=Sensor)
 def get_sensor_by_external_id(external_sensor_id: str, db: Session = Depends(get_db)):
     db_sensor = db.query(SensorModel).filter(SensorModel.sensor_id == external_sensor_id).first()
@@ -78,6 +110,8 @@ def update_sensor(sensor_id: str, sensor: SensorUpdate, db: Session = Depends(ge
         setattr(db_sensor, key, value)
     
     db.commit()
+    response_cache.invalidate(SensorModel.__tablename__)
+    sensor_registry.invalidate()
     db.refresh(db_sensor)
     return db_sensor
 
@@ -89,4 +123,6 @@ def delete_sensor(sensor_id: str, db: Session = Depends(get_db)):
     
     db.delete(db_sensor)
     db.commit()
+    response_cache.invalidate(SensorModel.__tablename__)
+    sensor_registry.invalidate()
     return {"detail": "Sensor deleted"} 
\ No newline at end of file
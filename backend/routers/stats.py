@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Literal, Optional
+from datetime import datetime
+from dependencies import get_db
+from schemas.all import ReadingCounts, ObjectSummaries
+from models.all import TrackedObject as TrackedObjectModel
+from services.rollup_service import RollupService
+
+router = APIRouter(
+    prefix="/stats",
+    tags=["stats"],
+    responses={404: {"description": "Not found"}},
+)
+
+@router.get("/readings", response_model=ReadingCounts)
+def get_reading_counts(
+    interval: Literal["minute", "hour", "day"] = "hour",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    group_by: List[Literal["source_id", "type", "sensor_id"]] = Query([]),
+    source_id: Optional[str] = None,
+    type: Optional[str] = None,
+    sensor_id: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Count readings per interval, optionally split by source, object type and sensor.
+    Answered from the coarsest rollup that matches the interval and range.
+    """
+    return RollupService(db).reading_counts(
+        interval, since=since, until=until, group_by=list(dict.fromkeys(group_by)),
+        source_id=source_id, type=type, sensor_id=sensor_id
+    )
+
+@router.get("/objects/{object_id}", response_model=ObjectSummaries)
+def get_object_summaries(
+    object_id: str,
+    interval: Literal["hour", "day"] = "hour",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Per-interval reading count, time span, extent and mean position of an object
+    """
+    db_object = db.query(TrackedObjectModel).filter(TrackedObjectModel.id == object_id).first()
+    if db_object is None:
+        raise HTTPException(status_code=404, detail="Object not found")
+    return RollupService(db).object_summaries(object_id, interval, since=since, until=until)
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from dependencies import get_db
+from services.tile_service import TileService
+
+router = APIRouter(
+    prefix="/tiles",
+    tags=["tiles"],
+    responses={404: {"description": "Not found"}},
+)
+
+MAX_ZOOM = 22
+
+@router.get("/{z}/{x}/{y}.mvt")
+def get_tile(
+    z: int,
+    x: int,
+    y: int,
+    type: Optional[str] = None,
+    source_id: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Get a Mapbox Vector Tile of current object positions.
+    Objects are in the "objects" layer and are clustered at low zoom levels.
+    """
+    if not 0 <= z <= MAX_ZOOM or not 0 <= x < (1 << z) or not 0 <= y < (1 << z):
+        raise HTTPException(status_code=404, detail="Tile not found")
+    
+    tile = TileService(db).get_tile(z, x, y, type, source_id)
+    return Response(content=tile, media_type="application/vnd.mapbox-vector-tile")
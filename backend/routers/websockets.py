@@ -1,12 +1,19 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
 from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import datetime, timezone
+import asyncio
 import json
 import logging
 
+from config import settings
+from database import SessionLocal
 from dependencies import get_db
 from core.websocket import websocket_manager
 from models.all import TrackedObject, DataSource
 from services.data_source_service import DataSourceService
+from services.snapshot_service import SnapshotService
+from services.admission_service import admission_controller, source_limits, RateLimited
 
 router = APIRouter(
     prefix="/api/ws",
@@ -15,15 +22,24 @@ router = APIRouter(
 
 logger = logging.getLogger(__name__)
 
+@router.get("/stats")
+async def get_websocket_stats():
+    """
+    Open connections of this worker and the memory held in their send queues
+    """
+    return websocket_manager.stats()
+
 @router.websocket("/objects/{client_id}")
 async def websocket_objects_endpoint(websocket: WebSocket, client_id: str, db: Session = Depends(get_db)):
     """
     WebSocket endpoint for real-time updates on tracked objects
     """
-    await websocket_manager.connect(websocket, client_id)
+    connection = await websocket_manager.connect(websocket, client_id)
+    if connection is None:
+        return
     try:
         while True:
-            data = await websocket.receive_text()
+            data = await websocket_manager.receive_text(connection)
             try:
                 json_data = json.loads(data)
                 
@@ -33,7 +49,7 @@ async def websocket_objects_endpoint(websocket: WebSocket, client_id: str, db: S
                 if message_type == "subscribe":
                     # Client is subscribing to updates for specific object types
                     object_types = json_data.get("object_types", [])
-                    await websocket.send_json({
+                    await websocket_manager.send(connection, {
                         "type": "subscribe_ack",
                         "message": f"Subscribed to updates for {', '.join(object_types) or 'all'} objects"
                     })
@@ -61,28 +77,29 @@ async def websocket_objects_endpoint(websocket: WebSocket, client_id: str, db: S
                         for obj in objects
                     ]
                     
-                    await websocket.send_json({
+                    await websocket_manager.send(connection, {
                         "type": "objects_data",
                         "objects": objects_data
                     })
                 
                 else:
                     # Unknown message type
-                    await websocket.send_json({
+                    await websocket_manager.send(connection, {
                         "type": "error",
                         "message": f"Unknown message type: {message_type}"
                     })
                     
             except json.JSONDecodeError:
                 logger.error(f"Invalid JSON received from client {client_id}")
-                await websocket.send_json({
+                await websocket_manager.send(connection, {
                     "type": "error",
                     "message": "Invalid JSON format"
                 })
             
     except WebSocketDisconnect:
-        websocket_manager.disconnect(client_id)
         logger.info(f"Client {client_id} disconnected")
+    finally:
+        websocket_manager.disconnect(connection)
 
 @router.websocket("/data-source/{source_id}/{client_id}")
 async def websocket_data_source_endpoint(
@@ -107,38 +124,172 @@ async def websocket_data_source_endpoint(
         return
     
     data_source_service = DataSourceService(db)
-    await websocket_manager.connect(websocket, f"source_{source_id}_{client_id}")
+    connection = await websocket_manager.connect(websocket, f"source_{source_id}_{client_id}")
+    if connection is None:
+        return
     
     try:
         while True:
-            data = await websocket.receive_text()
+            data = await websocket_manager.receive_text(connection)
             try:
                 json_data = json.loads(data)
                 
                 # Process incoming data using the service
-                tracked_object = await data_source_service.process_incoming_data(source_id, json_data)
+                with admission_controller.admit(source_limits.by_id(db, source_id), json_data.get("sensor_id")):
+                    tracked_object = await data_source_service.process_incoming_data(source_id, json_data)
                 
                 if tracked_object:
                     # Send acknowledgment
-                    await websocket.send_json({
+                    await websocket_manager.send(connection, {
                         "type": "ack",
                         "message": "Data processed successfully",
                         "object_id": tracked_object.id
                     })
                 else:
                     # Failed to process data
-                    await websocket.send_json({
+                    await websocket_manager.send(connection, {
                         "type": "error",
                         "message": "Failed to process data"
                     })
                 
+            except RateLimited as e:
+                await websocket_manager.send(connection, {
+                    "type": "error",
+                    "message": e.detail,
+                    "retry_after": e.retry_after
+                })
             except json.JSONDecodeError:
                 logger.error(f"Invalid JSON received from data source {source_id}")
-                await websocket.send_json({
+                await websocket_manager.send(connection, {
                     "type": "error",
                     "message": "Invalid JSON format"
                 })
     
     except WebSocketDisconnect:
-        websocket_manager.disconnect(f"source_{source_id}_{client_id}")
-        logger.info(f"Data source {source_id} client {client_id} disconnected") 
\ No newline at end of file
+        logger.info(f"Data source {source_id} client {client_id} disconnected")
+    finally:
+        websocket_manager.disconnect(connection) 
+
+def _replay_message(row) -> dict:
+    """
+    A replayed reading in the live object_update format
+    """
+    return {
+        "type": "object_update",
+        "object_id": row.tracked_object_id,
+        "data": {
+            "id": row.tracked_object_id,
+            "object_id": row.object_id,
+            "type": row.type,
+            "additional_info": row.additional_info,
+            "source_id": row.source_id,
+            "latitude": row.latitude,
+            "longitude": row.longitude,
+            "altitude": row.altitude,
+            "timestamp": row.timestamp,
+        }
+    }
+
+def _naive_utc(moment: datetime) -> datetime:
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+@router.websocket("/replay/{client_id}")
+async def websocket_replay_endpoint(
+    websocket: WebSocket,
+    client_id: str,
+    since: datetime,
+    until: Optional[datetime] = None,
+    speed: float = 1.0,
+    bbox: Optional[str] = None,
+    type: Optional[str] = None
+):
+    """
+    WebSocket endpoint replaying recorded movement.
+    Sends a "snapshot" of all positions at "since", then every later reading as
+    an object_update, spaced by the original time gaps divided by "speed".
+    Clients can send {"type": "speed", "speed": x}, {"type": "pause"} and
+    {"type": "resume"} while the replay runs.
+    """
+    since = _naive_utc(since)
+    until = _naive_utc(until) if until else datetime.utcnow()
+    try:
+        bounds = tuple(float(v) for v in bbox.split(",")) if bbox else None
+        if bounds is not None and len(bounds) != 4:
+            raise ValueError
+    except ValueError:
+        await websocket.close(code=1008, reason="bbox must be min_lon,min_lat,max_lon,max_lat")
+        return
+
+    # Replays only carry their own messages, not live broadcasts
+    connection = await websocket_manager.connect(websocket, f"replay_{client_id}", subscribed=False)
+    if connection is None:
+        return
+    control = {"speed": min(max(speed, 0.01), settings.REPLAY_MAX_SPEED)}
+    running = asyncio.Event()
+    running.set()
+
+    async def receive_controls():
+        while True:
+            try:
+                message = json.loads(await websocket_manager.receive_text(connection))
+            except json.JSONDecodeError:
+                continue
+            except WebSocketDisconnect:
+                # Wake a paused replay so it notices the disconnect
+                running.set()
+                return
+            message_type = message.get("type")
+            if message_type == "speed":
+                try:
+                    control["speed"] = min(max(float(message.get("speed")), 0.01), settings.REPLAY_MAX_SPEED)
+                except (TypeError, ValueError):
+                    pass
+            elif message_type == "pause":
+                running.clear()
+            elif message_type == "resume":
+                running.set()
+
+    def load(method, *args, **kwargs):
+        # Replays run for minutes, so each page uses its own short-lived session
+        db = SessionLocal()
+        try:
+            return getattr(SnapshotService(db), method)(*args, **kwargs)
+        finally:
+            db.close()
+
+    receiver = asyncio.create_task(receive_controls())
+    try:
+        objects = await asyncio.to_thread(load, "snapshot", since, bounds, type)
+        await websocket_manager.send(connection, {"type": "snapshot", "at": since, "objects": objects})
+
+        # Readings at "since" are already part of the snapshot
+        position = (since, "ffffffff-ffff-ffff-ffff-ffffffffffff")
+        previous = since
+        while not receiver.done() and not connection.closed:
+            rows = await asyncio.to_thread(
+                load, "replay_page", position, until, bounds, type, limit=settings.REPLAY_PAGE_SIZE
+            )
+            for row in rows:
+                delay = (row.timestamp - previous).total_seconds() / control["speed"]
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await running.wait()
+                if receiver.done() or connection.closed:
+                    break
+                await websocket_manager.send(connection, _replay_message(row))
+                previous = row.timestamp
+            if len(rows) < settings.REPLAY_PAGE_SIZE:
+                break
+            position = (rows[-1].timestamp, rows[-1].id)
+
+        if not receiver.done() and not connection.closed:
+            await websocket_manager.send(connection, {"type": "replay_complete", "until": until.isoformat()})
+            await websocket_manager.close(connection)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        websocket_manager.disconnect(connection)
+        logger.info(f"Replay client {client_id} finished")
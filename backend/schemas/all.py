@@ -44,6 +44,7 @@ class SensorBase(BaseModel):
     name: str
     description: Optional[str] = None
     type: str
+    accuracy: Optional[float] = Field(None, gt=0)  # Metres, one standard deviation
     is_active: bool = True
 
 class SensorCreate(SensorBase):
@@ -53,6 +54,7 @@ class SensorUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
     type: Optional[str] = None
+    accuracy: Optional[float] = Field(None, gt=0)
     is_active: Optional[bool] = None
 
 class Sensor(SensorBase):
@@ -70,6 +72,10 @@ class DataSourceBase(BaseModel):
     type: str  # "websocket", "rest", etc.
     connection_info: Dict[str, Any]
     is_active: bool = True
+    rate_limit: Optional[float] = Field(None, gt=0)  # Readings per second
+    rate_limit_burst: Optional[int] = Field(None, ge=1)
+    sensor_rate_limit: Optional[float] = Field(None, gt=0)  # Readings per second per sensor
+    is_critical: bool = False
 
 class DataSourceCreate(DataSourceBase):
     pass
@@ -80,6 +86,10 @@ class DataSourceUpdate(BaseModel):
     type: Optional[str] = None
     connection_info: Optional[Dict[str, Any]] = None
     is_active: Optional[bool] = None
+    rate_limit: Optional[float] = Field(None, gt=0)
+    rate_limit_burst: Optional[int] = Field(None, ge=1)
+    sensor_rate_limit: Optional[float] = Field(None, gt=0)
+    is_critical: Optional[bool] = None
 
 class DataSource(DataSourceBase):
     id: str
@@ -118,6 +128,31 @@ class TrackedObject(TrackedObjectBase):
 class TrackedObjectWithTypeInfo(TrackedObject):
     custom_type: Optional[CustomObjectType] = None
 
+# Current position of an object with metrics derived from its movement
+class ObjectState(BaseModel):
+    latitude: float
+    longitude: float
+    altitude: Optional[float] = None
+    timestamp: Optional[datetime] = None
+    speed: Optional[float] = None  # m/s
+    heading: Optional[float] = None  # Degrees clockwise from north
+    distance_total: float = 0.0  # Metres
+    dwell_seconds: float = 0.0
+
+    class Config:
+        from_attributes = True
+
+# Single object with its current state
+class TrackedObjectDetail(TrackedObjectWithTypeInfo):
+    state: Optional[ObjectState] = None
+
+# Aggregated object positions for zoomed-out map views
+class ObjectCluster(BaseModel):
+    latitude: float
+    longitude: float
+    count: int
+    types: Dict[str, int]
+
 # Sensor Data schemas
 class SensorDataBase(BaseModel):
     tracked_object_id: str
@@ -166,9 +201,113 @@ class DataValidationLogCreate(DataValidationLogBase):
 class DataValidationLogUpdate(BaseModel):
     resolved: Optional[bool] = None
 
+# Filter selecting the logs affected by a bulk resolve or delete
+class DataValidationLogBulkFilter(BaseModel):
+    ids: Optional[List[str]] = None
+    log_type: Optional[Literal["error", "warning", "info"]] = None
+    object_id: Optional[str] = None
+    sensor_id: Optional[str] = None
+    resolved: Optional[bool] = None
+    older_than: Optional[datetime] = None
+
 class DataValidationLog(DataValidationLogBase):
     id: str
     created_at: datetime
+    count: int = 1
+    first_seen: Optional[datetime] = None
+    last_seen: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+# Estimated position from the object's track
+class PredictedPosition(BaseModel):
+    object_id: str
+    latitude: float
+    longitude: float
+    timestamp: datetime
+    speed: float  # m/s
+    heading: float  # Degrees clockwise from north
+    position_error: float  # One standard deviation, metres
+    last_update: datetime  # Time of the last reading applied to the track
+
+# Rollup query results
+class ReadingCountBucket(BaseModel):
+    bucket: datetime
+    count: int
+    source_id: Optional[str] = None
+    type: Optional[str] = None
+    sensor_id: Optional[str] = None
+
+class ReadingCounts(BaseModel):
+    granularity: str  # Rollup the answer was read from
+    processed_until: Optional[datetime] = None  # Readings inserted later are not counted yet
+    buckets: List[ReadingCountBucket]
+
+class ObjectSummaryBucket(BaseModel):
+    bucket: datetime
+    count: int
+    first_timestamp: datetime
+    last_timestamp: datetime
+    min_latitude: float
+    max_latitude: float
+    min_longitude: float
+    max_longitude: float
+    mean_latitude: float
+    mean_longitude: float
+
+class ObjectSummaries(BaseModel):
+    granularity: str
+    processed_until: Optional[datetime] = None
+    buckets: List[ObjectSummaryBucket]
+
+# Geofence schemas
+class GeofenceBase(BaseModel):
+    name: str
+    description: Optional[str] = None
+    # GeoJSON Polygon rings of [longitude, latitude] pairs, holes after the outline
+    coordinates: List[List[List[float]]] = Field(..., min_length=1)
+    is_active: bool = True
+
+class GeofenceCreate(GeofenceBase):
+    pass
+
+class GeofenceUpdate(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    coordinates: Optional[List[List[List[float]]]] = Field(None, min_length=1)
+    is_active: Optional[bool] = None
+
+class Geofence(GeofenceBase):
+    id: str
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class GeofenceEvent(BaseModel):
+    id: str
+    geofence_id: str
+    tracked_object_id: str
+    event: Literal["enter", "exit"]
+    latitude: float
+    longitude: float
+    timestamp: datetime
+
+    class Config:
+        from_attributes = True
+
+class IngestHealth(BaseModel):
+    kind: Literal["sensor", "source"]
+    key: str
+    last_seen: Optional[datetime] = None
+    message_count: int = 0
+    error_count: int = 0
+    message_rate: float = 0.0  # Messages per second
+    error_rate: float = 0.0  # Share of messages with validation problems
+    is_stale: bool = False
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -0,0 +1,232 @@
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from collections import OrderedDict
+from contextlib import contextmanager
+import abc
+import threading
+import time
+
+from config import settings
+from models.all import DataSource
+
+class RateLimited(Exception):
+    """
+    Raised when a reading is not admitted. Answered with status_code and a
+    Retry-After header by the handler registered in main.
+    """
+    def __init__(self, detail: str, retry_after: float, status_code: int = 429):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+class SourceLimits(NamedTuple):
+    id: str
+    name: str
+    rate_limit: Optional[float]
+    rate_limit_burst: Optional[int]
+    sensor_rate_limit: Optional[float]
+    is_critical: bool
+
+class SourceLimitRegistry:
+    """
+    In-memory copy of the rate limit settings of all data sources, by ID and
+    by name. Reloaded after invalidate() and after RATE_LIMIT_CACHE_SECONDS
+    so admission never queries data_sources per reading.
+    """
+    def __init__(self, reload_seconds: float):
+        self.reload_seconds = reload_seconds
+        self._by_id: Dict[str, SourceLimits] = {}
+        self._by_name: Dict[str, SourceLimits] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """
+        Reload the data sources on next use
+        """
+        with self._lock:
+            self._loaded_at = None
+
+    def refresh(self, db: Session):
+        """
+        Reload the data sources if the copy is missing or out of date
+        """
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at <= self.reload_seconds:
+                return
+            rows = db.query(
+                DataSource.id, DataSource.name, DataSource.rate_limit, DataSource.rate_limit_burst,
+                DataSource.sensor_rate_limit, DataSource.is_critical
+            ).all()
+            sources = [SourceLimits(*row[:5], bool(row.is_critical)) for row in rows]
+            self._by_id = {source.id: source for source in sources}
+            self._by_name = {source.name: source for source in sources}
+            self._loaded_at = time.monotonic()
+
+    def by_id(self, db: Session, source_id: Optional[str]) -> Optional[SourceLimits]:
+        self.refresh(db)
+        return self._by_id.get(source_id) if source_id else None
+
+    def by_name(self, db: Session, name: Optional[str]) -> Optional[SourceLimits]:
+        self.refresh(db)
+        return self._by_name.get(name) if name else None
+
+# Create a singleton instance
+source_limits = SourceLimitRegistry(settings.RATE_LIMIT_CACHE_SECONDS)
+
+class TokenBucketStore(abc.ABC):
+    """
+    Where token bucket state lives. Callers only use take(), so a store shared
+    by all workers (for example Redis running the same refill-and-take step
+    as a script) can replace LocalTokenBucketStore without other changes.
+    """
+    @abc.abstractmethod
+    def take(self, buckets: List[Tuple[str, float, float]]) -> float:
+        """
+        Take one token from each (key, rate, burst) bucket, refilling at rate
+        per second up to burst, or from none of them if any is empty.
+        Returns 0 when the tokens were taken, otherwise the seconds until
+        every bucket has one.
+        """
+
+class LocalTokenBucketStore(TokenBucketStore):
+    """
+    Token buckets in this process, standing in for shared state.
+    Each of the workers enforces 1/workers of every rate and burst, which
+    adds up to the configured limits when load is spread evenly.
+    At most max_keys buckets are kept; the least recently used is dropped,
+    which only lets its next reading start from a full bucket.
+    """
+    def __init__(self, workers: int, max_keys: int):
+        self.share = 1.0 / max(workers, 1)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()  # key -> [tokens, last refill]
+        self._lock = threading.Lock()
+
+    def take(self, buckets: List[Tuple[str, float, float]]) -> float:
+        now = time.monotonic()
+        with self._lock:
+            refilled = []
+            for key, rate, burst in buckets:
+                rate *= self.share
+                # A share below one token would never admit anything
+                burst = max(burst * self.share, 1.0)
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = [burst, now]
+                    if len(self._buckets) > self.max_keys:
+                        self._buckets.popitem(last=False)
+                else:
+                    self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+                refilled.append((bucket, rate))
+
+            wait = max([(1.0 - bucket[0]) / rate for bucket, rate in refilled if bucket[0] < 1.0], default=0.0)
+            if not wait:
+                for bucket, _ in refilled:
+                    bucket[0] -= 1.0
+            return wait
+
+class AdmissionController:
+    """
+    Decides whether an incoming reading is processed.
+    Readings first need a token from their source's bucket and their
+    sensor's bucket, answered with 429 when empty. Admitted readings then
+    need one of max_in_flight processing slots, so a flood cannot take every
+    database connection; the last reserved_critical slots are only given to
+    critical sources, which keeps them responsive while the others are shed
+    with 503. Outcomes are counted per source and sensor, for at most
+    max_keys of each, the least recently seen are dropped.
+    """
+    def __init__(self, store: TokenBucketStore, max_in_flight: int, reserved_critical: int, max_keys: int):
+        self.store = store
+        self.max_in_flight = max_in_flight
+        self.reserved_critical = min(reserved_critical, max_in_flight)
+        self.max_keys = max_keys
+        self._in_flight = 0
+        self._stats: Dict[str, "OrderedDict[str, Dict[str, int]]"] = {"sources": OrderedDict(), "sensors": OrderedDict()}
+        self._lock = threading.Lock()
+
+    def _count(self, source_key: str, sensor_id: Optional[str], outcome: str):
+        with self._lock:
+            for group, key in (("sources", source_key), ("sensors", sensor_id)):
+                if key is None:
+                    continue
+                counts = self._stats[group]
+                stats = counts.get(key)
+                if stats is None:
+                    stats = counts[key] = {"admitted": 0, "limited": 0, "shed": 0}
+                    if len(counts) > self.max_keys:
+                        counts.popitem(last=False)
+                else:
+                    counts.move_to_end(key)
+                stats[outcome] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Admission counts per source and sensor, and current slot usage
+        """
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "reserved_critical": self.reserved_critical,
+                "sources": {key: dict(stats) for key, stats in self._stats["sources"].items()},
+                "sensors": {key: dict(stats) for key, stats in self._stats["sensors"].items()},
+            }
+
+    def _retry_after(self, source: Optional[SourceLimits], sensor_id: Optional[str], claimed: bool) -> float:
+        source_key = source.id if source else "unknown"
+        # Claims draw from their own bucket, so they cannot drain the source's
+        bucket_key = f"claimed:{source_key}" if claimed and source else source_key
+        buckets = []
+        if source is None:
+            rate = settings.RATE_LIMIT_UNKNOWN_PER_SECOND
+        else:
+            rate = source.rate_limit or settings.RATE_LIMIT_DEFAULT_PER_SECOND
+        if rate > 0:
+            burst = source.rate_limit_burst if source and source.rate_limit_burst else rate
+            buckets.append((f"source:{bucket_key}", rate, burst))
+        sensor_rate = source.sensor_rate_limit if source and source.sensor_rate_limit else settings.RATE_LIMIT_SENSOR_PER_SECOND
+        if sensor_id and sensor_rate > 0:
+            buckets.append((f"sensor:{bucket_key}:{sensor_id}", sensor_rate, sensor_rate))
+        return self.store.take(buckets) if buckets else 0.0
+
+    @contextmanager
+    def admit(self, source: Optional[SourceLimits], sensor_id: Optional[str] = None, claimed: bool = False):
+        """
+        Hold a processing slot for one reading, raises RateLimited when it is not admitted.
+        claimed marks a source named by the client rather than established by
+        the connection: it is limited separately and never gets the critical slots.
+        """
+        source_key = source.id if source else "unknown"
+        critical = bool(source and source.is_critical and not claimed)
+        with self._lock:
+            available = self.max_in_flight if critical else self.max_in_flight - self.reserved_critical
+            busy = self._in_flight >= available
+            if not busy:
+                self._in_flight += 1
+        if busy:
+            self._count(source_key, sensor_id, "shed")
+            raise RateLimited("Server busy, retry later", settings.INGEST_BUSY_RETRY_SECONDS, status_code=503)
+
+        try:
+            wait = self._retry_after(source, sensor_id, claimed)
+            if wait:
+                self._count(source_key, sensor_id, "limited")
+                raise RateLimited("Rate limit exceeded", wait)
+            self._count(source_key, sensor_id, "admitted")
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+# Create a singleton instance
+admission_controller = AdmissionController(
+    LocalTokenBucketStore(settings.WEB_CONCURRENCY, settings.RATE_LIMIT_MAX_KEYS),
+    settings.INGEST_MAX_IN_FLIGHT,
+    settings.INGEST_CRITICAL_RESERVED,
+    settings.RATE_LIMIT_MAX_KEYS
+)
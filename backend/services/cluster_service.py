@@ -0,0 +1,208 @@
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional, Tuple
+import math
+import threading
+import time
+
+import numpy as np
+
+from config import settings
+from models.all import TrackedObject, ObjectState
+
+MAX_CLUSTER_ZOOM = 20
+
+def cell_size(zoom: int) -> float:
+    """
+    Size in degrees of a cluster cell at a zoom level
+    """
+    return 360.0 / (1 << zoom) / settings.CLUSTER_CELLS_PER_TILE
+
+def _cell(latitude: float, longitude: float, size: float) -> Tuple[int, int]:
+    return math.floor((longitude + 180.0) / size), math.floor((latitude + 90.0) / size)
+
+class _Snapshot:
+    """
+    Positions of all objects as loaded, the moves received since and the
+    grids built from them
+    """
+    def __init__(self, rows: List[tuple], loaded_at: float):
+        self.objects: Dict[str, Tuple[float, float, str]] = {obj_id: (lat, lon, obj_type) for obj_id, lat, lon, obj_type in rows}
+        # Loaded positions as arrays, grids are aggregated from these
+        codes: Dict[str, int] = {}
+        self.latitudes = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+        self.longitudes = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+        self.type_codes = np.fromiter((codes.setdefault(row[3], len(codes)) for row in rows), dtype=np.int64, count=len(rows))
+        self.type_names = list(codes)
+        self.moved: Dict[str, Optional[Tuple[float, float, str]]] = {}  # Object -> loaded position, None if not loaded
+        self.grids: Dict[int, Dict[Tuple[int, int], Dict[str, List[float]]]] = {}
+        self.loaded_at = loaded_at
+
+    def move(self, object_id: str, position: Tuple[float, float, str]):
+        if object_id not in self.moved:
+            self.moved[object_id] = self.objects.get(object_id)
+        self.objects[object_id] = position
+
+    def aggregate(self, size: float) -> Dict[Tuple[int, int], Dict[str, List[float]]]:
+        """
+        Grid of the loaded positions with cells of size degrees
+        """
+        if not len(self.latitudes):
+            return {}
+        cells = np.stack([
+            np.floor((self.longitudes + 180.0) / size),
+            np.floor((self.latitudes + 90.0) / size),
+            self.type_codes,
+        ], axis=1).astype(np.int64)
+        keys, inverse = np.unique(cells, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        counts = np.bincount(inverse)
+        latitude_sums = np.bincount(inverse, weights=self.latitudes)
+        longitude_sums = np.bincount(inverse, weights=self.longitudes)
+
+        grid: Dict[Tuple[int, int], Dict[str, List[float]]] = {}
+        for (x, y, code), count, latitude_sum, longitude_sum in zip(keys.tolist(), counts.tolist(), latitude_sums.tolist(), longitude_sums.tolist()):
+            grid.setdefault((x, y), {})[self.type_names[code]] = [count, latitude_sum, longitude_sum]
+        return grid
+
+class ClusterIndex:
+    """
+    Grid aggregates of current object positions, one grid per zoom level.
+    Object positions are loaded with one query and a zoom's grid is
+    aggregated from them with NumPy the first time it is requested, then
+    kept up to date by update() as committed positions arrive. Everything is reloaded after
+    CLUSTER_RESYNC_SECONDS to pick up writes made by other workers.
+    Loading and building happen outside the lock update() takes; updates made
+    meanwhile are replayed onto the new data before it is swapped in.
+    """
+    def __init__(self, resync_seconds: float):
+        self.resync_seconds = resync_seconds
+        self._snapshot: Optional[_Snapshot] = None
+        # Updates received while a reload or grid build runs, as (object_id, previous, new)
+        self._pending: Optional[List[tuple]] = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()  # One reload or grid build at a time
+
+    def _reload(self, db: Session) -> _Snapshot:
+        with self._build_lock:
+            snapshot = self._snapshot
+            if snapshot is not None and time.monotonic() - snapshot.loaded_at <= self.resync_seconds:
+                # Reloaded by another request while this one waited
+                return snapshot
+            with self._lock:
+                self._pending = []
+            try:
+                rows = db.query(
+                    ObjectState.tracked_object_id, ObjectState.latitude, ObjectState.longitude, TrackedObject.type
+                ).join(TrackedObject, TrackedObject.id == ObjectState.tracked_object_id).all()
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+            snapshot = _Snapshot(rows, time.monotonic())
+
+            with self._lock:
+                for object_id, _, position in self._pending:
+                    snapshot.move(object_id, position)
+                self._pending = None
+                self._snapshot = snapshot
+            return snapshot
+
+    def _grid(self, snapshot: _Snapshot, zoom: int) -> Dict[Tuple[int, int], Dict[str, List[float]]]:
+        grid = snapshot.grids.get(zoom)
+        if grid is not None:
+            return grid
+        with self._build_lock:
+            grid = snapshot.grids.get(zoom)
+            if grid is not None:
+                return grid
+            with self._lock:
+                moves = [(previous, snapshot.objects[object_id]) for object_id, previous in snapshot.moved.items()]
+                self._pending = []
+
+            size = cell_size(zoom)
+            grid = snapshot.aggregate(size)
+            for previous, position in moves:
+                if previous is not None:
+                    self._add(grid, size, previous[0], previous[1], previous[2], -1)
+                self._add(grid, size, position[0], position[1], position[2], 1)
+
+            with self._lock:
+                for _, previous, position in self._pending:
+                    if previous is not None:
+                        self._add(grid, size, previous[0], previous[1], previous[2], -1)
+                    self._add(grid, size, position[0], position[1], position[2], 1)
+                self._pending = None
+                snapshot.grids[zoom] = grid
+            return grid
+
+    def _add(self, grid, size: float, latitude: float, longitude: float, obj_type: str, sign: int):
+        key = _cell(latitude, longitude, size)
+        types = grid.setdefault(key, {})
+        stats = types.setdefault(obj_type, [0, 0.0, 0.0])
+        stats[0] += sign
+        stats[1] += sign * latitude
+        stats[2] += sign * longitude
+        if stats[0] <= 0:
+            del types[obj_type]
+            if not types:
+                del grid[key]
+
+    def update(self, object_id: str, obj_type: str, latitude: float, longitude: float):
+        """
+        Move an object to its new position in every built grid.
+        Called once the position is committed.
+        """
+        position = (latitude, longitude, obj_type)
+        with self._lock:
+            snapshot = self._snapshot
+            previous = snapshot.objects.get(object_id) if snapshot is not None else None
+            if self._pending is not None:
+                self._pending.append((object_id, previous, position))
+            if snapshot is None:
+                return
+            for zoom, grid in snapshot.grids.items():
+                size = cell_size(zoom)
+                if previous is not None:
+                    self._add(grid, size, previous[0], previous[1], previous[2], -1)
+                self._add(grid, size, latitude, longitude, obj_type, 1)
+            snapshot.move(object_id, position)
+
+    def get_clusters(self, db: Session, zoom: int, bbox: Tuple[float, float, float, float], type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get the clusters whose cells intersect a bounding box
+        """
+        snapshot = self._snapshot
+        if snapshot is None or time.monotonic() - snapshot.loaded_at > self.resync_seconds:
+            snapshot = self._reload(db)
+        grid = self._grid(snapshot, zoom)
+
+        min_lon, min_lat, max_lon, max_lat = bbox
+        size = cell_size(zoom)
+        min_x, min_y = _cell(min_lat, min_lon, size)
+        max_x, max_y = _cell(max_lat, max_lon, size)
+
+        with self._lock:
+            # Walk whichever is smaller: the cells in the box or the populated cells
+            if (max_x - min_x + 1) * (max_y - min_y + 1) < len(grid):
+                keys = [(x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1) if (x, y) in grid]
+            else:
+                keys = [key for key in grid if min_x <= key[0] <= max_x and min_y <= key[1] <= max_y]
+
+            clusters = []
+            for key in keys:
+                types = grid[key]
+                if type is not None:
+                    types = {type: types[type]} if type in types else {}
+                count = sum(stats[0] for stats in types.values())
+                if not count:
+                    continue
+                clusters.append({
+                    "latitude": sum(stats[1] for stats in types.values()) / count,
+                    "longitude": sum(stats[2] for stats in types.values()) / count,
+                    "count": count,
+                    "types": {obj_type: stats[0] for obj_type, stats in types.items()},
+                })
+            return clusters
+
+# Create a singleton instance
+cluster_index = ClusterIndex(settings.CLUSTER_RESYNC_SECONDS)
@@ -0,0 +1,475 @@
+from sqlalchemy import text
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+import abc
+import asyncio
+import os
+import random
+import json
+import logging
+
+import httpx
+import websockets
+
+from config import settings
+from database import SessionLocal, engine
+from core.websocket import websocket_manager
+from models.all import DataSource
+from services.osm_service import OSMService
+from services.health_service import health_monitor
+
+logger = logging.getLogger(__name__)
+
+def _items(payload: Any, items_path: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Elements of a received payload: the object or list at a dotted path, or the payload itself
+    """
+    for part in (items_path or "").split("."):
+        if part and isinstance(payload, dict):
+            payload = payload.get(part)
+    if isinstance(payload, dict):
+        return [payload]
+    if isinstance(payload, list):
+        return [item for item in payload if isinstance(item, dict)]
+    return []
+
+def _to_element(item: Dict[str, Any], fields: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Map a received item to the element format of OSMService.process_elements.
+    fields maps element keys (osm_id, type, latitude, longitude, tags) to item keys.
+    """
+    if not fields:
+        return item
+    element = dict(item)
+    for key, item_key in fields.items():
+        if item_key in item:
+            element[key] = item[item_key]
+    return element
+
+def _check_url(url: str, schemes: tuple):
+    """
+    Check a source URL against CONNECTOR_ALLOWED_HOSTS, so sources cannot make
+    the backend request arbitrary internal addresses
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in schemes or not parts.hostname:
+        raise ValueError(f"url must be an absolute {' or '.join(schemes)} URL")
+    allowed = settings.CONNECTOR_ALLOWED_HOSTS
+    if "*" not in allowed and parts.hostname.lower() not in allowed:
+        raise ValueError(f"Host {parts.hostname} is not in CONNECTOR_ALLOWED_HOSTS")
+
+def _check_path(path: str) -> str:
+    """
+    Resolve a file-tail path inside CONNECTOR_FILE_ROOT, following symlinks
+    """
+    if not settings.CONNECTOR_FILE_ROOT:
+        raise ValueError("file-tail sources are disabled, CONNECTOR_FILE_ROOT is not set")
+    root = os.path.realpath(settings.CONNECTOR_FILE_ROOT)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError("path must be inside CONNECTOR_FILE_ROOT")
+    return resolved
+
+class Connector(abc.ABC):
+    """
+    Pulls elements from one data source and puts them on the source's queue.
+    Subclasses implement stream(); failures reconnect with exponential backoff
+    and jitter, reset once the source delivers again.
+    """
+    def __init__(self, source_id: str, connection_info: Dict[str, Any], queue: asyncio.Queue, max_concurrency: int):
+        self.source_id = source_id
+        self.max_concurrency = max_concurrency
+        self.info = connection_info or {}
+        self.queue = queue
+        self.fields = self.info.get("fields") or {}
+        self.check(self.info)
+
+    @classmethod
+    @abc.abstractmethod
+    def check(cls, connection_info: Dict[str, Any]):
+        """
+        Raise ValueError if the connection_info may not be pulled
+        """
+
+    @abc.abstractmethod
+    def stream(self) -> AsyncIterator[Any]:
+        """
+        Connect and yield received payloads until the connection fails
+        """
+
+    async def close(self):
+        pass
+
+    async def run(self):
+        delay = settings.CONNECTOR_BACKOFF_INITIAL_SECONDS
+        while True:
+            try:
+                async for payload in self.stream():
+                    delay = settings.CONNECTOR_BACKOFF_INITIAL_SECONDS
+                    for item in _items(payload, self.info.get("items_path")):
+                        # Waits while the source's batches are behind, pushing back on the source
+                        await self.queue.put(_to_element(item, self.fields))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                health_monitor.record_error(source_id=self.source_id)
+                logger.warning(f"Data source {self.source_id} failed, retrying in {delay:.0f}s: {str(e)}")
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            delay = min(delay * 2, settings.CONNECTOR_BACKOFF_MAX_SECONDS)
+
+class RestConnector(Connector):
+    """
+    Polls a JSON endpoint every interval_seconds.
+    connection_info: url, interval_seconds, headers, params, timeout, items_path, fields
+    """
+    locator = "url"
+    def __init__(self, source_id: str, connection_info: Dict[str, Any], queue: asyncio.Queue, max_concurrency: int):
+        super().__init__(source_id, connection_info, queue, max_concurrency)
+        # Pooled connections are reused between polls
+        self.client = httpx.AsyncClient(
+            headers=self.info.get("headers") or {},
+            timeout=float(self.info.get("timeout", 10)),
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+        )
+
+    @classmethod
+    def check(cls, connection_info: Dict[str, Any]):
+        _check_url(connection_info["url"], ("http", "https"))
+
+    async def stream(self):
+        interval = float(self.info.get("interval_seconds", 10))
+        while True:
+            response = await self.client.get(self.info["url"], params=self.info.get("params"))
+            response.raise_for_status()
+            yield response.json()
+            await asyncio.sleep(interval)
+
+    async def close(self):
+        await self.client.aclose()
+
+class WebSocketConnector(Connector):
+    """
+    Receives JSON messages from a WebSocket server.
+    connection_info: url, subscribe (message sent after connecting), items_path, fields
+    """
+    locator = "url"
+
+    @classmethod
+    def check(cls, connection_info: Dict[str, Any]):
+        _check_url(connection_info["url"], ("ws", "wss"))
+
+    async def stream(self):
+        async with websockets.connect(self.info["url"]) as connection:
+            if self.info.get("subscribe") is not None:
+                await connection.send(json.dumps(self.info["subscribe"]))
+            async for message in connection:
+                try:
+                    yield json.loads(message)
+                except json.JSONDecodeError:
+                    health_monitor.record_error(source_id=self.source_id)
+
+class FileTailConnector(Connector):
+    """
+    Follows a file of JSON lines as it grows, starting at its end unless
+    from_start is set. A truncated file, or a different file at the path
+    (by device and inode, as after log rotation), is read from the start.
+    connection_info: path (relative to CONNECTOR_FILE_ROOT), poll_seconds, from_start, items_path, fields
+    """
+    locator = "path"
+    def __init__(self, source_id: str, connection_info: Dict[str, Any], queue: asyncio.Queue, max_concurrency: int):
+        super().__init__(source_id, connection_info, queue, max_concurrency)
+        self.path = _check_path(self.info["path"])
+        # Kept across reconnects so a temporarily missing file is not read twice
+        self._offset: Optional[int] = None
+        self._file: Optional[Tuple[int, int]] = None  # (st_dev, st_ino) of the file the offset is in
+        self._remainder = b""
+
+    async def stream(self):
+        path = self.path
+        poll = float(self.info.get("poll_seconds", 1))
+        if self._offset is None:
+            stat = os.stat(path)
+            self._offset = 0 if self.info.get("from_start") else stat.st_size
+            self._file = (stat.st_dev, stat.st_ino)
+        while True:
+            stat = os.stat(path)
+            identity = (stat.st_dev, stat.st_ino)
+            if identity != self._file or stat.st_size < self._offset:
+                self._offset, self._file, self._remainder = 0, identity, b""
+            if stat.st_size > self._offset:
+                chunk = await asyncio.to_thread(self._read, path, identity, self._offset, stat.st_size - self._offset)
+                self._offset += len(chunk)
+                lines = (self._remainder + chunk).split(b"\n")
+                self._remainder = lines.pop()
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        health_monitor.record_error(source_id=self.source_id)
+            else:
+                await asyncio.sleep(poll)
+
+    @classmethod
+    def check(cls, connection_info: Dict[str, Any]):
+        _check_path(connection_info["path"])
+
+    @staticmethod
+    def _read(path: str, identity: Tuple[int, int], offset: int, length: int) -> bytes:
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if (stat.st_dev, stat.st_ino) != identity:
+                # Replaced since it was checked, the next poll starts on the new file
+                return b""
+            f.seek(offset)
+            return f.read(length)
+
+def _signature(source: Dict[str, Any]) -> tuple:
+    return source["type"], json.dumps(source["connection_info"], sort_keys=True, default=str)
+
+# Data source types that are pulled by the backend
+CONNECTOR_TYPES = {
+    "rest": RestConnector,
+    "websocket": WebSocketConnector,
+    "file-tail": FileTailConnector,
+}
+
+def check_connection_info(source_type: str, connection_info: Optional[Dict[str, Any]]):
+    """
+    Raise ValueError if a data source would be pulled from a location that is not allowed.
+    Sources without a URL or path push to us and are always accepted.
+    """
+    connector = CONNECTOR_TYPES.get(source_type)
+    if connector is not None and (connection_info or {}).get(connector.locator):
+        connector.check(connection_info)
+
+class SourceRunner:
+    """
+    The tasks of one pulled data source: its connector and the batcher that
+    drains its queue into the ingest pipeline, at most max_concurrency
+    batches at a time.
+    """
+    def __init__(self, source: Dict[str, Any]):
+        self.source_id = source["id"]
+        self.signature = _signature(source)
+        info = source["connection_info"] or {}
+        self.max_concurrency = max(1, int(info.get("max_concurrency", settings.CONNECTOR_MAX_CONCURRENCY)))
+        self.batch_size = max(1, int(info.get("batch_size", settings.CONNECTOR_BATCH_SIZE)))
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.CONNECTOR_QUEUE_SIZE)
+        self.connector = CONNECTOR_TYPES[source["type"]](self.source_id, info, self.queue, self.max_concurrency)
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self.connector.run()), asyncio.create_task(self._batch())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.connector.close()
+
+    async def _batch(self):
+        in_flight = set()
+        try:
+            while True:
+                batch = [await self.queue.get()]
+                # Collect what arrives shortly after, up to a full batch
+                deadline = asyncio.get_running_loop().time() + settings.CONNECTOR_FLUSH_SECONDS
+                while len(batch) < self.batch_size:
+                    timeout = deadline - asyncio.get_running_loop().time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                await self._slots.acquire()
+                task = asyncio.create_task(self._ingest(batch))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    async def _ingest(self, batch: List[Dict[str, Any]]):
+        try:
+            ids = await asyncio.to_thread(self._process, batch)
+            for element, object_id in zip(batch, ids):
+                if object_id is None:
+                    health_monitor.record_error(source_id=self.source_id)
+                    continue
+                await websocket_manager.broadcast_object_update(object_id, {
+                    "id": object_id,
+                    "object_id": str(element.get("osm_id")),
+                    "type": element.get("type"),
+                    "additional_info": element.get("tags", {}),
+                    "source_id": self.source_id
+                })
+        except Exception:
+            health_monitor.record_error(source_id=self.source_id)
+            logger.exception(f"Failed to ingest a batch of {len(batch)} elements from data source {self.source_id}")
+        finally:
+            self._slots.release()
+
+    def _process(self, batch: List[Dict[str, Any]]) -> List[Optional[str]]:
+        db = SessionLocal()
+        try:
+            return OSMService(db).process_elements(batch, self.source_id)
+        finally:
+            db.close()
+
+class ConnectorSupervisor:
+    """
+    Runs a SourceRunner for every active data source of a pulled type.
+    Active sources are re-read every CONNECTOR_SYNC_SECONDS and right after
+    sync() is called, so activating, deactivating or editing a source takes
+    effect without a restart. With several workers each source is pulled by
+    one of them only: the worker holding its Postgres advisory lock, taken on
+    a connection kept for the supervisor's lifetime.
+    """
+    def __init__(self):
+        self._runners: Dict[str, SourceRunner] = {}
+        self._lock_connection = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """
+        Start supervising, called on the application's event loop
+        """
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._supervise())
+
+    async def stop(self):
+        """
+        Stop all connectors and release their sources
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        for runner in list(self._runners.values()):
+            await runner.stop()
+        self._runners = {}
+        if self._lock_connection is not None:
+            await asyncio.to_thread(self._lock_connection.close)
+            self._lock_connection = None
+
+    def sync(self):
+        """
+        Re-read the data sources now, safe to call from any thread
+        """
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Running connectors of this worker with their queue depth
+        """
+        return {
+            source_id: {"type": runner.signature[0], "queued": runner.queue.qsize(), "max_concurrency": runner.max_concurrency}
+            for source_id, runner in self._runners.items()
+        }
+
+    async def _supervise(self):
+        while True:
+            try:
+                await self._reconcile()
+            except Exception:
+                logger.exception("Failed to sync data source connectors")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.CONNECTOR_SYNC_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _reconcile(self):
+        if not await asyncio.to_thread(self._lock_connection_alive):
+            # The advisory locks went with the connection, other workers may take the sources over
+            for runner in list(self._runners.values()):
+                await runner.stop()
+            self._runners = {}
+
+        sources = {source["id"]: source for source in await asyncio.to_thread(self._load_sources)}
+
+        for source_id, runner in list(self._runners.items()):
+            source = sources.get(source_id)
+            # Edited sources are restarted with their new connection_info
+            if source is None or _signature(source) != runner.signature:
+                await runner.stop()
+                del self._runners[source_id]
+                await asyncio.to_thread(self._release, source_id)
+                logger.info(f"Stopped connector for data source {source_id}")
+
+        for source_id, source in sources.items():
+            if source_id in self._runners:
+                continue
+            if not await asyncio.to_thread(self._claim, source_id):
+                continue
+            try:
+                runner = SourceRunner(source)
+            except (KeyError, TypeError, ValueError) as e:
+                await asyncio.to_thread(self._release, source_id)
+                logger.error(f"Invalid connection_info for data source {source_id}: {str(e)}")
+                continue
+            runner.start()
+            self._runners[source_id] = runner
+            logger.info(f"Started {source['type']} connector for data source {source_id}")
+
+    def _load_sources(self) -> List[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            rows = db.query(DataSource.id, DataSource.type, DataSource.connection_info).filter(
+                DataSource.is_active == True,
+                DataSource.type.in_(list(CONNECTOR_TYPES))
+            ).all()
+            # Sources without a URL or path push to us and are not pulled
+            return [
+                {"id": row.id, "type": row.type, "connection_info": row.connection_info or {}}
+                for row in rows
+                if (row.connection_info or {}).get(CONNECTOR_TYPES[row.type].locator)
+            ]
+        finally:
+            db.close()
+
+    def _lock_connection_alive(self) -> bool:
+        if self._lock_connection is None:
+            return True
+        try:
+            self._lock_connection.execute(text("SELECT 1"))
+            self._lock_connection.commit()
+            return True
+        except Exception:
+            logger.warning("Lost the data source lock connection")
+            try:
+                self._lock_connection.close()
+            except Exception:
+                pass
+            self._lock_connection = None
+            return False
+
+    def _claim(self, source_id: str) -> bool:
+        if self._lock_connection is None:
+            self._lock_connection = engine.connect()
+        claimed = self._lock_connection.execute(
+            text("SELECT pg_try_advisory_lock(hashtext('data_source_connector'), hashtext(:source_id))"),
+            {"source_id": source_id}
+        ).scalar()
+        self._lock_connection.commit()
+        return bool(claimed)
+
+    def _release(self, source_id: str):
+        if self._lock_connection is None:
+            return
+        self._lock_connection.execute(
+            text("SELECT pg_advisory_unlock(hashtext('data_source_connector'), hashtext(:source_id))"),
+            {"source_id": source_id}
+        )
+        self._lock_connection.commit()
+
+# Create a singleton instance
+connector_supervisor = ConnectorSupervisor()
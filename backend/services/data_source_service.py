@@ -2,6 +2,11 @@ from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional
 from models.all import DataSource, TrackedObject
 from core.websocket import websocket_manager
+from core.http_cache import response_cache
+from services.osm_service import OSMService
+from services.health_service import health_monitor
+from services.connector_service import connector_supervisor, check_connection_info
+from services.admission_service import source_limits
 
 class DataSourceService:
     """
@@ -30,26 +35,36 @@ class DataSourceService:
     
     def create_data_source(self, data: Dict[str, Any]) -> DataSource:
         """
-        Create a new data source
+        Create a new data source.
+        Raises ValueError if it would be pulled from a location that is not allowed.
         """
+        check_connection_info(data.get("type"), data.get("connection_info"))
         new_source = DataSource(**data)
         self.db.add(new_source)
         self.db.commit()
+        response_cache.invalidate(DataSource.__tablename__)
+        connector_supervisor.sync()
+        source_limits.invalidate()
         self.db.refresh(new_source)
         return new_source
     
     def update_data_source(self, source_id: str, data: Dict[str, Any]) -> Optional[DataSource]:
         """
-        Update an existing data source
+        Update an existing data source.
+        Raises ValueError if it would be pulled from a location that is not allowed.
         """
         source = self.get_data_source_by_id(source_id)
         if not source:
             return None
+        check_connection_info(data.get("type", source.type), data.get("connection_info", source.connection_info))
         
         for key, value in data.items():
             setattr(source, key, value)
             
         self.db.commit()
+        response_cache.invalidate(DataSource.__tablename__)
+        connector_supervisor.sync()
+        source_limits.invalidate()
         self.db.refresh(source)
         return source
     
@@ -63,6 +78,9 @@ class DataSourceService:
         
         self.db.delete(source)
         self.db.commit()
+        response_cache.invalidate(DataSource.__tablename__)
+        connector_supervisor.sync()
+        source_limits.invalidate()
         return True
     
     def activate_data_source(self, source_id: str) -> Optional[DataSource]:
@@ -75,6 +93,9 @@ class DataSourceService:
         
         source.is_active = True
         self.db.commit()
+        response_cache.invalidate(DataSource.__tablename__)
+        connector_supervisor.sync()
+        source_limits.invalidate()
         self.db.refresh(source)
         return source
     
@@ -88,6 +109,9 @@ class DataSourceService:
         
         source.is_active = False
         self.db.commit()
+        response_cache.invalidate(DataSource.__tablename__)
+        connector_supervisor.sync()
+        source_limits.invalidate()
         self.db.refresh(source)
         return source
     
@@ -99,38 +123,12 @@ class DataSourceService:
         if not source or not source.is_active:
             return None
         
-        # Process data into a tracked object
-        # Implementation depends on the specific data format from the source
-        osm_id = data.get("osm_id")
-        obj_type = data.get("type")
-        
-        if not osm_id or not obj_type:
+        # Upserted on (object_id, type) together with any position in one transaction
+        object_id = OSMService(self.db).process_elements([data], source_id)[0]
+        if object_id is None:
+            health_monitor.record_error(source_id=source_id)
             return None
-        
-        # Check if object exists
-        obj = self.db.query(TrackedObject).filter(
-            TrackedObject.object_id == osm_id,
-            TrackedObject.type == obj_type
-        ).first()
-        
-        if obj:
-            # Update existing object
-            for key, value in data.items():
-                if key not in ["id", "created_at", "updated_at"]:
-                    setattr(obj, key, value)
-            self.db.commit()
-            self.db.refresh(obj)
-        else:
-            # Create new object
-            obj = TrackedObject(
-                object_id=osm_id,
-                type=obj_type,
-                additional_info=data.get("tags", {}),
-                source_id=source_id
-            )
-            self.db.add(obj)
-            self.db.commit()
-            self.db.refresh(obj)
+        obj = self.db.query(TrackedObject).filter(TrackedObject.id == object_id).first()
         
         # Broadcast update to connected clients
         await websocket_manager.broadcast_object_update(obj.id, {
@@ -0,0 +1,148 @@
+from sqlalchemy.orm import Session
+from typing import Any, Dict, Optional, Set, Tuple
+from collections import OrderedDict
+import threading
+import time
+
+from config import settings
+from models.all import Sensor
+from services.track_service import track_estimator, APPLIED, STALE, OUTLIER, RESTARTED
+from services.history_service import OSM_SENSOR_ID
+from services.validation_log_service import validation_logs
+
+class SensorRegistry:
+    """
+    In-memory copy of the sensors table keyed by external sensor ID, holding
+    each sensor's database ID and accuracy. Reloaded after invalidate() and
+    after SENSOR_CACHE_SECONDS so ingest never queries sensors per reading.
+    """
+    def __init__(self, reload_seconds: float):
+        self.reload_seconds = reload_seconds
+        self._sensors: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """
+        Reload the sensors on next use
+        """
+        with self._lock:
+            self._loaded_at = None
+
+    def refresh(self, db: Session):
+        """
+        Reload the sensors if the copy is missing or out of date
+        """
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at <= self.reload_seconds:
+                return
+            rows = db.query(Sensor.sensor_id, Sensor.id, Sensor.accuracy).all()
+            self._sensors = {sensor_id: (id, accuracy) for sensor_id, id, accuracy in rows}
+            self._loaded_at = time.monotonic()
+
+    def get(self, db: Session, raw_sensor_id: str) -> Optional[Tuple[str, Optional[float]]]:
+        """
+        Get (id, accuracy) of a sensor by its external ID, None for unknown sensors
+        """
+        self.refresh(db)
+        return self._sensors.get(raw_sensor_id)
+
+    def accuracy(self, raw_sensor_id: Optional[str]) -> Optional[float]:
+        """
+        Accuracy of a sensor from the loaded copy, None when unknown or not set
+        """
+        sensor = self._sensors.get(raw_sensor_id) if raw_sensor_id else None
+        return sensor[1] if sensor else None
+
+# Create a singleton instance
+sensor_registry = SensorRegistry(settings.SENSOR_CACHE_SECONDS)
+
+class FusionStage:
+    """
+    Checks the readings of all sensors reporting an object against one track.
+    Only sensor readings are tracked: positions recorded without a sensor
+    (OSM data and location updates) and, when object_types is set, objects
+    of other types are skipped.
+    Each reading updates the object's Kalman track in this process with the
+    reporting sensor's accuracy as measurement error. Readings older than the
+    track are counted as stale, and readings outside the track's gate
+    contradict it and are logged. Counters are kept in memory for at most
+    max_sensors sensors, the least recently reporting are dropped.
+    Tracks here only see the readings ingested by this worker, so they never
+    decide the stored position. That is gated while folding readings onto
+    the locked object_states row instead, which every worker shares: a
+    reading implying a move faster
+    than FUSION_MAX_SPEED_METERS_PER_SECOND from the stored position is kept
+    in the history but does not move the object. The fused track is served
+    by TrackService from the shared history.
+    """
+    def __init__(self, max_sensors: int, object_types: Set[str]):
+        self.max_sensors = max_sensors
+        self.object_types = object_types
+        self._stats: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _count(self, raw_sensor_id: str, outcome: str):
+        with self._lock:
+            stats = self._stats.get(raw_sensor_id)
+            if stats is None:
+                stats = self._stats[raw_sensor_id] = {APPLIED: 0, STALE: 0, OUTLIER: 0, RESTARTED: 0}
+                if len(self._stats) > self.max_sensors:
+                    self._stats.popitem(last=False)
+            else:
+                self._stats.move_to_end(raw_sensor_id)
+            stats[outcome] += 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Fusion outcome counts per external sensor ID
+        """
+        with self._lock:
+            return {raw_sensor_id: dict(stats) for raw_sensor_id, stats in self._stats.items()}
+
+    def tracks(self, state: Dict[str, Any]) -> bool:
+        """
+        Whether a reading is checked against a track
+        """
+        if state.get("raw_sensor_id", OSM_SENSOR_ID) == OSM_SENSOR_ID:
+            return False
+        return not self.object_types or state.get("type") in self.object_types
+
+    def check(self, state: Dict[str, Any]) -> str:
+        """
+        Apply a reading to its object's track, returns the outcome
+        (APPLIED, STALE, OUTLIER or RESTARTED)
+        """
+        raw_sensor_id = state.get("raw_sensor_id") or ""
+        outcome, distance = track_estimator.update(
+            state["tracked_object_id"],
+            state["latitude"],
+            state["longitude"],
+            state["timestamp"],
+            measurement_sigma=sensor_registry.accuracy(raw_sensor_id),
+            additional_data=state.get("additional_data")
+        )
+        self._count(raw_sensor_id, outcome)
+
+        if outcome in (OUTLIER, RESTARTED):
+            validation_logs.record(
+                "warning",
+                f"Outlier position for object ID: {state.get('object_id') or state['tracked_object_id']}",
+                {
+                    "latitude": state["latitude"],
+                    "longitude": state["longitude"],
+                    "timestamp": state["timestamp"].isoformat(),
+                    "mahalanobis_distance_sq": distance,
+                    "track_restarted": outcome == RESTARTED,
+                },
+                object_id=state.get("object_id"),
+                sensor_id=raw_sensor_id or None,
+                source_id=state.get("source_id")
+            )
+        return outcome
+
+# Create a singleton instance
+fusion_stage = FusionStage(
+    settings.RATE_LIMIT_MAX_KEYS,
+    {name.strip().lower() for name in settings.FUSION_OBJECT_TYPES.split(",") if name.strip()}
+)
@@ -0,0 +1,303 @@
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+from datetime import datetime
+import math
+import threading
+import time
+
+from config import settings
+from core.ids import uuid7
+from models.all import Geofence, GeofenceMembership, GeofenceEvent
+
+Bounds = Tuple[float, float, float, float]
+Rings = List[List[Tuple[float, float]]]
+
+def normalize_rings(coordinates: List[List[List[float]]]) -> Rings:
+    """
+    Validate GeoJSON Polygon rings and return them as open lists of (lon, lat).
+    Raises ValueError for rings with fewer than three distinct points.
+    """
+    rings = []
+    for ring in coordinates:
+        points = [(float(point[0]), float(point[1])) for point in ring if len(point) >= 2]
+        if len(points) > 1 and points[0] == points[-1]:
+            points = points[:-1]
+        if len(set(points)) < 3:
+            raise ValueError("Each polygon ring needs at least three distinct [longitude, latitude] points")
+        for lon, lat in points:
+            if not (-180.0 <= lon <= 180.0 and -90.0 <= lat <= 90.0):
+                raise ValueError(f"Coordinate out of range: [{lon}, {lat}]")
+        rings.append(points)
+    if not rings:
+        raise ValueError("A polygon needs an outline ring")
+    return rings
+
+def polygon_bounds(rings: Rings) -> Bounds:
+    """
+    Bounding box (min_lon, min_lat, max_lon, max_lat) of a polygon's outline
+    """
+    lons = [lon for lon, _ in rings[0]]
+    lats = [lat for _, lat in rings[0]]
+    return min(lons), min(lats), max(lons), max(lats)
+
+def _in_ring(longitude: float, latitude: float, ring: List[Tuple[float, float]]) -> bool:
+    # Even-odd ray casting towards +longitude
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i]
+        xj, yj = ring[j]
+        if (yi > latitude) != (yj > latitude) and longitude < (xj - xi) * (latitude - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+def point_in_polygon(longitude: float, latitude: float, rings: Rings) -> bool:
+    """
+    Test a point against a polygon outline and its holes
+    """
+    if not _in_ring(longitude, latitude, rings[0]):
+        return False
+    return not any(_in_ring(longitude, latitude, hole) for hole in rings[1:])
+
+class GeofenceIndex:
+    """
+    Uniform grid of active geofences.
+    A reading is tested only against the fences registered in its grid cell.
+    The fences each object is inside are read from geofence_memberships for
+    every batch, since other workers may have recorded its last transitions.
+    Fences are reloaded after invalidate() and after GEOFENCE_RESYNC_SECONDS
+    to pick up changes made by other workers.
+    """
+    def __init__(self, cell_degrees: float, max_cells_per_fence: int, resync_seconds: float):
+        self.cell_degrees = cell_degrees
+        self.max_cells_per_fence = max_cells_per_fence
+        self.resync_seconds = resync_seconds
+        self._fences: Dict[str, Tuple[Bounds, Rings]] = {}
+        self._cells: Dict[Tuple[int, int], List[str]] = {}
+        self._large: List[str] = []  # Fences spanning too many cells, checked by bounding box
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return math.floor((longitude + 180.0) / self.cell_degrees), math.floor((latitude + 90.0) / self.cell_degrees)
+
+    def _load(self, db: Session):
+        self._fences, self._cells, self._large = {}, {}, []
+        for fence in db.query(Geofence).filter(Geofence.is_active == True).all():
+            try:
+                rings = normalize_rings(fence.coordinates or [])
+            except ValueError:
+                continue
+            bounds = polygon_bounds(rings)
+            self._fences[fence.id] = (bounds, rings)
+
+            min_x, min_y = self._cell(bounds[1], bounds[0])
+            max_x, max_y = self._cell(bounds[3], bounds[2])
+            if (max_x - min_x + 1) * (max_y - min_y + 1) > self.max_cells_per_fence:
+                self._large.append(fence.id)
+                continue
+            for x in range(min_x, max_x + 1):
+                for y in range(min_y, max_y + 1):
+                    self._cells.setdefault((x, y), []).append(fence.id)
+        self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """
+        Reload fences on next use
+        """
+        with self._lock:
+            self._loaded_at = None
+
+    def _containing(self, latitude: float, longitude: float) -> FrozenSet[str]:
+        candidates = self._cells.get(self._cell(latitude, longitude), [])
+        if self._large:
+            candidates = candidates + self._large
+        found = []
+        for fence_id in candidates:
+            (min_lon, min_lat, max_lon, max_lat), rings = self._fences[fence_id]
+            if min_lon <= longitude <= max_lon and min_lat <= latitude <= max_lat and point_in_polygon(longitude, latitude, rings):
+                found.append(fence_id)
+        return frozenset(found)
+
+    def _memberships(self, db: Session, object_ids: List[str]) -> Dict[str, FrozenSet[str]]:
+        # One lookup by ix_geofence_memberships_object for the whole batch
+        inside: Dict[str, Set[str]] = {}
+        rows = db.query(GeofenceMembership.geofence_id, GeofenceMembership.tracked_object_id).filter(
+            GeofenceMembership.tracked_object_id.in_(object_ids)
+        ).all()
+        for geofence_id, object_id in rows:
+            inside.setdefault(object_id, set()).add(geofence_id)
+        return {object_id: frozenset(fences) for object_id, fences in inside.items()}
+
+    def transitions(self, db: Session, states: List[Dict[str, Any]]) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Compare new object positions with their stored memberships.
+        Returns (event, geofence_id, state) for every fence entered or exited.
+        """
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.resync_seconds:
+                self._load(db)
+            if not self._fences:
+                return []
+            current = [(state, self._containing(state["latitude"], state["longitude"])) for state in states]
+
+        inside = self._memberships(db, list({state["tracked_object_id"] for state in states}))
+        events = []
+        for state, fences in current:
+            object_id = state["tracked_object_id"]
+            previous = inside.get(object_id, frozenset())
+            events.extend(("enter", fence_id, state) for fence_id in fences - previous)
+            events.extend(("exit", fence_id, state) for fence_id in previous - fences)
+            inside[object_id] = fences
+        return events
+
+# Create a singleton instance
+geofence_index = GeofenceIndex(
+    settings.GEOFENCE_GRID_CELL_DEGREES,
+    settings.GEOFENCE_MAX_CELLS_PER_FENCE,
+    settings.GEOFENCE_RESYNC_SECONDS
+)
+
+class GeofenceService:
+    """
+    Service for managing geofences and recording enter/exit events
+    """
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_geofences(self, is_active: Optional[bool] = None, skip: int = 0, limit: int = 100) -> List[Geofence]:
+        """
+        Get geofences, optionally only active or inactive ones
+        """
+        query = self.db.query(Geofence)
+        if is_active is not None:
+            query = query.filter(Geofence.is_active == is_active)
+        return query.order_by(Geofence.created_at).offset(skip).limit(limit).all()
+
+    def get_geofence(self, geofence_id: str) -> Optional[Geofence]:
+        """
+        Get a specific geofence by ID
+        """
+        return self.db.query(Geofence).filter(Geofence.id == geofence_id).first()
+
+    def create_geofence(self, data: Dict[str, Any]) -> Geofence:
+        """
+        Create a new geofence. Raises ValueError for invalid polygons.
+        """
+        normalize_rings(data["coordinates"])
+        geofence = Geofence(**data)
+        self.db.add(geofence)
+        self.db.commit()
+        geofence_index.invalidate()
+        self.db.refresh(geofence)
+        return geofence
+
+    def update_geofence(self, geofence_id: str, data: Dict[str, Any]) -> Optional[Geofence]:
+        """
+        Update an existing geofence. Raises ValueError for invalid polygons.
+        """
+        geofence = self.get_geofence(geofence_id)
+        if not geofence:
+            return None
+        if data.get("coordinates") is not None:
+            normalize_rings(data["coordinates"])
+
+        for key, value in data.items():
+            setattr(geofence, key, value)
+
+        if "coordinates" in data or "is_active" in data:
+            # Memberships are rebuilt from the next readings against the new shape
+            self.db.query(GeofenceMembership).filter(GeofenceMembership.geofence_id == geofence_id).delete(synchronize_session=False)
+
+        self.db.commit()
+        geofence_index.invalidate()
+        self.db.refresh(geofence)
+        return geofence
+
+    def delete_geofence(self, geofence_id: str) -> bool:
+        """
+        Delete a geofence together with its memberships and events
+        """
+        geofence = self.get_geofence(geofence_id)
+        if not geofence:
+            return False
+        self.db.delete(geofence)
+        self.db.commit()
+        geofence_index.invalidate()
+        return True
+
+    def get_events(
+        self,
+        geofence_id: Optional[str] = None,
+        tracked_object_id: Optional[str] = None,
+        since: Optional[datetime] = None,
+        limit: int = 100,
+        offset: int = 0
+    ) -> List[GeofenceEvent]:
+        """
+        Get enter/exit events, newest first
+        """
+        query = self.db.query(GeofenceEvent)
+        if geofence_id:
+            query = query.filter(GeofenceEvent.geofence_id == geofence_id)
+        if tracked_object_id:
+            query = query.filter(GeofenceEvent.tracked_object_id == tracked_object_id)
+        if since:
+            query = query.filter(GeofenceEvent.timestamp >= since)
+        return query.order_by(GeofenceEvent.timestamp.desc(), GeofenceEvent.id.desc()).offset(offset).limit(limit).all()
+
+    def record_transitions(self, states: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Test new object positions against the geofences and persist transitions.
+        Memberships are the source of truth: an enter counts only if it adds a
+        membership row and an exit only if it removes one, so workers handling
+        the same object concurrently never record a transition twice. Returns the recorded events
+        as geofence_event messages. The caller commits.
+        """
+        transitions = geofence_index.transitions(self.db, states)
+        if not transitions:
+            return []
+
+        enters = {(fence_id, state["tracked_object_id"]): state for event, fence_id, state in transitions if event == "enter"}
+        exits = {(fence_id, state["tracked_object_id"]): state for event, fence_id, state in transitions if event == "exit"}
+
+        confirmed: List[Tuple[str, Tuple[str, str], Dict[str, Any]]] = []
+        if enters:
+            stmt = insert(GeofenceMembership).values([
+                {"geofence_id": fence_id, "tracked_object_id": object_id, "entered_at": state["timestamp"]}
+                for (fence_id, object_id), state in enters.items()
+            ]).on_conflict_do_nothing().returning(GeofenceMembership.geofence_id, GeofenceMembership.tracked_object_id)
+            confirmed.extend(("enter", tuple(row), enters[tuple(row)]) for row in self.db.execute(stmt))
+        if exits:
+            stmt = GeofenceMembership.__table__.delete().where(
+                tuple_(GeofenceMembership.geofence_id, GeofenceMembership.tracked_object_id).in_(list(exits))
+            ).returning(GeofenceMembership.geofence_id, GeofenceMembership.tracked_object_id)
+            confirmed.extend(("exit", tuple(row), exits[tuple(row)]) for row in self.db.execute(stmt))
+        if not confirmed:
+            return []
+
+        rows = [
+            {
+                "id": uuid7(),
+                "geofence_id": fence_id,
+                "tracked_object_id": object_id,
+                "event": event,
+                "latitude": state["latitude"],
+                "longitude": state["longitude"],
+                "timestamp": state["timestamp"],
+            }
+            for event, (fence_id, object_id), state in confirmed
+        ]
+        self.db.execute(insert(GeofenceEvent).values(rows))
+        return [
+            {
+                "type": "geofence_event",
+                "geofence_id": row["geofence_id"],
+                "object_id": row["tracked_object_id"],
+                "data": row,
+            }
+            for row in rows
+        ]
@@ -0,0 +1,240 @@
+from sqlalchemy import case, func, tuple_, update
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from datetime import datetime, timedelta
+import threading
+import logging
+
+from config import settings
+from database import SessionLocal
+from core.websocket import websocket_manager
+from models.all import IngestHealth
+
+logger = logging.getLogger(__name__)
+
+SENSOR = "sensor"
+SOURCE = "source"
+
+# Index of each counter in a pending entry
+MESSAGES, ERRORS, LAST_SEEN = range(3)
+
+class HealthMonitor:
+    """
+    Live message and error counts per sensor and per data source.
+    The ingest path only bumps counters in memory; flush() adds them to
+    ingest_health in one statement, where rates are computed over windows of
+    HEALTH_RATE_WINDOW_SECONDS from the counts of all workers. Staleness is
+    detected on the table at flush time, so silent sensors cost no query per
+    reading and are reported once across workers.
+    """
+    def __init__(self, rate_window_seconds: float, stale_seconds: float):
+        self.rate_window_seconds = rate_window_seconds
+        self.stale_seconds = stale_seconds
+        self._pending: Dict[Tuple[str, str], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def _bump(self, kind: str, key: str, messages: int, errors: int, now: Optional[datetime]):
+        entry = self._pending.get((kind, key))
+        if entry is None:
+            entry = self._pending[(kind, key)] = [0, 0, None]
+        entry[MESSAGES] += messages
+        entry[ERRORS] += errors
+        if now is not None:
+            entry[LAST_SEEN] = now
+
+    def observe(self, states: Iterable[Dict[str, Any]]):
+        """
+        Count received readings, called from the ingest path with the same
+        state dicts as IngestService.update_object_states
+        """
+        now = datetime.utcnow()
+        with self._lock:
+            for state in states:
+                if state.get("raw_sensor_id"):
+                    self._bump(SENSOR, state["raw_sensor_id"], 1, 0, now)
+                if state.get("source_id"):
+                    self._bump(SOURCE, state["source_id"], 1, 0, now)
+
+    def record_error(self, sensor_id: Optional[str] = None, source_id: Optional[str] = None):
+        """
+        Count a validation problem or failed message of a sensor or source
+        """
+        with self._lock:
+            if sensor_id:
+                self._bump(SENSOR, sensor_id, 0, 1, None)
+            if source_id:
+                self._bump(SOURCE, source_id, 0, 1, None)
+
+    def pending(self, kind: str, key: str) -> Optional[Tuple[int, int, Optional[datetime]]]:
+        """
+        Counts of one sensor or source not yet flushed by this worker
+        """
+        with self._lock:
+            entry = self._pending.get((kind, key))
+            return tuple(entry) if entry else None
+
+    def flush(self, db: Session) -> List[Dict[str, Any]]:
+        """
+        Add pending counts to ingest_health and update staleness.
+        Returns health alerts for sensors and sources that went stale or
+        reported again after being stale.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        now = datetime.utcnow()
+        alerts = []
+        try:
+            if pending:
+                recovered = db.execute(
+                    update(IngestHealth).where(
+                        IngestHealth.is_stale == True,
+                        tuple_(IngestHealth.kind, IngestHealth.key).in_(
+                            [key for key, entry in pending.items() if entry[LAST_SEEN] is not None]
+                        )
+                    ).values(is_stale=False).returning(IngestHealth.kind, IngestHealth.key)
+                ).all()
+                alerts.extend({"kind": kind, "key": key, "status": "recovered", "last_seen": pending[(kind, key)][LAST_SEEN]} for kind, key in recovered)
+
+                stmt = insert(IngestHealth).values([
+                    {
+                        "kind": kind,
+                        "key": key,
+                        "last_seen": entry[LAST_SEEN],
+                        "message_count": entry[MESSAGES],
+                        "error_count": entry[ERRORS],
+                        "message_rate": 0.0,
+                        "error_rate": 0.0,
+                        "window_start": now,
+                        "window_messages": entry[MESSAGES],
+                        "window_errors": entry[ERRORS],
+                        "is_stale": False,
+                        "updated_at": now,
+                    }
+                    for (kind, key), entry in pending.items()
+                ])
+                new = stmt.excluded
+                # A full window closes into the rates and a new one starts with this flush's counts
+                window_done = IngestHealth.window_start <= now - timedelta(seconds=self.rate_window_seconds)
+                window_seconds = func.greatest(func.extract("epoch", new.window_start - IngestHealth.window_start), 1.0)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[IngestHealth.kind, IngestHealth.key],
+                    set_={
+                        "last_seen": func.greatest(IngestHealth.last_seen, new.last_seen),
+                        "message_count": IngestHealth.message_count + new.message_count,
+                        "error_count": IngestHealth.error_count + new.error_count,
+                        "message_rate": case(
+                            (window_done, IngestHealth.window_messages / window_seconds),
+                            else_=IngestHealth.message_rate
+                        ),
+                        "error_rate": case(
+                            (window_done, IngestHealth.window_errors / func.greatest(IngestHealth.window_messages, 1.0)),
+                            else_=IngestHealth.error_rate
+                        ),
+                        "window_start": case((window_done, new.window_start), else_=IngestHealth.window_start),
+                        "window_messages": case(
+                            (window_done, new.window_messages),
+                            else_=IngestHealth.window_messages + new.window_messages
+                        ),
+                        "window_errors": case(
+                            (window_done, new.window_errors),
+                            else_=IngestHealth.window_errors + new.window_errors
+                        ),
+                        "updated_at": new.updated_at,
+                    }
+                )
+                db.execute(stmt)
+
+            # The row update makes exactly one worker report each silent sensor
+            stale = db.execute(
+                update(IngestHealth).where(
+                    IngestHealth.is_stale == False,
+                    IngestHealth.last_seen < now - timedelta(seconds=self.stale_seconds)
+                ).values(is_stale=True, message_rate=0.0, updated_at=now).returning(
+                    IngestHealth.kind, IngestHealth.key, IngestHealth.last_seen
+                )
+            ).all()
+            alerts.extend({"kind": kind, "key": key, "status": "stale", "last_seen": last_seen} for kind, key, last_seen in stale)
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Put the counts back so they are retried on the next flush
+            with self._lock:
+                for (kind, key), entry in pending.items():
+                    self._bump(kind, key, entry[MESSAGES], entry[ERRORS], None)
+                    current = self._pending[(kind, key)]
+                    if current[LAST_SEEN] is None:
+                        current[LAST_SEEN] = entry[LAST_SEEN]
+            raise
+        return alerts
+
+# Create a singleton instance
+health_monitor = HealthMonitor(settings.HEALTH_RATE_WINDOW_SECONDS, settings.HEALTH_STALE_SECONDS)
+
+class HealthService:
+    """
+    Service for reading sensor and source health
+    """
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_health(self, kind: str, key: str) -> Dict[str, Any]:
+        """
+        Health of one sensor or source, including counts this worker has not flushed yet
+        """
+        row = self.db.query(IngestHealth).filter(IngestHealth.kind == kind, IngestHealth.key == key).first()
+        health = {
+            "kind": kind,
+            "key": key,
+            "last_seen": row.last_seen if row else None,
+            "message_count": row.message_count if row else 0,
+            "error_count": row.error_count if row else 0,
+            "message_rate": row.message_rate if row else 0.0,
+            "error_rate": row.error_rate if row else 0.0,
+            "is_stale": row.is_stale if row else False,
+            "updated_at": row.updated_at if row else None,
+        }
+        pending = health_monitor.pending(kind, key)
+        if pending:
+            messages, errors, last_seen = pending
+            health["message_count"] += messages
+            health["error_count"] += errors
+            if last_seen is not None:
+                health["last_seen"] = max(filter(None, (health["last_seen"], last_seen)))
+                health["is_stale"] = False
+        return health
+
+    def list_health(
+        self,
+        kind: Optional[str] = None,
+        stale: Optional[bool] = None,
+        skip: int = 0,
+        limit: int = 100
+    ) -> List[IngestHealth]:
+        """
+        Health of all sensors and sources, silent ones first
+        """
+        query = self.db.query(IngestHealth)
+        if kind:
+            query = query.filter(IngestHealth.kind == kind)
+        if stale is not None:
+            query = query.filter(IngestHealth.is_stale == stale)
+        return query.order_by(IngestHealth.last_seen.asc().nullsfirst()).offset(skip).limit(limit).all()
+
+def flush_health():
+    """
+    Scheduled job writing health counters and reporting stale sensors and sources
+    """
+    db = SessionLocal()
+    try:
+        alerts = health_monitor.flush(db)
+    finally:
+        db.close()
+
+    for alert in alerts:
+        websocket_manager.publish({"type": "health_alert", "data": alert})
+        if alert["status"] == "stale":
+            logger.warning(f"{alert['kind'].capitalize()} {alert['key']} has not reported since {alert['last_seen']}")
+        else:
+            logger.info(f"{alert['kind'].capitalize()} {alert['key']} is reporting again")
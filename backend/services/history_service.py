@@ -0,0 +1,71 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from typing import Any, Dict, List, Optional, Set
+from datetime import datetime
+
+from config import settings
+from core.ids import uuid7
+from models.all import SensorData
+
+# raw_sensor_id recorded for positions that come from OSM data rather than a sensor
+OSM_SENSOR_ID = "osm"
+
+class HistoryStore:
+    """
+    Single store for position history, backed by the sensor_data table.
+    All history is written through append() and read through get_history().
+    """
+    def __init__(self, db: Session):
+        self.db = db
+
+    def append(self, rows: List[Dict[str, Any]]) -> Set[str]:
+        """
+        Insert a batch of readings with one statement per UPSERT_CHUNK_ROWS rows.
+        Readings already stored under the same (object, sensor, timestamp) key are
+        skipped. Returns the IDs of the rows actually inserted. The caller commits.
+        """
+        if not rows:
+            return set()
+
+        now = datetime.utcnow()
+        values = [
+            {
+                "id": row.get("id") or uuid7(),
+                "tracked_object_id": row["tracked_object_id"],
+                "sensor_id": row.get("sensor_id"),
+                "raw_sensor_id": row.get("raw_sensor_id", OSM_SENSOR_ID),
+                "latitude": row["latitude"],
+                "longitude": row["longitude"],
+                "altitude": row.get("altitude"),
+                "additional_data": row.get("additional_data"),
+                "timestamp": row.get("timestamp") or now,
+            }
+            for row in rows
+        ]
+        inserted: Set[str] = set()
+        for start in range(0, len(values), settings.UPSERT_CHUNK_ROWS):
+            stmt = insert(SensorData).values(values[start:start + settings.UPSERT_CHUNK_ROWS])
+            stmt = stmt.on_conflict_do_nothing().returning(SensorData.id)
+            inserted.update(row.id for row in self.db.execute(stmt))
+        return inserted
+
+    def get_history(
+        self,
+        tracked_object_id: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 100,
+        offset: int = 0
+    ) -> List[SensorData]:
+        """
+        Get the position history of an object, newest first
+        """
+        query = self.db.query(SensorData).filter(SensorData.tracked_object_id == tracked_object_id)
+
+        if since:
+            query = query.filter(SensorData.timestamp >= since)
+
+        if until:
+            query = query.filter(SensorData.timestamp <= until)
+
+        return query.order_by(SensorData.timestamp.desc()).offset(offset).limit(limit).all()
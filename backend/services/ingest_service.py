@@ -0,0 +1,403 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from typing import Any, Dict, List, Optional, Set, Tuple
+from collections import OrderedDict
+from datetime import datetime, timezone
+from uuid import uuid4
+import threading
+
+from config import settings
+from core.ids import uuid7
+from core.geo import haversine, bearing
+from models.all import TrackedObject, SensorData, CustomObjectType, DataSource, ObjectState
+from schemas.all import IncomingSensorData
+from services.tile_service import tile_cache
+from services.cluster_service import cluster_index
+from services.validation_log_service import validation_logs
+from services.history_service import HistoryStore
+from services.geofence_service import GeofenceService
+from services.proximity_service import proximity_detector
+from services.fusion_service import fusion_stage, sensor_registry
+from services.health_service import health_monitor
+from core.websocket import websocket_manager
+
+class RecentReadings:
+    """
+    Bounded LRU map of recently ingested reading keys to their stored row IDs.
+    Lets retried readings be answered with the stored row without validating
+    or storing them again.
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._ids: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[str]:
+        with self._lock:
+            reading_id = self._ids.get(key)
+            if reading_id is not None:
+                self._ids.move_to_end(key)
+            return reading_id
+
+    def add(self, key: tuple, reading_id: str):
+        with self._lock:
+            self._ids[key] = reading_id
+            self._ids.move_to_end(key)
+            if len(self._ids) > self.max_size:
+                self._ids.popitem(last=False)
+
+def fold_readings(previous: Optional[Dict[str, Any]], readings: List[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Apply an object's readings, in time order, to its stored state with one
+    step of speed, heading, distance and dwell per consecutive pair.
+    Readings older than the state, or too far from it for the time passed,
+    are skipped. Returns the new state and the last reading applied, or
+    (None, None) when none was.
+    """
+    state = dict(previous) if previous else None
+    applied = None
+    for reading in readings:
+        if state is None:
+            state = {"speed": None, "heading": None, "distance_total": 0.0, "dwell_seconds": 0.0}
+        elif state["timestamp"] is not None:
+            elapsed = (reading["timestamp"] - state["timestamp"]).total_seconds()
+            if elapsed < 0:
+                continue
+            step = haversine(state["latitude"], state["longitude"], reading["latitude"], reading["longitude"])
+            # A move faster than anything tracked is a bad reading, unless the stored position is old
+            if step > settings.FUSION_POSITION_TOLERANCE_METERS + settings.FUSION_MAX_SPEED_METERS_PER_SECOND * elapsed \
+                    and elapsed < settings.FUSION_RESET_SECONDS:
+                continue
+            if elapsed > 0:
+                state["speed"] = step / elapsed
+                if step < settings.DWELL_SPEED_METERS_PER_SECOND * elapsed:
+                    state["dwell_seconds"] += elapsed
+                else:
+                    state["dwell_seconds"] = 0.0
+            # Bearings of sub-metre steps are noise
+            if step >= 1.0:
+                state["heading"] = bearing(state["latitude"], state["longitude"], reading["latitude"], reading["longitude"])
+            state["distance_total"] += step
+        state.update(
+            latitude=reading["latitude"],
+            longitude=reading["longitude"],
+            altitude=reading.get("altitude"),
+            timestamp=reading["timestamp"]
+        )
+        applied = reading
+    return (state, applied) if applied is not None else (None, None)
+
+# Name of the data source assigned to objects whose source is unknown
+AUTO_CREATED_SOURCE_NAME = "auto_created"
+
+# Create a singleton instance
+recent_readings = RecentReadings(settings.INGEST_DEDUP_CACHE_SIZE)
+
+class IngestService:
+    """
+    Service for storing incoming sensor readings.
+    Readings are idempotent on (object, sensor, timestamp) and late readings
+    never replace a newer current position.
+    With bulk set, as for imports, positions are only stored: the live-only
+    hooks (health, fusion, geofences, proximity, in-memory indexes and
+    broadcasts) are skipped, so nothing is kept in memory per object.
+    """
+    def __init__(self, db: Session, bulk: bool = False):
+        self.db = db
+        self.bulk = bulk
+        self._messages: List[Dict[str, Any]] = []  # Broadcast once the transaction commits
+        self._moved: List[Dict[str, Any]] = []  # Applied to the in-memory indexes once the transaction commits
+
+    def commit(self):
+        """
+        Commit the transaction, then move the objects in the tile cache and
+        cluster grids and broadcast the events it recorded
+        """
+        self.db.commit()
+        moved, self._moved = self._moved, []
+        for state in moved:
+            # After the commit, so a tile rendered or grid reloaded in between cannot keep the old position
+            tile_cache.object_moved(state["tracked_object_id"], state["latitude"], state["longitude"])
+            cluster_index.update(state["tracked_object_id"], state["type"], state["latitude"], state["longitude"])
+        messages, self._messages = self._messages, []
+        for message in messages:
+            websocket_manager.publish(message)
+
+    def _log(self, log_type: str, message: str, data: IncomingSensorData, source_id: Optional[str] = None):
+        """
+        Record a validation log occurrence for an incoming reading
+        """
+        # Process the data to make it JSON serializable
+        raw_data = data.dict()
+        if "timestamp" in raw_data and raw_data["timestamp"]:
+            raw_data["timestamp"] = raw_data["timestamp"].isoformat()
+
+        # Aggregated in memory, repeated occurrences become a count on one row
+        validation_logs.record(log_type, message, raw_data, data.object_id, data.sensor_id, source_id)
+
+    def _auto_created_source_id(self) -> str:
+        """
+        Get the ID of the data source that owns objects created without a known source
+        """
+        source = self.db.query(DataSource).filter(DataSource.name == AUTO_CREATED_SOURCE_NAME).first()
+        if source is None:
+            source = DataSource(
+                id=str(uuid4()),
+                name=AUTO_CREATED_SOURCE_NAME,
+                description="Objects created from incoming data without a known source",
+                type="auto",
+                connection_info={},
+                is_active=True
+            )
+            self.db.add(source)
+            self.db.flush()
+        return source.id
+
+    def _resolve_source_id(self, data: IncomingSensorData) -> str:
+        """
+        Get source_id from additional_data if available, otherwise use default
+        """
+        source_id = None
+        if data.additional_data and "source" in data.additional_data:
+            # Try to find a data source with this name
+            source_name = data.additional_data["source"]
+            data_source = self.db.query(DataSource).filter(DataSource.name == source_name).first()
+            if data_source:
+                source_id = data_source.id
+            else:
+                # Look for data sources with this name in their description
+                data_source = self.db.query(DataSource).filter(DataSource.description.ilike(f"%{source_name}%")).first()
+                if data_source:
+                    source_id = data_source.id
+        return source_id or self._auto_created_source_id()
+
+    def update_object_states(self, states: List[Dict[str, Any]]) -> Set[str]:
+        """
+        Store the latest known positions of a batch of objects in object_states.
+        Each state has tracked_object_id, object_id, type, latitude, longitude,
+        altitude, timestamp and optionally raw_sensor_id, source_id and
+        additional_data.
+        Readings are checked against the object's track first, which flags
+        contradictory ones. The stored states of the batch's objects are then
+        locked and each object's readings folded onto its state in time order
+        (see fold_readings), so workers handling the same object take turns
+        and every reading of the batch adds its step to the metrics. Readings
+        older than the stored one stay in the history only. Moved objects are
+        tested against the geofences and queued for proximity detection.
+        Returns the IDs of the objects whose position changed. The caller
+        commits with commit().
+        """
+        if not self.bulk:
+            health_monitor.observe(states)
+
+            # Readings from every sensor go through one track per object, in time order
+            sensor_registry.refresh(self.db)
+            for state in sorted(states, key=lambda state: state["timestamp"]):
+                if fusion_stage.tracks(state):
+                    fusion_stage.check(state)
+
+        # Each object's readings in time order
+        readings: Dict[str, List[Dict[str, Any]]] = {}
+        for state in sorted(states, key=lambda state: state["timestamp"]):
+            readings.setdefault(state["tracked_object_id"], []).append(state)
+        if not readings:
+            return set()
+
+        # Locked in ID order, so two workers' batches cannot deadlock
+        object_ids = sorted(readings)
+        columns = ("latitude", "longitude", "altitude", "timestamp", "speed", "heading", "distance_total", "dwell_seconds")
+        stored: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(object_ids), settings.UPSERT_CHUNK_ROWS):
+            rows = self.db.query(ObjectState.tracked_object_id, *(getattr(ObjectState, column) for column in columns)).filter(
+                ObjectState.tracked_object_id.in_(object_ids[start:start + settings.UPSERT_CHUNK_ROWS])
+            ).order_by(ObjectState.tracked_object_id).with_for_update().all()
+            stored.update((row[0], dict(zip(columns, row[1:]))) for row in rows)
+
+        now = datetime.utcnow()
+        latest: Dict[str, Dict[str, Any]] = {}
+        values = []
+        for object_id in object_ids:
+            state, reading = fold_readings(stored.get(object_id), readings[object_id])
+            if state is not None:
+                latest[object_id] = reading
+                values.append({"tracked_object_id": object_id, **state, "updated_at": now})
+
+        updated: Set[str] = set()
+        for start in range(0, len(values), settings.UPSERT_CHUNK_ROWS):
+            stmt = insert(ObjectState).values(values[start:start + settings.UPSERT_CHUNK_ROWS])
+            new = stmt.excluded
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[ObjectState.tracked_object_id],
+                set_={column: getattr(new, column) for column in columns + ("updated_at",)},
+                # Existing rows are locked above, this only decides for objects another worker stored meanwhile
+                where=ObjectState.timestamp <= new.timestamp
+            ).returning(ObjectState.tracked_object_id)
+            updated.update(row.tracked_object_id for row in self.db.execute(stmt))
+
+        if updated and not self.bulk:
+            moved = [latest[object_id] for object_id in updated]
+            self._moved.extend(moved)
+            self._messages.extend(GeofenceService(self.db).record_transitions(moved))
+            proximity_detector.submit(moved)
+        return updated
+
+    def update_object_state(
+        self,
+        tracked_object: TrackedObject,
+        latitude: float,
+        longitude: float,
+        altitude: Optional[float],
+        timestamp: datetime,
+        additional_data: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """
+        Store the latest known position of an object in object_states.
+        Returns False if the stored position is newer than this reading.
+        """
+        return bool(self.update_object_states([{
+            "tracked_object_id": tracked_object.id,
+            "object_id": tracked_object.object_id,
+            "type": tracked_object.type,
+            "additional_data": additional_data,
+            "latitude": latitude,
+            "longitude": longitude,
+            "altitude": altitude,
+            "timestamp": timestamp,
+        }]))
+
+    def store_reading(
+        self,
+        tracked_object: TrackedObject,
+        raw_sensor_id: str,
+        sensor_id: Optional[str],
+        latitude: float,
+        longitude: float,
+        altitude: Optional[float] = None,
+        additional_data: Optional[Dict[str, Any]] = None,
+        timestamp: Optional[datetime] = None
+    ) -> Tuple[SensorData, bool]:
+        """
+        Insert a reading and update the object's current state.
+        Returns the stored row and whether it was newly created.
+        """
+        if timestamp is not None and timestamp.tzinfo is not None:
+            # Stored and tracked as naive UTC like every other timestamp
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+
+        values = {
+            "id": uuid7(),
+            "tracked_object_id": tracked_object.id,
+            "sensor_id": sensor_id,
+            "raw_sensor_id": raw_sensor_id,
+            "latitude": latitude,
+            "longitude": longitude,
+            "altitude": altitude,
+            "additional_data": additional_data,
+            "timestamp": timestamp or datetime.utcnow(),
+        }
+
+        if not HistoryStore(self.db).append([values]):
+            # Already stored by an earlier delivery of the same reading
+            self.db.commit()
+            existing = self.db.query(SensorData).filter(
+                SensorData.tracked_object_id == tracked_object.id,
+                SensorData.raw_sensor_id == raw_sensor_id,
+                SensorData.timestamp == values["timestamp"]
+            ).one()
+            return existing, False
+
+        self.update_object_states([{
+            "tracked_object_id": tracked_object.id,
+            "object_id": tracked_object.object_id,
+            "type": tracked_object.type,
+            "raw_sensor_id": raw_sensor_id,
+            "source_id": tracked_object.source_id,
+            "latitude": latitude,
+            "longitude": longitude,
+            "altitude": altitude,
+            "timestamp": values["timestamp"],
+            "additional_data": additional_data,
+        }])
+        self.commit()
+        return self.db.query(SensorData).filter(SensorData.id == values["id"]).one(), True
+
+    def process_incoming(self, data: IncomingSensorData) -> SensorData:
+        """
+        Validate and store a reading pushed by an external source.
+        A reading that was already stored returns the stored row and records
+        no validation logs.
+        """
+        key = (data.object_id, data.sensor_id, data.timestamp) if data.timestamp else None
+        reading_id = recent_readings.get(key) if key is not None else None
+        if reading_id is not None:
+            # Retry of a recent reading, answered by primary key without validating it again
+            existing = self.db.get(SensorData, reading_id)
+            if existing is not None:
+                return existing
+
+        # Recorded only once the reading turns out to be new
+        logs: List[Tuple[str, str]] = []
+
+        # Convert type to lowercase for consistency
+        object_type = data.object_type.lower().strip()
+
+        # Check if we have styling for this type
+        # If not, we'll still process it - just without custom styling
+        custom_type = self.db.query(CustomObjectType).filter(
+            CustomObjectType.name == object_type,
+            CustomObjectType.is_active == True
+        ).first()
+
+        if not custom_type:
+            # Log unknown type as informational - not stopping processing
+            logs.append(("info", f"No styling found for object type: {data.object_type}"))
+
+        # Check if sensor exists
+        sensor = sensor_registry.get(self.db, data.sensor_id)
+        sensor_id = sensor[0] if sensor else None
+
+        if not sensor:
+            # Log unknown sensor
+            logs.append(("warning", f"Unknown sensor ID: {data.sensor_id}"))
+
+        # Look for existing object with this object_id
+        tracked_object = self.db.query(TrackedObject).filter(TrackedObject.object_id == data.object_id).first()
+
+        if tracked_object:
+            # Check for mismatched object information
+            if (data.object_name and tracked_object.name and data.object_name != tracked_object.name) or \
+               (object_type != tracked_object.type):
+                logs.append(("warning", f"Mismatched object information for object ID: {data.object_id}"))
+                # Continue processing but don't update the object
+        else:
+            # Create new tracked object, a concurrent reading may be creating it too
+            self.db.execute(insert(TrackedObject).values(
+                id=str(uuid4()),
+                object_id=data.object_id,
+                name=data.object_name,
+                type=object_type,
+                additional_info={},
+                source_id=self._resolve_source_id(data)
+            ).on_conflict_do_nothing(index_elements=[TrackedObject.object_id, TrackedObject.type]))
+            tracked_object = self.db.query(TrackedObject).filter(
+                TrackedObject.object_id == data.object_id,
+                TrackedObject.type == object_type
+            ).one()
+
+        sensor_data, created = self.store_reading(
+            tracked_object,
+            raw_sensor_id=data.sensor_id,
+            sensor_id=sensor_id,
+            latitude=data.latitude,
+            longitude=data.longitude,
+            altitude=data.altitude,
+            additional_data=data.additional_data,
+            timestamp=data.timestamp
+        )
+
+        if created:
+            for log_type, message in logs:
+                self._log(log_type, message, data, tracked_object.source_id)
+        if key is not None:
+            recent_readings.add(key, sensor_data.id)
+        return sensor_data
@@ -0,0 +1,73 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+import gzip
+import os
+import logging
+
+from config import settings
+from database import SessionLocal
+from core.serialization import dumps, models_to_dicts
+from models.all import DataValidationLog
+from schemas.all import DataValidationLog as DataValidationLogSchema
+
+logger = logging.getLogger(__name__)
+
+class LogRetentionService:
+    """
+    Service moving validation logs past the retention period into
+    compressed JSON Lines archives
+    """
+    def __init__(self, db: Session):
+        self.db = db
+
+    def archive_old_logs(self, retention_days: int, archive_dir: str, batch_size: int = 5000) -> int:
+        """
+        Archive and delete resolved logs last seen more than retention_days ago.
+        Unresolved logs are kept however old, as they still collect
+        occurrences. Each batch is written to its own gzip file and deleted in
+        the same transaction; rows locked by another worker are skipped.
+        """
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        os.makedirs(archive_dir, exist_ok=True)
+        archived = 0
+        # Rows aggregated before last_seen existed only have created_at
+        last_activity = func.coalesce(DataValidationLog.last_seen, DataValidationLog.created_at)
+
+        while True:
+            logs = self.db.query(DataValidationLog).filter(
+                DataValidationLog.resolved == True,
+                last_activity < cutoff
+            ).order_by(
+                last_activity, DataValidationLog.id
+            ).limit(batch_size).with_for_update(skip_locked=True).all()
+            if not logs:
+                break
+
+            path = os.path.join(
+                archive_dir,
+                f"data_validation_logs-{logs[0].created_at:%Y%m%dT%H%M%S}-{logs[0].id}.jsonl.gz"
+            )
+            with gzip.open(path, "wb") as archive:
+                for row in models_to_dicts(logs, DataValidationLogSchema):
+                    archive.write(dumps(row) + b"\n")
+
+            self.db.query(DataValidationLog).filter(
+                DataValidationLog.id.in_([log.id for log in logs])
+            ).delete(synchronize_session=False)
+            self.db.commit()
+            archived += len(logs)
+
+        return archived
+
+def archive_old_logs():
+    """
+    Scheduled job applying the validation log retention policy
+    """
+    db = SessionLocal()
+    try:
+        archived = LogRetentionService(db).archive_old_logs(settings.LOG_RETENTION_DAYS, settings.LOG_ARCHIVE_DIR)
+        if archived:
+            logger.info(f"Archived {archived} resolved validation logs inactive for {settings.LOG_RETENTION_DAYS} days")
+    finally:
+        db.close()
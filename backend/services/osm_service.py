@@ -1,8 +1,25 @@
 from sqlalchemy import and_
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
 from typing import List, Optional, Dict, Any
-from models.all import TrackedObject, DataSource, ObjectLocation
-from datetime import datetime
+from models.all import TrackedObject, DataSource, SensorData
+from datetime import datetime, timezone
+from config import settings
+from uuid import uuid4
+from core.ids import uuid7
+from services.search_service import tag_condition
+from services.ingest_service import IngestService
+from services.history_service import HistoryStore, OSM_SENSOR_ID
+
+def _reading_time(value: Any, default: datetime) -> datetime:
+    """
+    Timestamp of an element's position as naive UTC, default unless it is a datetime
+    """
+    if not isinstance(value, datetime):
+        return default
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
 
 class OSMService:
     """
@@ -22,13 +39,8 @@ class OSMService:
         Get objects by tag
         If tag_value is provided, filter by both key and value
         """
-        query = self.db.query(TrackedObject).filter(TrackedObject.additional_info.has_key(tag_key))
-        
-        if tag_value:
-            # Filter on the value of the tag
-            # Note: This filtering will depend on your database's JSON capabilities
-            # This example works for PostgreSQL's JSONB
-            query = query.filter(TrackedObject.additional_info[tag_key].astext == tag_value)
+        # Containment and jsonpath checks can use the GIN index on additional_info
+        query = self.db.query(TrackedObject).filter(tag_condition(tag_key, tag_value or None))
             
         return query.offset(offset).limit(limit).all()
     
@@ -36,10 +48,7 @@ class OSMService:
         """
         Get objects by both type and tag
         """
-        query = self.db.query(TrackedObject).filter(TrackedObject.type == type).filter(TrackedObject.additional_info.has_key(tag_key))
-        
-        if tag_value:
-            query = query.filter(TrackedObject.additional_info[tag_key].astext == tag_value)
+        query = self.db.query(TrackedObject).filter(TrackedObject.type == type).filter(tag_condition(tag_key, tag_value or None))
             
         return query.offset(offset).limit(limit).all()
     
@@ -49,66 +58,146 @@ class OSMService:
         """
         return self.db.query(DataSource).filter(DataSource.is_active == True).all()
     
-    def process_object_data(self, data: Dict[str, Any], source_id: str) -> TrackedObject:
+    def process_elements(self, elements: List[Dict[str, Any]], source_id: str, bulk: bool = False) -> List[Optional[str]]:
+        """
+        Create or update a batch of objects in one transaction.
+        Objects are upserted on (object_id, type) with multi-row statements of
+        at most UPSERT_CHUNK_ROWS rows, and positions go to the history and
+        current state in the same transaction.
+        Positions are stamped with the element's timestamp when it carries a
+        datetime, otherwise with the time of processing.
+        Returns the tracked object ID of each element, None for elements
+        without osm_id or type. bulk is passed on to IngestService, for
+        imports that only store positions.
+        """
+        # Later elements of the batch win, as they would with one call per element
+        batch: Dict[tuple, Dict[str, Any]] = {}
+        for data in elements:
+            osm_id = data.get("osm_id")
+            obj_type = data.get("type")
+            if osm_id and obj_type:
+                batch[(str(osm_id), obj_type)] = data
+        if not batch:
+            return [None] * len(elements)
+
+        now = datetime.utcnow()
+        ids: Dict[tuple, str] = {}
+        # Elements without tags keep the tags already stored
+        tagged = [key for key, data in batch.items() if "tags" in data]
+        untagged = [key for key, data in batch.items() if "tags" not in data]
+        for keys, with_tags in ((tagged, True), (untagged, False)):
+            # About 7 parameters per row, chunked to stay below PostgreSQL's limit per statement
+            for start in range(0, len(keys), settings.UPSERT_CHUNK_ROWS):
+                stmt = insert(TrackedObject).values([
+                    {
+                        "id": str(uuid4()),
+                        "object_id": osm_id,
+                        "type": obj_type,
+                        "additional_info": batch[(osm_id, obj_type)].get("tags", {}),
+                        "source_id": source_id,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                    for osm_id, obj_type in keys[start:start + settings.UPSERT_CHUNK_ROWS]
+                ])
+                set_ = {"updated_at": stmt.excluded.updated_at}
+                if with_tags:
+                    set_["additional_info"] = stmt.excluded.additional_info
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[TrackedObject.object_id, TrackedObject.type],
+                    set_=set_
+                ).returning(TrackedObject.id, TrackedObject.object_id, TrackedObject.type)
+                for row in self.db.execute(stmt):
+                    ids[(row.object_id, row.type)] = row.id
+
+        # Positions of elements that carry coordinates
+        readings = [
+            {
+                "tracked_object_id": ids[key],
+                "object_id": key[0],
+                "type": key[1],
+                "raw_sensor_id": OSM_SENSOR_ID,
+                "source_id": source_id,
+                "latitude": data["latitude"],
+                "longitude": data["longitude"],
+                "timestamp": _reading_time(data.get("timestamp"), now),
+            }
+            for key, data in batch.items()
+            if "longitude" in data and "latitude" in data
+        ]
+        ingest = IngestService(self.db, bulk=bulk)
+        if readings:
+            HistoryStore(self.db).append(readings)
+            ingest.update_object_states(readings)
+
+        ingest.commit()
+        return [
+            ids.get((str(data.get("osm_id")), data.get("type"))) if data.get("osm_id") and data.get("type") else None
+            for data in elements
+        ]
+
+    def process_object_data(self, data: Dict[str, Any], source_id: str) -> Optional[TrackedObject]:
         """
         Process received data and create or update an object
         """
-        # Check if object exists
-        osm_id = data.get("osm_id")
-        obj_type = data.get("type")
-        
-        existing_object = self.db.query(TrackedObject).filter(
-            TrackedObject.object_id == osm_id,
-            TrackedObject.type == obj_type
-        ).first()
-        
-        if existing_object:
-            # Update existing object
-            existing_object.additional_info = data.get("tags", existing_object.additional_info)
-            self.db.commit()
-            
-            # If longitude and latitude are provided, update location
-            if "longitude" in data and "latitude" in data:
-                self.update_object_location(
-                    existing_object.id, 
-                    data.get("latitude"), 
-                    data.get("longitude")
-                )
-                
-            return existing_object
-        else:
-            # Create new object
-            new_object = TrackedObject(
-                object_id=osm_id,
-                type=obj_type,
-                additional_info=data.get("tags", {}),
-                source_id=source_id
-            )
-            self.db.add(new_object)
-            self.db.commit()
-            self.db.refresh(new_object)
-            
-            # If longitude and latitude are provided, add location
-            if "longitude" in data and "latitude" in data:
-                self.update_object_location(
-                    new_object.id, 
-                    data.get("latitude"), 
-                    data.get("longitude")
-                )
-                
-            return new_object
-    
-    def update_object_location(self, object_id: str, latitude: float, longitude: float, timestamp: Optional[datetime] = None) -> ObjectLocation:
-        """
-        Add a new location record for an object
-        """
-        location = ObjectLocation(
-            object_id=object_id,
-            latitude=latitude,
-            longitude=longitude,
-            timestamp=timestamp or datetime.utcnow()
-        )
-        self.db.add(location)
-        self.db.commit()
-        self.db.refresh(location)
-        return location 
\ No newline at end of file
+        object_id = self.process_elements([data], source_id)[0]
+        if object_id is None:
+            return None
+        return self.db.query(TrackedObject).filter(TrackedObject.id == object_id).first()
+
+    def update_object_locations(self, locations: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """
+        Add a batch of location records to the position history in one transaction.
+        Each location has object_id (the tracked object's ID), latitude, longitude
+        and optionally timestamp. Returns the ID of each stored reading, None for
+        unknown objects and readings that were already stored.
+        """
+        object_ids = {location["object_id"] for location in locations}
+        objects = {
+            obj.id: obj
+            for obj in self.db.query(TrackedObject).filter(TrackedObject.id.in_(object_ids))
+        } if object_ids else {}
+
+        now = datetime.utcnow()
+        readings: List[Optional[Dict[str, Any]]] = []
+        for location in locations:
+            tracked_object = objects.get(location["object_id"])
+            if tracked_object is None:
+                readings.append(None)
+                continue
+            timestamp = location.get("timestamp") or now
+            if timestamp.tzinfo is not None:
+                # Stored as naive UTC like every other timestamp
+                timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+            readings.append({
+                "id": uuid7(),
+                "tracked_object_id": tracked_object.id,
+                "object_id": tracked_object.object_id,
+                "type": tracked_object.type,
+                "raw_sensor_id": OSM_SENSOR_ID,
+                "source_id": tracked_object.source_id,
+                "latitude": location["latitude"],
+                "longitude": location["longitude"],
+                "timestamp": timestamp,
+            })
+
+        ingest = IngestService(self.db)
+        stored = HistoryStore(self.db).append([reading for reading in readings if reading is not None])
+        ingest.update_object_states([reading for reading in readings if reading is not None and reading["id"] in stored])
+        ingest.commit()
+        return [reading["id"] if reading is not None and reading["id"] in stored else None for reading in readings]
+
+    def update_object_location(self, object_id: str, latitude: float, longitude: float, timestamp: Optional[datetime] = None) -> Optional[SensorData]:
+        """
+        Add a new location record for an object to the position history.
+        Returns None if the object is unknown or the reading was already stored.
+        """
+        reading_id = self.update_object_locations([{
+            "object_id": object_id,
+            "latitude": latitude,
+            "longitude": longitude,
+            "timestamp": timestamp,
+        }])[0]
+        if reading_id is None:
+            return None
+        return self.db.query(SensorData).filter(SensorData.id == reading_id).first()
@@ -0,0 +1,357 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional, Set, Tuple
+from collections import deque
+from datetime import datetime, timedelta
+import math
+import threading
+import time
+import logging
+
+import numpy as np
+
+from config import settings
+from database import SessionLocal, engine
+from core.geo import EARTH_RADIUS_METERS
+from core.websocket import websocket_manager
+from models.all import TrackedObject, ObjectState
+from services.validation_log_service import validation_logs
+
+logger = logging.getLogger(__name__)
+
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_METERS / 180.0
+EPOCH = datetime(1970, 1, 1)
+
+# object_states rows are pulled again for this long after their updated_at,
+# for transactions that commit a little after setting it
+SYNC_OVERLAP_SECONDS = 5.0
+
+def velocity_from(additional_data: Optional[Dict[str, Any]]) -> Tuple[float, float]:
+    """
+    East/north velocity in m/s from the speed and heading of a reading.
+    Heading is in degrees clockwise from north. Missing values mean stationary.
+    """
+    if not additional_data:
+        return 0.0, 0.0
+    try:
+        speed = float(additional_data.get("speed") or 0.0) * settings.PROXIMITY_SPEED_SCALE
+        heading = math.radians(float(additional_data.get("heading") or 0.0))
+    except (TypeError, ValueError):
+        return 0.0, 0.0
+    return speed * math.sin(heading), speed * math.cos(heading)
+
+class ProximityDetector:
+    """
+    Closest-point-of-approach detector over the current positions of moving objects.
+    Positions and velocities live in NumPy arrays indexed by slot, and a spatial
+    hash grid maps cells of cell_meters to slots. Updates are queued by the
+    ingest path and processed in the background: each updated object is checked
+    against the objects of its own and the eight neighbouring cells only, with
+    CPA/TCPA computed for all of them in one vectorized step. Objects further
+    apart than one cell are not considered, so cell_meters bounds how far
+    ahead converging objects are seen.
+    Positions stored by other workers are pulled from object_states by
+    sync(), with the velocity derived from their last step. Objects without
+    a reading for stale_seconds are dropped from the grid.
+    """
+    def __init__(self, threshold_meters: float, horizon_seconds: float, cell_meters: float,
+                 stale_seconds: float, cooldown_seconds: float, object_types: Set[str]):
+        self.threshold_meters = threshold_meters
+        self.horizon_seconds = horizon_seconds
+        # A cell must be at least as wide as the alert distance for neighbour checks to be complete
+        self.cell_meters = max(cell_meters, threshold_meters)
+        self.stale_seconds = stale_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.object_types = object_types
+
+        capacity = 1024
+        self._lat = np.zeros(capacity)
+        self._lon = np.zeros(capacity)
+        self._ve = np.zeros(capacity)  # East velocity, m/s
+        self._vn = np.zeros(capacity)  # North velocity, m/s
+        self._time = np.zeros(capacity)  # Reading time, epoch seconds
+        self._slots: Dict[str, int] = {}
+        self._ids: List[str] = []
+        self._external_ids: List[str] = []
+        self._cell_of: List[Tuple[int, int]] = []
+        self._cells: Dict[Tuple[int, int], Set[int]] = {}
+        self._alerted: Dict[Tuple[str, str], float] = {}
+        self._pending: deque = deque()
+        self._synced_until: Optional[datetime] = None  # Newest object_states updated_at pulled
+        self._compacted_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def submit(self, states: List[Dict[str, Any]]):
+        """
+        Queue new object positions, called from the ingest path
+        """
+        for state in states:
+            if self.object_types and state.get("type") not in self.object_types:
+                continue
+            self._pending.append(state)
+
+    def discard(self):
+        """
+        Drop queued positions, called while another worker runs the detector
+        """
+        self._pending.clear()
+        # Taking over later starts from a fresh pull
+        self._synced_until = None
+
+    def sync(self, db: Session):
+        """
+        Queue the positions stored in object_states since the last call. The
+        first call pulls every object updated within stale_seconds.
+        """
+        if self._synced_until is None:
+            since = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        else:
+            since = self._synced_until - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+        query = db.query(
+            ObjectState.tracked_object_id, ObjectState.latitude, ObjectState.longitude, ObjectState.timestamp,
+            ObjectState.speed, ObjectState.heading, ObjectState.updated_at, TrackedObject.object_id, TrackedObject.type
+        ).join(TrackedObject, TrackedObject.id == ObjectState.tracked_object_id).filter(ObjectState.updated_at > since)
+        if self.object_types:
+            query = query.filter(TrackedObject.type.in_(list(self.object_types)))
+
+        for row in query:
+            if self._synced_until is None or row.updated_at > self._synced_until:
+                self._synced_until = row.updated_at
+            speed, heading = row.speed or 0.0, math.radians(row.heading or 0.0)
+            self._pending.append({
+                "tracked_object_id": row.tracked_object_id,
+                "object_id": row.object_id,
+                "type": row.type,
+                "latitude": row.latitude,
+                "longitude": row.longitude,
+                "timestamp": row.timestamp,
+                "velocity": (speed * math.sin(heading), speed * math.cos(heading)),
+            })
+        if self._synced_until is None:
+            self._synced_until = since
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        y = latitude * METERS_PER_DEGREE
+        x = longitude * METERS_PER_DEGREE * math.cos(math.radians(latitude))
+        return math.floor(x / self.cell_meters), math.floor(y / self.cell_meters)
+
+    def _grow(self):
+        capacity = len(self._lat) * 2
+        for name in ("_lat", "_lon", "_ve", "_vn", "_time"):
+            array = getattr(self, name)
+            grown = np.zeros(capacity)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+    def _store(self, state: Dict[str, Any]) -> int:
+        object_id = state["tracked_object_id"]
+        latitude, longitude = state["latitude"], state["longitude"]
+        cell = self._cell(latitude, longitude)
+
+        slot = self._slots.get(object_id)
+        if slot is None:
+            slot = len(self._ids)
+            if slot >= len(self._lat):
+                self._grow()
+            self._slots[object_id] = slot
+            self._ids.append(object_id)
+            self._external_ids.append(state.get("object_id") or object_id)
+            self._cell_of.append(cell)
+            self._cells.setdefault(cell, set()).add(slot)
+        elif self._cell_of[slot] != cell:
+            previous = self._cells[self._cell_of[slot]]
+            previous.discard(slot)
+            if not previous:
+                del self._cells[self._cell_of[slot]]
+            self._cell_of[slot] = cell
+            self._cells.setdefault(cell, set()).add(slot)
+
+        self._lat[slot] = latitude
+        self._lon[slot] = longitude
+        if "velocity" in state:
+            self._ve[slot], self._vn[slot] = state["velocity"]
+        else:
+            self._ve[slot], self._vn[slot] = velocity_from(state.get("additional_data"))
+        self._time[slot] = (state["timestamp"] - EPOCH).total_seconds()
+        return slot
+
+    def _compact(self, cutoff: float):
+        # Slots of objects with no reading since cutoff are dropped, the rest renumbered
+        keep = [slot for slot in range(len(self._ids)) if self._time[slot] >= cutoff]
+        if len(keep) == len(self._ids):
+            return
+        index = np.array(keep, dtype=np.int64)
+        for name in ("_lat", "_lon", "_ve", "_vn", "_time"):
+            array = getattr(self, name)
+            compacted = np.zeros(len(array))
+            compacted[:len(keep)] = array[index]
+            setattr(self, name, compacted)
+        self._ids = [self._ids[slot] for slot in keep]
+        self._external_ids = [self._external_ids[slot] for slot in keep]
+        self._cell_of = [self._cell_of[slot] for slot in keep]
+        self._slots = {object_id: slot for slot, object_id in enumerate(self._ids)}
+        self._cells = {}
+        for slot, cell in enumerate(self._cell_of):
+            self._cells.setdefault(cell, set()).add(slot)
+
+    def _neighbours(self, slot: int) -> np.ndarray:
+        x, y = self._cell_of[slot]
+        candidates = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                candidates.extend(self._cells.get((x + dx, y + dy), ()))
+        return np.fromiter((other for other in candidates if other != slot), dtype=np.int64)
+
+    def _check(self, slot: int, now: float) -> List[Dict[str, Any]]:
+        others = self._neighbours(slot)
+        if not len(others):
+            return []
+        t0 = self._time[slot]
+        others = others[t0 - self._time[others] <= self.stale_seconds]
+        if not len(others):
+            return []
+
+        # Local east/north metres around the updated object, others moved to its reading time
+        cos_lat = math.cos(math.radians(self._lat[slot]))
+        dt = t0 - self._time[others]
+        dx = (self._lon[others] - self._lon[slot]) * METERS_PER_DEGREE * cos_lat + self._ve[others] * dt
+        dy = (self._lat[others] - self._lat[slot]) * METERS_PER_DEGREE + self._vn[others] * dt
+        dvx = self._ve[others] - self._ve[slot]
+        dvy = self._vn[others] - self._vn[slot]
+
+        speed_sq = dvx * dvx + dvy * dvy
+        moving = speed_sq > 1e-9
+        tcpa = np.where(moving, -(dx * dvx + dy * dvy) / np.where(moving, speed_sq, 1.0), 0.0)
+        tcpa = np.clip(tcpa, 0.0, self.horizon_seconds)
+        cpa_x = dx + dvx * tcpa
+        cpa_y = dy + dvy * tcpa
+        dcpa = np.sqrt(cpa_x * cpa_x + cpa_y * cpa_y)
+        distance = np.sqrt(dx * dx + dy * dy)
+
+        alerts = []
+        for index in np.nonzero(dcpa <= self.threshold_meters)[0]:
+            other = int(others[index])
+            pair = tuple(sorted((self._ids[slot], self._ids[other])))
+            if now - self._alerted.get(pair, -math.inf) < self.cooldown_seconds:
+                continue
+            self._alerted[pair] = now
+            alerts.append({
+                "tracked_object_ids": [self._ids[slot], self._ids[other]],
+                "object_ids": [self._external_ids[slot], self._external_ids[other]],
+                "distance": float(distance[index]),
+                "cpa_distance": float(dcpa[index]),
+                "tcpa_seconds": float(tcpa[index]),
+                "cpa_time": EPOCH + timedelta(seconds=float(t0 + tcpa[index])),
+            })
+        return alerts
+
+    def process(self) -> List[Dict[str, Any]]:
+        """
+        Apply queued positions and check each updated object, returns the new alerts
+        """
+        with self._lock:
+            # Only the latest queued position of each object matters
+            latest: Dict[str, Dict[str, Any]] = {}
+            while self._pending:
+                state = self._pending.popleft()
+                current = latest.get(state["tracked_object_id"])
+                if current is None or current["timestamp"] <= state["timestamp"]:
+                    latest[state["tracked_object_id"]] = state
+
+            slots = []
+            for object_id, state in latest.items():
+                slot = self._slots.get(object_id)
+                # Positions already applied come back from object_states, they are not checked twice
+                if slot is not None and self._time[slot] >= (state["timestamp"] - EPOCH).total_seconds():
+                    continue
+                slots.append(self._store(state))
+            now = time.monotonic()
+            alerts = []
+            for slot in slots:
+                alerts.extend(self._check(slot, now))
+
+            # Forget pairs whose cooldown has passed
+            if len(self._alerted) > 10000:
+                self._alerted = {pair: at for pair, at in self._alerted.items() if now - at < self.cooldown_seconds}
+            if self._ids and now - self._compacted_at >= self.stale_seconds:
+                self._compact(float(self._time[:len(self._ids)].max()) - self.stale_seconds)
+                self._compacted_at = now
+
+        for alert in alerts:
+            first, second = alert["object_ids"]
+            websocket_manager.publish({"type": "proximity_alert", "data": alert})
+            validation_logs.record(
+                "warning",
+                f"Collision risk between {first} and {second}",
+                {key: value.isoformat() if isinstance(value, datetime) else value for key, value in alert.items()},
+                object_id=first
+            )
+        return alerts
+
+# Create a singleton instance
+proximity_detector = ProximityDetector(
+    threshold_meters=settings.PROXIMITY_THRESHOLD_METERS,
+    horizon_seconds=settings.PROXIMITY_HORIZON_SECONDS,
+    cell_meters=settings.PROXIMITY_CELL_METERS,
+    stale_seconds=settings.PROXIMITY_STALE_SECONDS,
+    cooldown_seconds=settings.PROXIMITY_ALERT_COOLDOWN_SECONDS,
+    object_types={name.strip().lower() for name in settings.PROXIMITY_OBJECT_TYPES.split(",") if name.strip()}
+)
+
+class AdvisoryLock:
+    """
+    Postgres session advisory lock held on a connection kept while it is held,
+    so one worker at a time runs a job that must not run in several
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._connection = None
+
+    def held(self) -> bool:
+        """
+        Whether this worker holds the lock, taking it if it is free
+        """
+        try:
+            if self._connection is None:
+                self._connection = engine.connect()
+                held = self._connection.execute(text("SELECT pg_try_advisory_lock(hashtext(:name))"), {"name": self.name}).scalar()
+                self._connection.commit()
+                if not held:
+                    self._connection.close()
+                    self._connection = None
+                    return False
+            else:
+                # The lock goes with the connection, make sure it is still there
+                self._connection.execute(text("SELECT 1"))
+                self._connection.commit()
+            return True
+        except Exception:
+            logger.warning(f"Lost the {self.name} lock connection")
+            try:
+                if self._connection is not None:
+                    self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+            return False
+
+# Create a singleton instance
+proximity_lock = AdvisoryLock("proximity_detector")
+
+def detect_proximity():
+    """
+    Scheduled job processing queued positions. Only the worker holding
+    proximity_lock detects, with the positions of all workers pulled from
+    object_states; the others drop their queues.
+    """
+    if not proximity_lock.held():
+        proximity_detector.discard()
+        return
+    db = SessionLocal()
+    try:
+        proximity_detector.sync(db)
+    finally:
+        db.close()
+    alerts = proximity_detector.process()
+    if alerts:
+        logger.info(f"Raised {len(alerts)} proximity alerts")
@@ -0,0 +1,239 @@
+from sqlalchemy import text, func, literal_column
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+import logging
+
+from config import settings
+from database import SessionLocal
+from core.ids import uuid7_floor
+from models.all import RollupWatermark, ReadingRollup, ObjectRollup
+
+logger = logging.getLogger(__name__)
+
+# Rollup granularities from finest to coarsest
+GRANULARITIES = ("minute", "hour", "day")
+GRANULARITY_SECONDS = {"minute": 60, "hour": 3600, "day": 86400}
+OBJECT_GRANULARITIES = ("hour", "day")
+
+WATERMARK_NAME = "sensor_data"
+
+# Readings of a range of sensor_data IDs with their object's source and type
+_BATCH_SQL = """
+SELECT s.tracked_object_id, s.raw_sensor_id, s.latitude, s.longitude, s.timestamp, t.source_id, t.type
+FROM sensor_data s
+JOIN tracked_objects t ON t.id = s.tracked_object_id
+WHERE {condition}
+"""
+
+_READING_ROLLUP_SQL = """
+INSERT INTO reading_rollups (granularity, bucket, source_id, object_type, raw_sensor_id, reading_count)
+SELECT :granularity, date_trunc(:granularity, timestamp), source_id, type, raw_sensor_id, count(*)
+FROM rollup_batch
+GROUP BY 2, 3, 4, 5
+ON CONFLICT (granularity, bucket, source_id, object_type, raw_sensor_id) DO UPDATE SET
+    reading_count = reading_rollups.reading_count + excluded.reading_count
+"""
+
+_OBJECT_ROLLUP_SQL = """
+INSERT INTO object_rollups (granularity, tracked_object_id, bucket, reading_count, first_timestamp, last_timestamp,
+                            min_latitude, max_latitude, min_longitude, max_longitude, sum_latitude, sum_longitude)
+SELECT :granularity, tracked_object_id, date_trunc(:granularity, timestamp), count(*), min(timestamp), max(timestamp),
+       min(latitude), max(latitude), min(longitude), max(longitude), sum(latitude), sum(longitude)
+FROM rollup_batch
+GROUP BY 2, 3
+ON CONFLICT (granularity, tracked_object_id, bucket) DO UPDATE SET
+    reading_count = object_rollups.reading_count + excluded.reading_count,
+    first_timestamp = least(object_rollups.first_timestamp, excluded.first_timestamp),
+    last_timestamp = greatest(object_rollups.last_timestamp, excluded.last_timestamp),
+    min_latitude = least(object_rollups.min_latitude, excluded.min_latitude),
+    max_latitude = greatest(object_rollups.max_latitude, excluded.max_latitude),
+    min_longitude = least(object_rollups.min_longitude, excluded.min_longitude),
+    max_longitude = greatest(object_rollups.max_longitude, excluded.max_longitude),
+    sum_latitude = object_rollups.sum_latitude + excluded.sum_latitude,
+    sum_longitude = object_rollups.sum_longitude + excluded.sum_longitude
+"""
+
+def _naive_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    # Rollup buckets are stored as naive UTC
+    if moment is not None and moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+def pick_granularity(since: Optional[datetime], until: Optional[datetime], interval: str, allowed=GRANULARITIES) -> str:
+    """
+    Coarsest rollup granularity that answers a query exactly: no coarser than
+    the requested interval, with both ends of the range on bucket boundaries
+    """
+    choice = allowed[0]
+    for granularity in allowed:
+        seconds = GRANULARITY_SECONDS[granularity]
+        if seconds > GRANULARITY_SECONDS[interval]:
+            break
+        if any(bound is not None and (bound - datetime(1970, 1, 1)).total_seconds() % seconds for bound in (since, until)):
+            break
+        choice = granularity
+    return choice
+
+def _interval_literal(interval: str):
+    # Inlined rather than bound, so the same expression can be selected and grouped by
+    if interval not in GRANULARITY_SECONDS:
+        raise ValueError(f"Unknown interval: {interval}")
+    return literal_column(f"'{interval}'")
+
+class RollupService:
+    """
+    Service maintaining and querying time-bucketed rollups of sensor_data.
+    sensor_data IDs are time-ordered (UUIDv7), so each refresh aggregates only
+    the ID range added since the last one, tracked in rollup_watermarks.
+    """
+    def __init__(self, db: Session):
+        self.db = db
+
+    def refresh(self, lag_seconds: float) -> int:
+        """
+        Add readings inserted since the last refresh to every rollup.
+        Readings newer than lag_seconds are left for the next run so rows from
+        transactions still in flight are not skipped. Returns the number of
+        readings added.
+        """
+        processed_until = datetime.utcnow() - timedelta(seconds=lag_seconds)
+        upper = uuid7_floor(processed_until)
+
+        # The row lock keeps refreshes from several workers from counting a range twice
+        self.db.execute(text(
+            "INSERT INTO rollup_watermarks (name, last_id, processed_until, updated_at) "
+            "VALUES (:name, NULL, NULL, now()) ON CONFLICT (name) DO NOTHING"
+        ), {"name": WATERMARK_NAME})
+        watermark = self.db.query(RollupWatermark).filter(RollupWatermark.name == WATERMARK_NAME).with_for_update().one()
+
+        if watermark.last_id is None:
+            # First run: everything stored so far, including rows with older random IDs
+            condition = "(s.id < :upper OR substr(s.id::text, 15, 1) <> '7')"
+        else:
+            if watermark.last_id >= upper:
+                self.db.rollback()
+                return 0
+            condition = "s.id >= :lower AND s.id < :upper"
+
+        self.db.execute(text("DROP TABLE IF EXISTS rollup_batch"))
+        self.db.execute(text(
+            "CREATE TEMP TABLE rollup_batch ON COMMIT DROP AS " + _BATCH_SQL.format(condition=condition)
+        ), {"lower": watermark.last_id, "upper": upper})
+        count = self.db.execute(text("SELECT count(*) FROM rollup_batch")).scalar()
+
+        if count:
+            for granularity in GRANULARITIES:
+                self.db.execute(text(_READING_ROLLUP_SQL), {"granularity": granularity})
+            for granularity in OBJECT_GRANULARITIES:
+                self.db.execute(text(_OBJECT_ROLLUP_SQL), {"granularity": granularity})
+
+        watermark.last_id = upper
+        watermark.processed_until = processed_until
+        self.db.commit()
+        return count
+
+    def processed_until(self) -> Optional[datetime]:
+        """
+        Insert time up to which readings are included in the rollups
+        """
+        return self.db.query(RollupWatermark.processed_until).filter(RollupWatermark.name == WATERMARK_NAME).scalar()
+
+    def reading_counts(
+        self,
+        interval: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        group_by: Optional[List[str]] = None,
+        source_id: Optional[str] = None,
+        type: Optional[str] = None,
+        sensor_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Reading counts per interval bucket, optionally split by source, type and sensor
+        """
+        since, until = _naive_utc(since), _naive_utc(until)
+        granularity = pick_granularity(since, until, interval)
+        dimensions = {
+            "source_id": ReadingRollup.source_id,
+            "type": ReadingRollup.object_type,
+            "sensor_id": ReadingRollup.raw_sensor_id,
+        }
+        columns = [dimensions[name] for name in group_by or []]
+        bucket = func.date_trunc(_interval_literal(interval), ReadingRollup.bucket)
+
+        query = self.db.query(bucket, *columns, func.sum(ReadingRollup.reading_count)).filter(ReadingRollup.granularity == granularity)
+        if since:
+            query = query.filter(ReadingRollup.bucket >= since)
+        if until:
+            query = query.filter(ReadingRollup.bucket < until)
+        if source_id:
+            query = query.filter(ReadingRollup.source_id == source_id)
+        if type:
+            query = query.filter(ReadingRollup.object_type == type)
+        if sensor_id:
+            query = query.filter(ReadingRollup.raw_sensor_id == sensor_id)
+        rows = query.group_by(bucket, *columns).order_by(bucket).all()
+
+        buckets = []
+        for row in rows:
+            entry = {"bucket": row[0], "count": int(row[-1])}
+            entry.update(zip(group_by or [], row[1:-1]))
+            buckets.append(entry)
+        return {"granularity": granularity, "processed_until": self.processed_until(), "buckets": buckets}
+
+    def object_summaries(
+        self,
+        tracked_object_id: str,
+        interval: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        Per-interval summaries of one object's readings
+        """
+        since, until = _naive_utc(since), _naive_utc(until)
+        granularity = pick_granularity(since, until, interval, OBJECT_GRANULARITIES)
+        bucket = func.date_trunc(_interval_literal(interval), ObjectRollup.bucket)
+        count = func.sum(ObjectRollup.reading_count)
+
+        query = self.db.query(
+            bucket,
+            count,
+            func.min(ObjectRollup.first_timestamp),
+            func.max(ObjectRollup.last_timestamp),
+            func.min(ObjectRollup.min_latitude),
+            func.max(ObjectRollup.max_latitude),
+            func.min(ObjectRollup.min_longitude),
+            func.max(ObjectRollup.max_longitude),
+            func.sum(ObjectRollup.sum_latitude) / count,
+            func.sum(ObjectRollup.sum_longitude) / count,
+        ).filter(
+            ObjectRollup.granularity == granularity,
+            ObjectRollup.tracked_object_id == tracked_object_id
+        )
+        if since:
+            query = query.filter(ObjectRollup.bucket >= since)
+        if until:
+            query = query.filter(ObjectRollup.bucket < until)
+        rows = query.group_by(bucket).order_by(bucket).all()
+
+        fields = ("bucket", "count", "first_timestamp", "last_timestamp", "min_latitude", "max_latitude",
+                  "min_longitude", "max_longitude", "mean_latitude", "mean_longitude")
+        return {
+            "granularity": granularity,
+            "processed_until": self.processed_until(),
+            "buckets": [dict(zip(fields, row)) for row in rows],
+        }
+
+def refresh_rollups():
+    """
+    Scheduled job adding new readings to the rollups
+    """
+    db = SessionLocal()
+    try:
+        count = RollupService(db).refresh(settings.ROLLUP_LAG_SECONDS)
+        if count:
+            logger.debug(f"Added {count} readings to the rollups")
+    finally:
+        db.close()
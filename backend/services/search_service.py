@@ -0,0 +1,65 @@
+from sqlalchemy import or_, text, cast
+from sqlalchemy.dialects.postgresql import JSONPATH
+from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+import json
+
+from models.all import TrackedObject, TAGS_TSVECTOR_SQL
+
+def tag_condition(tag_key: str, tag_value: Optional[str] = None):
+    """
+    Build an index-backed filter on a tracked object tag.
+    With a value this is JSONB containment (@>), without one a jsonpath
+    existence check (@?), both served by the jsonb_path_ops GIN index.
+    """
+    if tag_value is not None:
+        return TrackedObject.additional_info.contains({tag_key: tag_value})
+    return TrackedObject.additional_info.op("@?")(cast(f"$.{json.dumps(tag_key)}", JSONPATH))
+
+def parse_tag(tag: str) -> Tuple[str, Optional[str]]:
+    """
+    Split a "key:value" or "key" tag filter
+    """
+    key, sep, value = tag.partition(":")
+    return key, value if sep else None
+
+def _like_pattern(q: str) -> str:
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+class SearchService:
+    """
+    Service for searching tracked objects by name, external ID and tags
+    """
+    def __init__(self, db: Session):
+        self.db = db
+
+    def search(
+        self,
+        q: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        type: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0
+    ) -> List[TrackedObject]:
+        """
+        Objects whose name or object_id contains q (trigram indexes) or whose tags
+        contain the words of q (tsvector index), and which carry every given tag
+        """
+        query = self.db.query(TrackedObject)
+
+        if q:
+            pattern = _like_pattern(q)
+            query = query.filter(or_(
+                TrackedObject.name.ilike(pattern, escape="\\"),
+                TrackedObject.object_id.ilike(pattern, escape="\\"),
+                text(f"{TAGS_TSVECTOR_SQL} @@ plainto_tsquery('simple', :q)").bindparams(q=q)
+            ))
+
+        for tag in tags or []:
+            query = query.filter(tag_condition(*parse_tag(tag)))
+
+        if type is not None:
+            query = query.filter(TrackedObject.type == type)
+
+        return query.order_by(TrackedObject.name).offset(offset).limit(limit).all()
@@ -0,0 +1,207 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import logging
+
+from config import settings
+from database import SessionLocal
+from core.ids import uuid7, uuid7_floor
+from models.all import StateCheckpoint
+
+logger = logging.getLogger(__name__)
+
+Bounds = Tuple[float, float, float, float]
+
+# Latest reading per object at :taken_at: the previous checkpoint's entries
+# plus the readings inserted since it, so late readings are picked up too
+_CHECKPOINT_SQL = """
+INSERT INTO state_checkpoint_entries (checkpoint_id, tracked_object_id, latitude, longitude, altitude, timestamp)
+SELECT DISTINCT ON (tracked_object_id) :checkpoint_id, tracked_object_id, latitude, longitude, altitude, timestamp
+FROM (
+    SELECT tracked_object_id, latitude, longitude, altitude, timestamp
+    FROM state_checkpoint_entries
+    WHERE checkpoint_id = :previous_id
+    UNION ALL
+    SELECT tracked_object_id, latitude, longitude, altitude, timestamp
+    FROM sensor_data
+    WHERE timestamp <= :taken_at AND {condition}
+) positions
+ORDER BY tracked_object_id, timestamp DESC
+"""
+
+# Latest position of every object at :at: the checkpoint entries plus the
+# readings between the checkpoint and :at, and the readings up to :at that
+# arrived late, after the checkpoint was taken. Newest per object wins
+_SNAPSHOT_SQL = """
+SELECT p.tracked_object_id, t.object_id, t.name, t.type, t.source_id, p.latitude, p.longitude, p.altitude, p.timestamp
+FROM (
+    SELECT DISTINCT ON (tracked_object_id) tracked_object_id, latitude, longitude, altitude, timestamp
+    FROM (
+        SELECT tracked_object_id, latitude, longitude, altitude, timestamp
+        FROM state_checkpoint_entries
+        WHERE checkpoint_id = :checkpoint_id
+        UNION ALL
+        SELECT tracked_object_id, latitude, longitude, altitude, timestamp
+        FROM sensor_data
+        WHERE timestamp <= :at AND (timestamp > :since OR (id >= :since_id AND id < :until_id))
+    ) positions
+    ORDER BY tracked_object_id, timestamp DESC
+) p
+JOIN tracked_objects t ON t.id = p.tracked_object_id
+WHERE {conditions}
+"""
+
+_REPLAY_SQL = """
+SELECT s.id, s.tracked_object_id, t.object_id, t.name, t.type, t.additional_info, t.source_id,
+       s.latitude, s.longitude, s.altitude, s.timestamp
+FROM sensor_data s
+JOIN tracked_objects t ON t.id = s.tracked_object_id
+WHERE (s.timestamp, s.id) > (:after_timestamp, :after_id) AND s.timestamp <= :until AND {conditions}
+ORDER BY s.timestamp, s.id
+LIMIT :limit
+"""
+
+def _filters(alias: str, bbox: Optional[Bounds], type: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+    conditions, params = ["true"], {}
+    if bbox:
+        conditions.append(f"{alias}.latitude BETWEEN :min_lat AND :max_lat AND {alias}.longitude BETWEEN :min_lon AND :max_lon")
+        params.update(min_lon=bbox[0], min_lat=bbox[1], max_lon=bbox[2], max_lat=bbox[3])
+    if type:
+        conditions.append("t.type = :type")
+        params["type"] = type
+    return " AND ".join(conditions), params
+
+class SnapshotService:
+    """
+    Service reconstructing past fleet state.
+    The latest reading of every object is copied into periodic checkpoints, so
+    the position of every object at a past time only needs the nearest earlier
+    checkpoint and the readings after it, at most CHECKPOINT_INTERVAL_SECONDS
+    of history. sensor_data IDs are time-ordered (UUIDv7), so readings that
+    arrive after the checkpoint covering their timestamp are found by ID: a
+    snapshot sees those inserted before the following checkpoint, later ones
+    only show up from the checkpoint after their arrival on.
+    """
+    def __init__(self, db: Session):
+        self.db = db
+
+    def take_checkpoint(self, min_interval: float = 0) -> Optional[StateCheckpoint]:
+        """
+        Write a checkpoint of the latest reading of every object.
+        Returns None without writing one if the latest checkpoint is less than
+        min_interval seconds old, e.g. taken by another worker.
+        """
+        taken_at = datetime.utcnow()
+        # Serializes the workers' jobs, the later ones then see the fresh checkpoint
+        self.db.execute(text("SELECT pg_advisory_xact_lock(hashtext('state_checkpoint'))"))
+        previous = self.db.query(StateCheckpoint).order_by(StateCheckpoint.taken_at.desc()).first()
+        if previous is not None and (taken_at - previous.taken_at).total_seconds() < min_interval:
+            self.db.rollback()
+            return None
+
+        checkpoint = StateCheckpoint(id=uuid7(), taken_at=taken_at)
+        self.db.add(checkpoint)
+        self.db.flush()
+        if previous is None:
+            condition = "true"
+            lower = None
+        else:
+            # Reaches back by the rollup lag for rows still in flight when the previous one was taken
+            condition = "id >= :lower"
+            lower = uuid7_floor(previous.taken_at - timedelta(seconds=settings.ROLLUP_LAG_SECONDS))
+        result = self.db.execute(text(_CHECKPOINT_SQL.format(condition=condition)), {
+            "checkpoint_id": checkpoint.id,
+            "previous_id": previous.id if previous else None,
+            "taken_at": taken_at,
+            "lower": lower,
+        })
+        checkpoint.object_count = result.rowcount
+        self.db.commit()
+        return checkpoint
+
+    def prune_checkpoints(self, retention_days: int) -> int:
+        """
+        Delete checkpoints older than the retention period, keeping the newest of them
+        so snapshots just inside the period still have a starting point
+        """
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        keep = self.db.query(StateCheckpoint.id).filter(
+            StateCheckpoint.taken_at < cutoff
+        ).order_by(StateCheckpoint.taken_at.desc()).limit(1).scalar()
+        if keep is None:
+            return 0
+        deleted = self.db.query(StateCheckpoint).filter(
+            StateCheckpoint.taken_at < cutoff,
+            StateCheckpoint.id != keep
+        ).delete(synchronize_session=False)
+        self.db.commit()
+        return deleted
+
+    def snapshot(self, at: datetime, bbox: Optional[Bounds] = None, type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Last known position of every object at a past time
+        """
+        checkpoint = self.db.query(StateCheckpoint).filter(
+            StateCheckpoint.taken_at <= at
+        ).order_by(StateCheckpoint.taken_at.desc()).first()
+        following = self.db.query(StateCheckpoint.taken_at).filter(
+            StateCheckpoint.taken_at > at
+        ).order_by(StateCheckpoint.taken_at).limit(1).scalar()
+
+        conditions, params = _filters("p", bbox, type)
+        params.update(
+            # Without a checkpoint every reading up to :at has to be considered
+            checkpoint_id=checkpoint.id if checkpoint else None,
+            since=checkpoint.taken_at if checkpoint else datetime.min,
+            # Late readings: inserted after the checkpoint was taken and before the following one
+            since_id=uuid7_floor(checkpoint.taken_at - timedelta(seconds=settings.ROLLUP_LAG_SECONDS)) if checkpoint else None,
+            until_id=uuid7_floor(following or datetime.max),
+            at=at
+        )
+        rows = self.db.execute(text(_SNAPSHOT_SQL.format(conditions=conditions)), params)
+        return [
+            {
+                "id": row.tracked_object_id,
+                "object_id": row.object_id,
+                "name": row.name,
+                "type": row.type,
+                "source_id": row.source_id,
+                "latitude": row.latitude,
+                "longitude": row.longitude,
+                "altitude": row.altitude,
+                "timestamp": row.timestamp,
+            }
+            for row in rows
+        ]
+
+    def replay_page(
+        self,
+        after: Tuple[datetime, str],
+        until: datetime,
+        bbox: Optional[Bounds] = None,
+        type: Optional[str] = None,
+        limit: int = 1000
+    ) -> List[Any]:
+        """
+        Next readings in time order after a (timestamp, id) position
+        """
+        conditions, params = _filters("s", bbox, type)
+        params.update(after_timestamp=after[0], after_id=after[1], until=until, limit=limit)
+        return self.db.execute(text(_REPLAY_SQL.format(conditions=conditions)), params).all()
+
+def take_state_checkpoint():
+    """
+    Scheduled job writing a checkpoint of the latest object positions.
+    Every worker runs it; only the first one per interval writes a checkpoint.
+    """
+    db = SessionLocal()
+    try:
+        service = SnapshotService(db)
+        # Half an interval tolerates the workers' schedules drifting apart
+        checkpoint = service.take_checkpoint(min_interval=settings.CHECKPOINT_INTERVAL_SECONDS / 2)
+        if checkpoint is not None:
+            logger.debug(f"Checkpointed {checkpoint.object_count} object positions")
+        service.prune_checkpoints(settings.CHECKPOINT_RETENTION_DAYS)
+    finally:
+        db.close()
@@ -0,0 +1,229 @@
+from sqlalchemy.orm import Session
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from collections import OrderedDict
+import struct
+import threading
+import time
+
+from config import settings
+from core.geo import lonlat_to_tile, lonlat_to_tile_fraction, tile_bounds
+from models.all import TrackedObject, ObjectState
+
+TILE_EXTENT = 4096
+LAYER_NAME = "objects"
+
+# Protobuf wire types used by the vector tile spec
+WIRE_VARINT = 0
+WIRE_FIXED64 = 1
+WIRE_LENGTH_DELIMITED = 2
+
+MOVE_TO = 1
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+def _message(field: int, payload: bytes) -> bytes:
+    return _key(field, WIRE_LENGTH_DELIMITED) + _varint(len(payload)) + payload
+
+def _packed(field: int, values: List[int]) -> bytes:
+    return _message(field, b"".join(_varint(v) for v in values))
+
+def _encode_value(value: Any) -> bytes:
+    # Field numbers from the Value message of the vector tile spec
+    if isinstance(value, bool):
+        return _key(7, WIRE_VARINT) + _varint(int(value))
+    if isinstance(value, int) and value >= 0:
+        return _key(5, WIRE_VARINT) + _varint(value)
+    if isinstance(value, int):
+        return _key(6, WIRE_VARINT) + _varint(_zigzag(value))
+    if isinstance(value, float):
+        return _key(3, WIRE_FIXED64) + struct.pack("<d", value)
+    return _message(1, str(value).encode("utf-8"))
+
+class _LayerBuilder:
+    """
+    Accumulates point features for a single vector tile layer
+    """
+    def __init__(self, name: str, extent: int = TILE_EXTENT):
+        self.name = name
+        self.extent = extent
+        self.keys: Dict[str, int] = {}
+        self.values: Dict[Tuple[type, Any], int] = {}
+        self.features: List[bytes] = []
+
+    def _tags(self, properties: Dict[str, Any]) -> List[int]:
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            key_index = self.keys.setdefault(key, len(self.keys))
+            value_index = self.values.setdefault((type(value), value), len(self.values))
+            tags.extend((key_index, value_index))
+        return tags
+
+    def add_point(self, x: int, y: int, properties: Dict[str, Any]):
+        geometry = [(1 << 3) | MOVE_TO, _zigzag(x), _zigzag(y)]
+        feature = _packed(2, self._tags(properties)) + _key(3, WIRE_VARINT) + _varint(1) + _packed(4, geometry)
+        self.features.append(_message(2, feature))
+
+    def encode(self) -> bytes:
+        layer = _key(15, WIRE_VARINT) + _varint(2) + _message(1, self.name.encode("utf-8"))
+        layer += b"".join(self.features)
+        layer += b"".join(_message(3, key.encode("utf-8")) for key in self.keys)
+        layer += b"".join(_message(4, _encode_value(value)) for (_, value) in self.values)
+        layer += _key(5, WIRE_VARINT) + _varint(self.extent)
+        return _message(3, layer)
+
+class TileCache:
+    """
+    LRU cache of rendered tiles.
+    Tiles are dropped when an object they contain moves, or when an object moves
+    into them, and expire after TILE_CACHE_TTL_SECONDS to pick up changes made by
+    other workers. Which tiles contain an object is only known for cached tiles,
+    so the index shrinks with the cache.
+    """
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._tiles: "OrderedDict[tuple, Tuple[float, bytes, Tuple[str, ...]]]" = OrderedDict()
+        self._keys_by_tile: Dict[Tuple[int, int, int], Set[tuple]] = {}
+        self._keys_by_object: Dict[str, Set[tuple]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        with self._lock:
+            entry = self._tiles.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl_seconds:
+                self._remove(key)
+                return None
+            self._tiles.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: tuple, tile: bytes, object_ids: Iterable[str]):
+        with self._lock:
+            if key in self._tiles:
+                self._remove(key)
+            object_ids = tuple(object_ids)
+            self._tiles[key] = (time.monotonic(), tile, object_ids)
+            self._keys_by_tile.setdefault(key[:3], set()).add(key)
+            for object_id in object_ids:
+                self._keys_by_object.setdefault(object_id, set()).add(key)
+            while len(self._tiles) > self.max_size:
+                self._remove(next(iter(self._tiles)))
+
+    def _remove(self, key: tuple):
+        entry = self._tiles.pop(key, None)
+        if entry is None:
+            return
+        keys = self._keys_by_tile.get(key[:3])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_tile[key[:3]]
+        for object_id in entry[2]:
+            keys = self._keys_by_object.get(object_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_object[object_id]
+
+    def object_moved(self, object_id: str, latitude: float, longitude: float):
+        """
+        Drop cached tiles containing the object and tiles covering its new position
+        """
+        with self._lock:
+            for key in list(self._keys_by_object.get(object_id, ())):
+                self._remove(key)
+            for zoom in {tile[0] for tile in self._keys_by_tile}:
+                x, y = lonlat_to_tile(longitude, latitude, zoom)
+                for key in list(self._keys_by_tile.get((zoom, x, y), ())):
+                    self._remove(key)
+
+class TileService:
+    """
+    Service for rendering tracked object positions as Mapbox Vector Tiles
+    """
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_tile(self, z: int, x: int, y: int, type: Optional[str] = None, source_id: Optional[str] = None) -> bytes:
+        """
+        Get a tile from the cache or render it
+        """
+        key = (z, x, y, type, source_id)
+        tile = tile_cache.get(key)
+        if tile is None:
+            tile, object_ids = self.render_tile(z, x, y, type, source_id)
+            tile_cache.put(key, tile, object_ids)
+        return tile
+
+    def render_tile(self, z: int, x: int, y: int, type: Optional[str] = None, source_id: Optional[str] = None):
+        """
+        Render the objects inside a tile. Below TILE_CLUSTER_MAX_ZOOM, objects are
+        aggregated into grid cells with a count and per-type counts.
+        Returns the tile and the IDs of the objects it contains.
+        """
+        min_lon, min_lat, max_lon, max_lat = tile_bounds(z, x, y)
+        query = self.db.query(
+            TrackedObject.id, TrackedObject.name, TrackedObject.type, TrackedObject.source_id,
+            ObjectState.latitude, ObjectState.longitude
+        ).join(ObjectState, ObjectState.tracked_object_id == TrackedObject.id).filter(
+            ObjectState.latitude >= min_lat, ObjectState.latitude < max_lat,
+            ObjectState.longitude >= min_lon, ObjectState.longitude < max_lon
+        )
+        if type is not None:
+            query = query.filter(TrackedObject.type == type)
+        if source_id:
+            query = query.filter(TrackedObject.source_id == source_id)
+
+        layer = _LayerBuilder(LAYER_NAME)
+        object_ids: List[str] = []
+        cluster = z < settings.TILE_CLUSTER_MAX_ZOOM
+        cell_size = TILE_EXTENT * settings.TILE_CLUSTER_CELL_PX // 256
+        cells: Dict[Tuple[int, int], Dict[str, Any]] = {}
+
+        for obj_id, name, obj_type, obj_source_id, latitude, longitude in query.yield_per(1000):
+            object_ids.append(obj_id)
+            fx, fy = lonlat_to_tile_fraction(longitude, latitude, z)
+            px = int((fx - x) * TILE_EXTENT)
+            py = int((fy - y) * TILE_EXTENT)
+            if not cluster:
+                layer.add_point(px, py, {"id": obj_id, "name": name, "type": obj_type, "source_id": obj_source_id})
+                continue
+
+            cell = cells.setdefault((px // cell_size, py // cell_size), {"count": 0, "sx": 0, "sy": 0, "types": {}, "first": None})
+            cell["count"] += 1
+            cell["sx"] += px
+            cell["sy"] += py
+            cell["types"][obj_type] = cell["types"].get(obj_type, 0) + 1
+            if cell["first"] is None:
+                cell["first"] = {"id": obj_id, "name": name, "type": obj_type, "source_id": obj_source_id}
+
+        for cell in cells.values():
+            count = cell["count"]
+            cx, cy = cell["sx"] // count, cell["sy"] // count
+            if count == 1:
+                layer.add_point(cx, cy, cell["first"])
+                continue
+            properties = {"cluster": True, "count": count}
+            for obj_type, type_count in cell["types"].items():
+                properties[f"count_{obj_type}"] = type_count
+            layer.add_point(cx, cy, properties)
+
+        return layer.encode(), object_ids
+
+# Create a singleton instance
+tile_cache = TileCache(settings.TILE_CACHE_SIZE, settings.TILE_CACHE_TTL_SECONDS)
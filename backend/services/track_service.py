@@ -0,0 +1,257 @@
+from sqlalchemy.orm import Session
+from typing import Any, Dict, Optional, Tuple
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import math
+import threading
+
+from config import settings
+from core.geo import EARTH_RADIUS_METERS
+from models.all import SensorData, Sensor
+from services.proximity_service import velocity_from
+
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_METERS / 180.0
+EPOCH = datetime(1970, 1, 1)
+
+# Layout of one track in the flat state array. Positions are metres east/north
+# of the track origin; each axis keeps its own 2x2 covariance (PP, PV, VV) since
+# the constant-velocity model with diagonal noise never couples the axes.
+ORIGIN_LAT, ORIGIN_LON, TIME, \
+    EAST, EAST_VEL, EAST_PP, EAST_PV, EAST_VV, \
+    NORTH, NORTH_VEL, NORTH_PP, NORTH_PV, NORTH_VV, \
+    OUTLIERS = range(14)
+STRIDE = 14
+
+# Outcomes of TrackEstimator.update
+APPLIED = "applied"
+STALE = "stale"  # Older than the track
+OUTLIER = "outlier"  # Outside the gate, not applied
+RESTARTED = "restarted"  # Repeated outliers, the track restarted at the reading
+
+# Tracks are re-anchored once they move this far from their origin, keeping the flat-earth error small
+REANCHOR_METERS = 50000.0
+
+class TrackEstimator:
+    """
+    Constant-velocity Kalman filter per tracked object.
+    All tracks live in one flat array of doubles, STRIDE values per track, and
+    an update is a handful of scalar operations. Readings whose innovation
+    exceeds the chi-square gate are flagged as outliers and not applied; after
+    KALMAN_MAX_OUTLIERS consecutive outliers the track restarts at the reading.
+    With max_tracks set, a new object takes over the slot of the least
+    recently updated track once that many exist, so tracks of objects that
+    stopped reporting or were deleted do not accumulate.
+    """
+    def __init__(self, measurement_sigma: float, acceleration_sigma: float, outlier_chi2: float, max_outliers: int,
+                 max_tracks: Optional[int] = None):
+        self.measurement_var = measurement_sigma ** 2
+        self.acceleration_var = acceleration_sigma ** 2
+        self.outlier_chi2 = outlier_chi2
+        self.max_outliers = max_outliers
+        self.max_tracks = max_tracks
+        self._data = array("d")
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, object_id: str) -> bool:
+        return object_id in self._slots
+
+    def _start(self, base: int, latitude: float, longitude: float, t: float, measurement_var: float, additional_data: Optional[Dict[str, Any]]):
+        d = self._data
+        ve, vn = velocity_from(additional_data)
+        # Without reported motion the velocity is unknown, start with a wide spread
+        velocity_var = measurement_var if (ve or vn) else 50.0 ** 2
+        d[base + ORIGIN_LAT] = latitude
+        d[base + ORIGIN_LON] = longitude
+        d[base + TIME] = t
+        d[base + EAST] = d[base + NORTH] = 0.0
+        d[base + EAST_VEL] = ve
+        d[base + NORTH_VEL] = vn
+        d[base + EAST_PP] = d[base + NORTH_PP] = measurement_var
+        d[base + EAST_PV] = d[base + NORTH_PV] = 0.0
+        d[base + EAST_VV] = d[base + NORTH_VV] = velocity_var
+        d[base + OUTLIERS] = 0.0
+
+    def _predict_axis(self, base: int, axis: int, dt: float):
+        # axis is EAST or NORTH, followed by velocity, PP, PV, VV
+        d = self._data
+        q = self.acceleration_var
+        pp, pv, vv = d[base + axis + 2], d[base + axis + 3], d[base + axis + 4]
+        d[base + axis] += d[base + axis + 1] * dt
+        d[base + axis + 2] = pp + 2.0 * dt * pv + dt * dt * vv + q * dt ** 3 / 3.0
+        d[base + axis + 3] = pv + dt * vv + q * dt * dt / 2.0
+        d[base + axis + 4] = vv + q * dt
+
+    def _correct_axis(self, base: int, axis: int, z: float, r: float):
+        d = self._data
+        pp, pv, vv = d[base + axis + 2], d[base + axis + 3], d[base + axis + 4]
+        s = pp + r
+        k_pos, k_vel = pp / s, pv / s
+        innovation = z - d[base + axis]
+        d[base + axis] += k_pos * innovation
+        d[base + axis + 1] += k_vel * innovation
+        d[base + axis + 2] = (1.0 - k_pos) * pp
+        d[base + axis + 3] = (1.0 - k_pos) * pv
+        d[base + axis + 4] = vv - k_vel * pv
+
+    def _reanchor(self, base: int):
+        d = self._data
+        latitude, longitude = self._to_latlon(base, d[base + EAST], d[base + NORTH])
+        d[base + ORIGIN_LAT] = latitude
+        d[base + ORIGIN_LON] = longitude
+        d[base + EAST] = d[base + NORTH] = 0.0
+
+    def _to_local(self, base: int, latitude: float, longitude: float):
+        d = self._data
+        cos_lat = math.cos(math.radians(d[base + ORIGIN_LAT]))
+        return (longitude - d[base + ORIGIN_LON]) * METERS_PER_DEGREE * cos_lat, (latitude - d[base + ORIGIN_LAT]) * METERS_PER_DEGREE
+
+    def _to_latlon(self, base: int, east: float, north: float):
+        d = self._data
+        cos_lat = math.cos(math.radians(d[base + ORIGIN_LAT]))
+        return d[base + ORIGIN_LAT] + north / METERS_PER_DEGREE, d[base + ORIGIN_LON] + east / (METERS_PER_DEGREE * max(cos_lat, 1e-6))
+
+    def update(
+        self,
+        object_id: str,
+        latitude: float,
+        longitude: float,
+        timestamp: datetime,
+        measurement_sigma: Optional[float] = None,
+        additional_data: Optional[Dict[str, Any]] = None
+    ) -> Tuple[str, float]:
+        """
+        Feed a reading to an object's track.
+        Returns the outcome (APPLIED, STALE, OUTLIER or RESTARTED) and the
+        innovation's squared Mahalanobis distance.
+        """
+        t = (timestamp - EPOCH).total_seconds()
+        r = measurement_sigma ** 2 if measurement_sigma else self.measurement_var
+        with self._lock:
+            slot = self._slots.get(object_id)
+            if slot is None:
+                if self.max_tracks and len(self._slots) >= self.max_tracks:
+                    # Reuse the least recently updated track's slot
+                    _, slot = self._slots.popitem(last=False)
+                else:
+                    slot = len(self._data) // STRIDE
+                    self._data.extend([0.0] * STRIDE)
+                self._slots[object_id] = slot
+                self._start(slot * STRIDE, latitude, longitude, t, r, additional_data)
+                return APPLIED, 0.0
+            self._slots.move_to_end(object_id)
+
+            base = slot * STRIDE
+            d = self._data
+            dt = t - d[base + TIME]
+            if dt < 0:
+                return STALE, 0.0
+            if dt > 0:
+                self._predict_axis(base, EAST, dt)
+                self._predict_axis(base, NORTH, dt)
+                d[base + TIME] = t
+
+            east, north = self._to_local(base, latitude, longitude)
+            east_error, north_error = east - d[base + EAST], north - d[base + NORTH]
+            distance = east_error ** 2 / (d[base + EAST_PP] + r) + north_error ** 2 / (d[base + NORTH_PP] + r)
+            if distance > self.outlier_chi2:
+                d[base + OUTLIERS] += 1
+                if d[base + OUTLIERS] >= self.max_outliers:
+                    # Consistently far from the prediction, the object really moved
+                    self._start(base, latitude, longitude, t, r, additional_data)
+                    return RESTARTED, distance
+                return OUTLIER, distance
+
+            self._correct_axis(base, EAST, east, r)
+            self._correct_axis(base, NORTH, north, r)
+            d[base + OUTLIERS] = 0.0
+            if abs(d[base + EAST]) > REANCHOR_METERS or abs(d[base + NORTH]) > REANCHOR_METERS:
+                self._reanchor(base)
+            return APPLIED, distance
+
+    def predict(self, object_id: str, at: datetime) -> Optional[Dict[str, Any]]:
+        """
+        Estimated position of an object at any time, without changing its track
+        """
+        with self._lock:
+            slot = self._slots.get(object_id)
+            if slot is None:
+                return None
+            base = slot * STRIDE
+            d = self._data
+            dt = (at - EPOCH).total_seconds() - d[base + TIME]
+            q = self.acceleration_var
+            east = d[base + EAST] + d[base + EAST_VEL] * dt
+            north = d[base + NORTH] + d[base + NORTH_VEL] * dt
+            # Position variance grows with time away from the last reading, in both directions
+            span = abs(dt)
+            variance = sum(
+                d[base + axis + 2] + 2.0 * span * abs(d[base + axis + 3]) + span * span * d[base + axis + 4] + q * span ** 3 / 3.0
+                for axis in (EAST, NORTH)
+            )
+            latitude, longitude = self._to_latlon(base, east, north)
+            ve, vn = d[base + EAST_VEL], d[base + NORTH_VEL]
+            return {
+                "latitude": latitude,
+                "longitude": longitude,
+                "timestamp": at,
+                "speed": math.hypot(ve, vn),
+                "heading": math.degrees(math.atan2(ve, vn)) % 360.0,
+                "position_error": math.sqrt(variance),
+                "last_update": EPOCH + timedelta(seconds=d[base + TIME]),
+            }
+
+# Create a singleton instance
+track_estimator = TrackEstimator(
+    settings.KALMAN_MEASUREMENT_SIGMA_METERS,
+    settings.KALMAN_ACCELERATION_SIGMA,
+    settings.KALMAN_OUTLIER_CHI2,
+    settings.KALMAN_MAX_OUTLIERS,
+    settings.KALMAN_MAX_TRACKS
+)
+
+class TrackService:
+    """
+    Service for estimated object positions
+    """
+    def __init__(self, db: Session):
+        self.db = db
+
+    def predict(self, tracked_object_id: str, at: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """
+        Predict an object's fused position at a time (now by default).
+        The estimate is rebuilt from history on every call: a fresh track is
+        fed the object's latest KALMAN_BOOTSTRAP_READINGS readings of all
+        sensors, each weighted by its sensor's accuracy. The ingest-fed
+        track_estimator only sees the readings of this worker and is used to
+        flag outliers, so every worker gives the same answer here.
+        """
+        at = at or datetime.utcnow()
+        readings = self.db.query(
+            SensorData.latitude, SensorData.longitude, SensorData.timestamp, SensorData.additional_data, Sensor.accuracy
+        ).outerjoin(Sensor, Sensor.sensor_id == SensorData.raw_sensor_id).filter(
+            SensorData.tracked_object_id == tracked_object_id
+        ).order_by(SensorData.timestamp.desc(), SensorData.id.desc()).limit(settings.KALMAN_BOOTSTRAP_READINGS).all()
+        if not readings:
+            return None
+
+        estimator = TrackEstimator(
+            settings.KALMAN_MEASUREMENT_SIGMA_METERS,
+            settings.KALMAN_ACCELERATION_SIGMA,
+            settings.KALMAN_OUTLIER_CHI2,
+            settings.KALMAN_MAX_OUTLIERS
+        )
+        for latitude, longitude, timestamp, additional_data, accuracy in reversed(readings):
+            estimator.update(
+                tracked_object_id,
+                latitude,
+                longitude,
+                timestamp,
+                measurement_sigma=accuracy,
+                additional_data=additional_data
+            )
+        return estimator.predict(tracked_object_id, at)
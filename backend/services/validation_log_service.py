@@ -0,0 +1,123 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from typing import Any, Dict, Optional
+from datetime import datetime
+from uuid import uuid4
+import hashlib
+import threading
+import logging
+
+from database import SessionLocal
+from models.all import DataValidationLog
+from services.health_service import health_monitor
+
+logger = logging.getLogger(__name__)
+
+def log_fingerprint(log_type: str, message: str, object_id: Optional[str], sensor_id: Optional[str]) -> str:
+    """
+    Identify occurrences of the same validation problem
+    """
+    key = "\x1f".join((log_type, message, object_id or "", sensor_id or ""))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+class ValidationLogAccumulator:
+    """
+    Collects validation log occurrences in memory and writes them as one
+    aggregated row per (log_type, message, object, sensor).
+    Repeated occurrences only increase count and last_seen on the open
+    (unresolved) row, and the latest raw payload is kept as a sample.
+    """
+    def __init__(self):
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        log_type: str,
+        message: str,
+        raw_data: Optional[Dict[str, Any]] = None,
+        object_id: Optional[str] = None,
+        sensor_id: Optional[str] = None,
+        source_id: Optional[str] = None
+    ):
+        """
+        Record one occurrence of a validation problem.
+        Warnings and errors also count against the sensor's and the data source's health.
+        """
+        fingerprint = log_fingerprint(log_type, message, object_id, sensor_id)
+        now = datetime.utcnow()
+        if log_type != "info":
+            health_monitor.record_error(sensor_id=sensor_id, source_id=source_id)
+        with self._lock:
+            entry = self._pending.get(fingerprint)
+            if entry is None:
+                self._pending[fingerprint] = {
+                    "log_type": log_type,
+                    "message": message,
+                    "raw_data": raw_data,
+                    "object_id": object_id,
+                    "sensor_id": sensor_id,
+                    "fingerprint": fingerprint,
+                    "count": 1,
+                    "first_seen": now,
+                    "last_seen": now,
+                }
+            else:
+                entry["count"] += 1
+                entry["last_seen"] = now
+                entry["raw_data"] = raw_data
+
+    def flush(self, db: Session) -> int:
+        """
+        Write pending occurrences to the database, returns the number of rows upserted
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        rows = [
+            dict(entry, id=str(uuid4()), resolved=False, created_at=entry["first_seen"])
+            for entry in pending.values()
+        ]
+        stmt = insert(DataValidationLog).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DataValidationLog.fingerprint],
+            index_where=DataValidationLog.resolved == False,
+            set_={
+                "count": DataValidationLog.count + stmt.excluded.count,
+                "last_seen": stmt.excluded.last_seen,
+                "raw_data": stmt.excluded.raw_data,
+            }
+        )
+        try:
+            db.execute(stmt)
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Put the occurrences back so they are retried on the next flush
+            with self._lock:
+                for fingerprint, entry in pending.items():
+                    current = self._pending.get(fingerprint)
+                    if current is None:
+                        self._pending[fingerprint] = entry
+                    else:
+                        current["count"] += entry["count"]
+                        current["first_seen"] = entry["first_seen"]
+            raise
+        return len(rows)
+
+# Create a singleton instance
+validation_logs = ValidationLogAccumulator()
+
+def flush_validation_logs():
+    """
+    Scheduled job writing accumulated validation logs
+    """
+    db = SessionLocal()
+    try:
+        count = validation_logs.flush(db)
+        if count:
+            logger.debug(f"Flushed {count} aggregated validation logs")
+    finally:
+        db.close()
@@ -0,0 +1,139 @@
+import pytest
+
+from services import admission_service
+from services.admission_service import AdmissionController, LocalTokenBucketStore, RateLimited, SourceLimits
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission_service.time, "monotonic", clock)
+    return clock
+
+def _source(rate_limit=None, burst=None, sensor_rate_limit=None, is_critical=False):
+    return SourceLimits("source-1", "source", rate_limit, burst, sensor_rate_limit, is_critical)
+
+def test_bucket_admits_burst_then_reports_wait(clock):
+    store = LocalTokenBucketStore(workers=1, max_keys=100)
+
+    assert [store.take([("k", 2.0, 3)]) for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Empty: one token takes 1 / rate seconds
+    assert store.take([("k", 2.0, 3)]) == pytest.approx(0.5)
+
+def test_bucket_refills_at_rate_up_to_burst(clock):
+    store = LocalTokenBucketStore(workers=1, max_keys=100)
+    for _ in range(3):
+        store.take([("k", 2.0, 3)])
+
+    clock.now += 0.25
+    # Half a token back, the other half still missing
+    assert store.take([("k", 2.0, 3)]) == pytest.approx(0.25)
+
+    clock.now += 60
+    assert [store.take([("k", 2.0, 3)]) for _ in range(4)][:3] == [0.0, 0.0, 0.0]
+    assert store.take([("k", 2.0, 3)]) > 0
+
+def test_bucket_enforces_worker_share(clock):
+    store = LocalTokenBucketStore(workers=4, max_keys=100)
+
+    # Burst 8 over 4 workers is 2 tokens here, rate 4/s is 1/s
+    assert store.take([("k", 4.0, 8)]) == 0.0
+    assert store.take([("k", 4.0, 8)]) == 0.0
+    assert store.take([("k", 4.0, 8)]) == pytest.approx(1.0)
+
+def test_bucket_share_keeps_at_least_one_token(clock):
+    store = LocalTokenBucketStore(workers=4, max_keys=100)
+
+    assert store.take([("k", 1.0, 1)]) == 0.0
+    assert store.take([("k", 1.0, 1)]) == pytest.approx(4.0)
+
+def test_bucket_store_drops_least_recently_used(clock):
+    store = LocalTokenBucketStore(workers=1, max_keys=2)
+    store.take([("a", 1.0, 1)])
+    store.take([("b", 1.0, 1)])
+    store.take([("a", 1.0, 1)])  # "a" is now the most recently used
+    store.take([("c", 1.0, 1)])
+
+    assert set(store._buckets) == {"a", "c"}
+    # "b" starts again from a full bucket
+    assert store.take([("b", 1.0, 1)]) == 0.0
+    assert set(store._buckets) == {"c", "b"}
+
+def test_admission_limits_and_counts(clock):
+    controller = AdmissionController(LocalTokenBucketStore(1, 100), max_in_flight=4, reserved_critical=0, max_keys=100)
+    source = _source(rate_limit=1.0, burst=1)
+
+    with controller.admit(source, "s1"):
+        pass
+    with pytest.raises(RateLimited) as excinfo:
+        with controller.admit(source, "s1"):
+            pass
+
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.retry_after == pytest.approx(1.0)
+    stats = controller.stats()
+    assert stats["in_flight"] == 0
+    assert stats["sources"]["source-1"] == {"admitted": 1, "limited": 1, "shed": 0}
+    assert stats["sensors"]["s1"] == {"admitted": 1, "limited": 1, "shed": 0}
+
+def test_admission_reserves_slots_for_critical_sources(clock):
+    controller = AdmissionController(LocalTokenBucketStore(1, 100), max_in_flight=2, reserved_critical=1, max_keys=100)
+
+    with controller.admit(_source()):
+        with pytest.raises(RateLimited) as excinfo:
+            with controller.admit(_source()):
+                pass
+        assert excinfo.value.status_code == 503
+        # The reserved slot still admits a critical source
+        with controller.admit(_source(is_critical=True)):
+            pass
+
+def test_admission_stats_are_bounded(clock):
+    controller = AdmissionController(LocalTokenBucketStore(1, 100), max_in_flight=4, reserved_critical=0, max_keys=2)
+
+    for sensor_id in ("s1", "s2", "s1", "s3"):
+        with controller.admit(_source(), sensor_id):
+            pass
+
+    assert list(controller.stats()["sensors"]) == ["s1", "s3"]
+
+def test_bucket_takes_from_all_or_none(clock):
+    store = LocalTokenBucketStore(workers=1, max_keys=100)
+    store.take([("sensor", 1.0, 1)])
+
+    # The empty sensor bucket rejects the reading, the source keeps its token
+    assert store.take([("source", 1.0, 1), ("sensor", 1.0, 1)]) == pytest.approx(1.0)
+    assert store.take([("source", 1.0, 1)]) == 0.0
+
+def test_admission_limits_unknown_sources(clock, monkeypatch):
+    monkeypatch.setattr(admission_service.settings, "RATE_LIMIT_UNKNOWN_PER_SECOND", 1.0)
+    controller = AdmissionController(LocalTokenBucketStore(1, 100), max_in_flight=4, reserved_critical=0, max_keys=100)
+
+    with controller.admit(None):
+        pass
+    with pytest.raises(RateLimited):
+        with controller.admit(None):
+            pass
+
+def test_admission_claimed_source_is_limited_apart_and_not_critical(clock):
+    controller = AdmissionController(LocalTokenBucketStore(1, 100), max_in_flight=2, reserved_critical=1, max_keys=100)
+    source = _source(rate_limit=1.0, burst=1, is_critical=True)
+
+    with controller.admit(_source()):
+        # Only the reserved slot is left, which a claimed name does not get
+        with pytest.raises(RateLimited) as excinfo:
+            with controller.admit(source, claimed=True):
+                pass
+        assert excinfo.value.status_code == 503
+
+    with controller.admit(source, claimed=True):
+        pass
+    # The claim used its own bucket, the source's is still full
+    with controller.admit(source):
+        pass
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from services.cluster_service import ClusterIndex
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def join(self, *args):
+        return self
+
+    def all(self):
+        return list(self.rows)
+
+class FakeSession:
+    """
+    Answers the position query with fixed rows
+    """
+    def __init__(self, rows):
+        self.rows = rows
+
+    def query(self, *columns):
+        return FakeQuery(self.rows)
+
+def _rows(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    return [
+        (f"object-{i}", rng.uniform(-80.0, 80.0), rng.uniform(-179.0, 179.0), rng.choice(["vessel", "buoy", None]))
+        for i in range(count)
+    ]
+
+def _by_cell(clusters):
+    return {
+        (round(cluster["latitude"], 9), round(cluster["longitude"], 9)): (cluster["count"], cluster["types"])
+        for cluster in clusters
+    }
+
+def _expected(positions, zoom):
+    # The same clusters built one object at a time
+    index = ClusterIndex(resync_seconds=300)
+    index._reload(FakeSession([]))
+    for object_id, (latitude, longitude, obj_type) in positions.items():
+        index.update(object_id, obj_type, latitude, longitude)
+    return _by_cell(index.get_clusters(None, zoom, (-180.0, -90.0, 180.0, 90.0)))
+
+@pytest.mark.parametrize("zoom", [0, 3, 8])
+def test_aggregated_grid_matches_objects(zoom):
+    rows = _rows(2000)
+    index = ClusterIndex(resync_seconds=300)
+
+    clusters = index.get_clusters(FakeSession(rows), zoom, (-180.0, -90.0, 180.0, 90.0))
+
+    positions = {obj_id: (lat, lon, obj_type) for obj_id, lat, lon, obj_type in rows}
+    assert sum(cluster["count"] for cluster in clusters) == len(rows)
+    assert _by_cell(clusters) == _expected(positions, zoom)
+
+def test_grid_built_after_moves_includes_them():
+    rows = _rows(500)
+    index = ClusterIndex(resync_seconds=300)
+    db = FakeSession(rows)
+    index.get_clusters(db, 2, (-180.0, -90.0, 180.0, 90.0))
+
+    # Moved before zoom 5 is built, and a new object
+    index.update("object-0", "vessel", 10.0, 20.0)
+    index.update("object-0", "vessel", 11.0, 21.0)
+    index.update("object-new", "buoy", -5.0, -6.0)
+    clusters = index.get_clusters(db, 5, (-180.0, -90.0, 180.0, 90.0))
+
+    positions = {obj_id: (lat, lon, obj_type) for obj_id, lat, lon, obj_type in rows}
+    positions["object-0"] = (11.0, 21.0, "vessel")
+    positions["object-new"] = (-5.0, -6.0, "buoy")
+    assert sum(cluster["count"] for cluster in clusters) == len(rows) + 1
+    assert _by_cell(clusters) == _expected(positions, 5)
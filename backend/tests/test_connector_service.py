@@ -0,0 +1,43 @@
+import asyncio
+import os
+
+from services import connector_service
+from services.connector_service import FileTailConnector
+
+def _collect(connector: FileTailConnector, count: int):
+    async def run():
+        items = []
+        async for item in connector.stream():
+            items.append(item)
+            if len(items) == count:
+                return items
+    return asyncio.run(asyncio.wait_for(run(), 5))
+
+def _connector(tmp_path, monkeypatch) -> FileTailConnector:
+    monkeypatch.setattr(connector_service.settings, "CONNECTOR_FILE_ROOT", str(tmp_path))
+    return FileTailConnector("source-1", {"path": "feed.jsonl", "poll_seconds": 0.01}, asyncio.Queue(), 1)
+
+def test_rotated_file_is_read_from_the_start(tmp_path, monkeypatch):
+    feed = tmp_path / "feed.jsonl"
+    feed.write_text('{"n": 0}\n')
+    connector = _connector(tmp_path, monkeypatch)
+    connector.info["from_start"] = True
+    assert _collect(connector, 1) == [{"n": 0}]
+
+    # Rotated: the old file moves away and a new one, longer than the offset read so far, takes its place
+    os.rename(feed, tmp_path / "feed.jsonl.1")
+    feed.write_text('{"n": 1}\n{"n": 2}\n')
+
+    assert _collect(connector, 2) == [{"n": 1}, {"n": 2}]
+
+def test_appended_lines_follow_the_offset(tmp_path, monkeypatch):
+    feed = tmp_path / "feed.jsonl"
+    feed.write_text('{"n": 0}\n')
+    connector = _connector(tmp_path, monkeypatch)
+    connector.info["from_start"] = True
+    assert _collect(connector, 1) == [{"n": 0}]
+
+    with open(feed, "a") as f:
+        f.write('{"n": 1}\n')
+
+    assert _collect(connector, 1) == [{"n": 1}]
@@ -0,0 +1,53 @@
+from services.geofence_service import GeofenceIndex, normalize_rings, polygon_bounds
+
+SQUARE = normalize_rings([[[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0], [0.0, 0.0]]])
+
+class FakeSession:
+    """
+    Answers the membership lookup with the rows currently stored
+    """
+    def __init__(self, memberships):
+        self.memberships = memberships
+
+    def query(self, *columns):
+        return self
+
+    def filter(self, *criteria):
+        return self
+
+    def all(self):
+        return list(self.memberships)
+
+def _index(monkeypatch):
+    index = GeofenceIndex(cell_degrees=0.5, max_cells_per_fence=100, resync_seconds=300)
+
+    def load(db):
+        index._fences = {"fence": (polygon_bounds(SQUARE), SQUARE)}
+        index._cells = {(x, y): ["fence"] for x in range(358, 364) for y in range(178, 184)}
+        index._large = []
+        index._loaded_at = float("inf")
+
+    monkeypatch.setattr(index, "_load", load)
+    return index
+
+def _state(latitude, longitude):
+    return {"tracked_object_id": "object", "latitude": latitude, "longitude": longitude}
+
+def test_enter_is_proposed_for_objects_not_stored_inside(monkeypatch):
+    index = _index(monkeypatch)
+
+    events = index.transitions(FakeSession([]), [_state(0.5, 0.5)])
+
+    assert [(event, fence_id) for event, fence_id, _ in events] == [("enter", "fence")]
+
+def test_exit_after_enter_recorded_by_another_worker(monkeypatch):
+    index = _index(monkeypatch)
+    # The enter was recorded by another worker, this one has never seen the object
+    events = index.transitions(FakeSession([("fence", "object")]), [_state(5.0, 5.0)])
+
+    assert [(event, fence_id) for event, fence_id, _ in events] == [("exit", "fence")]
+
+def test_no_event_when_stored_membership_matches(monkeypatch):
+    index = _index(monkeypatch)
+
+    assert index.transitions(FakeSession([("fence", "object")]), [_state(0.5, 0.5)]) == []
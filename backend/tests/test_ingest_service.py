@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from core.geo import haversine
+from services.ingest_service import fold_readings
+
+START = datetime(2026, 1, 1, 12, 0, 0)
+
+def _reading(seconds: float, latitude: float, longitude: float):
+    return {"timestamp": START + timedelta(seconds=seconds), "latitude": latitude, "longitude": longitude, "altitude": None}
+
+def _stored(seconds: float, latitude: float, longitude: float, distance_total: float = 0.0):
+    return {
+        "latitude": latitude, "longitude": longitude, "altitude": None, "timestamp": START + timedelta(seconds=seconds),
+        "speed": None, "heading": None, "distance_total": distance_total, "dwell_seconds": 0.0,
+    }
+
+def test_every_reading_of_a_batch_adds_its_step():
+    readings = [_reading(10, 0.0, 0.001), _reading(20, 0.0, 0.002), _reading(30, 0.001, 0.002)]
+
+    state, applied = fold_readings(_stored(0, 0.0, 0.0, distance_total=5.0), readings)
+
+    step = haversine(0.0, 0.0, 0.0, 0.001)
+    assert applied is readings[-1]
+    assert state["distance_total"] == pytest.approx(5.0 + 2 * step + haversine(0.0, 0.002, 0.001, 0.002))
+    assert state["heading"] == pytest.approx(0.0, abs=1e-6)  # Last step went north
+    assert state["speed"] == pytest.approx(haversine(0.0, 0.002, 0.001, 0.002) / 10)
+    assert state["timestamp"] == readings[-1]["timestamp"]
+
+def test_first_readings_start_a_state():
+    readings = [_reading(0, 1.0, 1.0), _reading(60, 1.0, 1.0)]
+
+    state, _ = fold_readings(None, readings)
+
+    assert state["distance_total"] == 0.0
+    assert state["speed"] == 0.0
+    assert state["dwell_seconds"] == 60.0
+
+def test_readings_older_than_the_state_are_skipped():
+    state, applied = fold_readings(_stored(100, 0.0, 0.0), [_reading(50, 0.0, 0.001)])
+
+    assert (state, applied) == (None, None)
+
+def test_implausible_reading_is_skipped_but_later_ones_apply():
+    readings = [_reading(10, 10.0, 10.0), _reading(20, 0.0, 0.0001)]
+
+    state, applied = fold_readings(_stored(0, 0.0, 0.0), readings)
+
+    assert applied is readings[1]
+    assert state["distance_total"] == pytest.approx(haversine(0.0, 0.0, 0.0, 0.0001))
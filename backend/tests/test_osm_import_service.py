@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+from uuid import uuid4
+import gc
+import tracemalloc
+
+from services.osm_import_service import OSMImportService, TagRule
+from services.proximity_service import proximity_detector
+from services.track_service import track_estimator
+
+class FakeSession:
+    """
+    Answers the importer's multi-row upserts as if every row was written,
+    with no object states stored before
+    """
+    def query(self, *columns):
+        return self
+
+    def filter(self, *criteria):
+        return self
+
+    def order_by(self, *columns):
+        return self
+
+    def with_for_update(self):
+        return self
+
+    def all(self):
+        return []
+
+    def execute(self, stmt, params=None):
+        rows = [{column.name: value for column, value in row.items()} for row in stmt._multi_values[0]]
+        table = stmt.table.name
+        if table == "tracked_objects":
+            return [SimpleNamespace(id=row["id"], object_id=row["object_id"], type=row["type"]) for row in rows]
+        if table == "sensor_data":
+            return [SimpleNamespace(id=row["id"]) for row in rows]
+        if table == "object_states":
+            return [SimpleNamespace(tracked_object_id=row["tracked_object_id"]) for row in rows]
+        return []
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+def _nodes(start: int, count: int):
+    for i in range(start, start + count):
+        yield {
+            "osm_id": str(i),
+            "type": "node",
+            "tags": {"seamark:type": "buoy", "name": f"Buoy {i}"},
+            "latitude": (i % 1000) / 100.0,
+            "longitude": (i // 1000) / 100.0,
+        }
+
+def _import(batches: int, batch_size: int, start: int = 0):
+    importer = OSMImportService(FakeSession(), str(uuid4()), [TagRule("seamark:type")], object_type="buoy", batch_size=batch_size)
+    return importer.run(_nodes(start, batches * batch_size))
+
+def test_import_leaves_live_state_untouched():
+    pending, tracks = len(proximity_detector._pending), len(track_estimator._slots)
+
+    stats = _import(batches=3, batch_size=100)
+
+    assert stats["imported"] == 300
+    assert len(proximity_detector._pending) == pending
+    assert len(track_estimator._slots) == tracks
+
+def test_import_memory_stays_flat_over_batches():
+    batch_size = 200
+    _import(batches=2, batch_size=batch_size)  # Warm up imports and caches
+
+    def measure(batches: int, start: int) -> int:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            _import(batches=batches, batch_size=batch_size, start=start)
+            gc.collect()
+            return tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+    few = measure(2, 10_000)
+    many = measure(12, 100_000)
+    # Six times the elements keep no more than a few batches' worth of memory behind
+    assert many - few < 256 * 1024
@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta
+import pytest
+
+from services.proximity_service import ProximityDetector, velocity_from, METERS_PER_DEGREE
+
+T0 = datetime(2024, 1, 1, 12, 0, 0)
+
+def _detector(**kwargs):
+    params = dict(threshold_meters=500.0, horizon_seconds=300.0, cell_meters=5000.0,
+                  stale_seconds=120.0, cooldown_seconds=60.0, object_types=set())
+    params.update(kwargs)
+    return ProximityDetector(**params)
+
+def _state(object_id, east=0.0, north=0.0, speed=0.0, heading=0.0, timestamp=T0):
+    # Positions are given in metres from (0, 0), where a degree of longitude is METERS_PER_DEGREE
+    return {
+        "tracked_object_id": object_id,
+        "object_id": object_id,
+        "type": "vessel",
+        "latitude": north / METERS_PER_DEGREE,
+        "longitude": east / METERS_PER_DEGREE,
+        "timestamp": timestamp,
+        "additional_data": {"speed": speed, "heading": heading},
+    }
+
+def test_velocity_from_speed_and_heading():
+    assert velocity_from({"speed": 10, "heading": 90}) == pytest.approx((10.0, 0.0), abs=1e-9)
+    assert velocity_from({"speed": 10, "heading": 180}) == pytest.approx((0.0, -10.0), abs=1e-9)
+    assert velocity_from({"speed": "fast"}) == (0.0, 0.0)
+    assert velocity_from(None) == (0.0, 0.0)
+
+def test_head_on_pass_reports_cpa_and_tcpa():
+    detector = _detector()
+    detector.submit([
+        _state("a", east=0.0, north=0.0, speed=10.0, heading=90.0),
+        _state("b", east=1000.0, north=100.0, speed=10.0, heading=270.0),
+    ])
+
+    alerts = detector.process()
+
+    # Closing at 20 m/s over 1000 m, passing 100 m apart after 50 s; one alert per pair
+    assert len(alerts) == 1
+    alert = alerts[0]
+    assert alert["object_ids"] == ["a", "b"]
+    assert alert["tcpa_seconds"] == pytest.approx(50.0, rel=1e-6)
+    assert alert["cpa_distance"] == pytest.approx(100.0, rel=1e-6)
+    assert alert["distance"] == pytest.approx((1000.0 ** 2 + 100.0 ** 2) ** 0.5, rel=1e-6)
+    assert alert["cpa_time"] == T0 + timedelta(seconds=50)
+
+def test_diverging_objects_use_current_distance():
+    detector = _detector()
+    detector.submit([
+        _state("a", east=0.0, speed=10.0, heading=270.0),
+        _state("b", east=600.0, speed=10.0, heading=90.0),
+    ])
+
+    # Closest approach is now, 600 m apart, beyond the 500 m threshold
+    assert detector.process() == []
+
+def test_stationary_objects_within_threshold():
+    detector = _detector()
+    detector.submit([_state("a"), _state("b", north=300.0)])
+
+    alerts = detector.process()
+
+    assert len(alerts) == 1
+    assert alerts[0]["tcpa_seconds"] == 0.0
+    assert alerts[0]["cpa_distance"] == pytest.approx(300.0, rel=1e-6)
+
+def test_closest_approach_is_limited_to_the_horizon():
+    detector = _detector(horizon_seconds=30.0)
+    detector.submit([
+        _state("a", speed=10.0, heading=90.0),
+        _state("b", east=1000.0, speed=10.0, heading=270.0),
+    ])
+
+    # The closest approach lies beyond the 30 s horizon, where they are still 400 m apart
+    alerts = detector.process()
+    assert len(alerts) == 1
+    assert alerts[0]["tcpa_seconds"] == pytest.approx(30.0)
+    assert alerts[0]["cpa_distance"] == pytest.approx(400.0, rel=1e-6)
+
+    detector = _detector(horizon_seconds=20.0)
+    detector.submit([
+        _state("a", speed=10.0, heading=90.0),
+        _state("b", east=1000.0, speed=10.0, heading=270.0),
+    ])
+    assert detector.process() == []
+
+def test_older_reading_is_moved_to_the_update_time():
+    detector = _detector()
+    # b was 1000 m east 30 s ago, heading west at 10 m/s: now 700 m east
+    detector.submit([_state("b", east=1000.0, speed=10.0, heading=270.0, timestamp=T0 - timedelta(seconds=30))])
+    detector.process()
+    detector.submit([_state("a")])
+
+    alerts = detector.process()
+
+    assert len(alerts) == 1
+    assert alerts[0]["distance"] == pytest.approx(700.0, rel=1e-6)
+    assert alerts[0]["tcpa_seconds"] == pytest.approx(70.0, rel=1e-6)
+    assert alerts[0]["cpa_distance"] == pytest.approx(0.0, abs=1e-6)
+
+def test_stale_readings_and_cooldown():
+    detector = _detector(stale_seconds=10.0)
+    detector.submit([_state("b", north=100.0, timestamp=T0 - timedelta(seconds=60))])
+    detector.process()
+    detector.submit([_state("a")])
+    assert detector.process() == []
+
+    detector = _detector()
+    detector.submit([_state("a"), _state("b", north=100.0)])
+    assert len(detector.process()) == 1
+    detector.submit([_state("a"), _state("b", north=100.0)])
+    assert detector.process() == []
+
+def test_objects_without_readings_are_dropped():
+    detector = _detector(stale_seconds=10.0)
+    detector.submit([_state("a"), _state("b", east=20000.0)])
+    detector.process()
+
+    detector._compacted_at -= 10.0
+    detector.submit([_state("a", timestamp=T0 + timedelta(seconds=30))])
+    detector.process()
+
+    assert detector._ids == ["a"]
+    assert detector._slots == {"a": 0}
+    assert sum(len(slots) for slots in detector._cells.values()) == 1
+
+class FakeRow(dict):
+    __getattr__ = dict.get
+
+class FakeSession:
+    """
+    Answers the object_states pull with fixed rows
+    """
+    def __init__(self, rows):
+        self.rows = rows
+
+    def query(self, *columns):
+        return self
+
+    def join(self, *args):
+        return self
+
+    def filter(self, *criteria):
+        return self
+
+    def __iter__(self):
+        return iter(self.rows)
+
+def test_synced_positions_use_stored_velocity_and_are_checked_once():
+    detector = _detector()
+    detector.submit([_state("a", east=0.0, north=0.0, speed=10.0, heading=90.0)])
+    # b was stored by another worker, heading west at 10 m/s
+    row = FakeRow(tracked_object_id="b", object_id="b", type="vessel", latitude=100.0 / METERS_PER_DEGREE,
+                  longitude=1000.0 / METERS_PER_DEGREE, timestamp=T0, speed=10.0, heading=270.0, updated_at=T0)
+    detector.sync(FakeSession([row]))
+
+    alerts = detector.process()
+
+    assert len(alerts) == 1
+    assert alerts[0]["tcpa_seconds"] == pytest.approx(50.0, rel=1e-6)
+    assert alerts[0]["cpa_distance"] == pytest.approx(100.0, rel=1e-6)
+    assert detector._synced_until == T0
+
+    # Pulled again within the overlap, b is unchanged and not checked again
+    detector._alerted.clear()
+    detector.sync(FakeSession([row]))
+    assert detector.process() == []
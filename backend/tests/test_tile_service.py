@@ -0,0 +1,78 @@
+from services.tile_service import _LayerBuilder, _encode_value, _varint, _zigzag, TileCache
+
+def test_varint():
+    assert _varint(0) == b"\x00"
+    assert _varint(1) == b"\x01"
+    assert _varint(127) == b"\x7f"
+    assert _varint(128) == b"\x80\x01"
+    assert _varint(300) == b"\xac\x02"
+    assert _varint(4096) == b"\x80\x20"
+
+def test_zigzag():
+    assert [_zigzag(v) for v in (0, -1, 1, -2, 2)] == [0, 1, 2, 3, 4]
+    assert _zigzag(-2048) == 4095
+
+def test_encode_value():
+    assert _encode_value("ship") == b"\x0a\x04ship"
+    assert _encode_value(3) == b"\x28\x03"
+    assert _encode_value(-3) == b"\x30\x05"
+    assert _encode_value(True) == b"\x38\x01"
+    assert _encode_value(0.5) == b"\x19\x00\x00\x00\x00\x00\x00\xe0\x3f"
+
+def test_layer_with_one_point():
+    layer = _LayerBuilder("objects")
+    layer.add_point(1, 2, {"type": "ship", "name": None})
+
+    feature = (
+        b"\x12\x02\x00\x00"  # tags: key 0, value 0 (None values are skipped)
+        b"\x18\x01"  # geometry type POINT
+        b"\x22\x03\x09\x02\x04"  # MoveTo(1), zigzag(1), zigzag(2)
+    )
+    body = (
+        b"\x78\x02"  # version 2
+        b"\x0a\x07objects"
+        + b"\x12" + bytes([len(feature)]) + feature
+        + b"\x1a\x04type"
+        + b"\x22\x06\x0a\x04ship"
+        + b"\x28\x80\x20"  # extent 4096
+    )
+    assert layer.encode() == b"\x1a" + bytes([len(body)]) + body
+
+def test_layer_shares_keys_and_values():
+    layer = _LayerBuilder("objects")
+    layer.add_point(0, 0, {"type": "ship"})
+    layer.add_point(0, 0, {"type": "ship", "count": 2})
+    layer.add_point(0, 0, {"type": 2})
+
+    assert list(layer.keys) == ["type", "count"]
+    # Equal values of different types are separate entries
+    assert list(layer.values) == [(str, "ship"), (int, 2)]
+    assert layer.features[1] == b"\x12\x0d\x12\x04\x00\x00\x01\x01\x18\x01\x22\x03\x09\x00\x00"
+    assert layer.features[2] == layer.features[0].replace(b"\x00\x00\x18", b"\x00\x01\x18")
+
+def test_tile_cache_drops_tiles_of_moved_objects():
+    cache = TileCache(max_size=10, ttl_seconds=60)
+    cache.put((3, 4, 2, None, None), b"a", ["ship-1", "ship-2"])
+    cache.put((3, 0, 0, None, None), b"b", ["ship-3"])
+
+    cache.object_moved("ship-1", 0.0, 0.0)
+
+    assert cache.get((3, 4, 2, None, None)) is None
+    assert cache.get((3, 0, 0, None, None)) == b"b"
+    assert "ship-2" not in cache._keys_by_object
+
+def test_tile_cache_drops_tiles_an_object_moves_into():
+    cache = TileCache(max_size=10, ttl_seconds=60)
+    cache.put((0, 0, 0, None, None), b"world", [])
+
+    cache.object_moved("ship-1", 10.0, 10.0)
+
+    assert cache.get((0, 0, 0, None, None)) is None
+
+def test_tile_cache_index_shrinks_with_evictions():
+    cache = TileCache(max_size=2, ttl_seconds=60)
+    for i in range(5):
+        cache.put((10, i, 0, None, None), b"", [f"obj-{i}"])
+
+    assert len(cache._tiles) == 2
+    assert set(cache._keys_by_object) == {"obj-3", "obj-4"}
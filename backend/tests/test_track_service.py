@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+import math
+import pytest
+
+from services.track_service import TrackEstimator, METERS_PER_DEGREE, APPLIED, STALE, OUTLIER, RESTARTED
+
+T0 = datetime(2024, 1, 1, 12, 0, 0)
+
+def _estimator(**kwargs):
+    params = dict(measurement_sigma=10.0, acceleration_sigma=1.0, outlier_chi2=9.21, max_outliers=3)
+    params.update(kwargs)
+    return TrackEstimator(**params)
+
+def _east(meters: float) -> float:
+    # Longitude of a point this far east of (0, 0)
+    return meters / METERS_PER_DEGREE
+
+def test_first_reading_starts_the_track():
+    estimator = _estimator()
+
+    assert estimator.update("a", 0.0, 0.0, T0) == (APPLIED, 0.0)
+    assert "a" in estimator
+
+    prediction = estimator.predict("a", T0)
+    assert prediction["latitude"] == 0.0
+    assert prediction["longitude"] == 0.0
+    assert prediction["speed"] == 0.0
+    assert prediction["last_update"] == T0
+    # Only the measurement variance on each axis
+    assert prediction["position_error"] == pytest.approx(math.sqrt(2 * 10.0 ** 2))
+
+def test_simultaneous_readings_are_averaged():
+    estimator = _estimator()
+    estimator.update("a", 0.0, 0.0, T0)
+
+    # Equal variances give a gain of 0.5; innovation 10 m over S = 2 * 100
+    outcome, distance = estimator.update("a", 0.0, _east(10.0), T0)
+
+    assert outcome == APPLIED
+    assert distance == pytest.approx(0.5)
+    prediction = estimator.predict("a", T0)
+    assert prediction["longitude"] == pytest.approx(_east(5.0))
+    assert prediction["latitude"] == pytest.approx(0.0)
+    assert prediction["position_error"] == pytest.approx(math.sqrt(2 * 50.0))
+
+def test_precise_sensor_pulls_harder():
+    estimator = _estimator()
+    estimator.update("a", 0.0, 0.0, T0)
+
+    # Track variance 100, measurement variance 1: gain 100 / 101
+    estimator.update("a", 0.0, _east(1.0), T0, measurement_sigma=1.0)
+
+    assert estimator.predict("a", T0)["longitude"] == pytest.approx(_east(100.0 / 101.0))
+
+def test_reported_motion_is_extrapolated():
+    estimator = _estimator()
+    estimator.update("a", 0.0, 0.0, T0, additional_data={"speed": 10.0, "heading": 90.0})
+
+    prediction = estimator.predict("a", T0 + timedelta(seconds=10))
+
+    assert prediction["longitude"] == pytest.approx(_east(100.0))
+    assert prediction["latitude"] == pytest.approx(0.0, abs=1e-12)
+    assert prediction["speed"] == pytest.approx(10.0)
+    assert prediction["heading"] == pytest.approx(90.0)
+    # Per axis: PP + dt^2 * VV + q * dt^3 / 3 with PP = VV = 100, q = 1, dt = 10
+    assert prediction["position_error"] == pytest.approx(math.sqrt(2 * (100.0 + 100.0 * 100.0 + 1000.0 / 3.0)))
+
+def test_older_readings_are_stale():
+    estimator = _estimator()
+    estimator.update("a", 0.0, 0.0, T0)
+
+    assert estimator.update("a", 0.0, _east(1.0), T0 - timedelta(seconds=1)) == (STALE, 0.0)
+    assert estimator.predict("a", T0)["longitude"] == 0.0
+
+def test_gate_rejects_then_restarts():
+    estimator = _estimator()
+    estimator.update("a", 0.0, 0.0, T0)
+
+    # 100 m away with S = 200 per axis: squared distance 50, outside the 9.21 gate
+    outcome, distance = estimator.update("a", 0.0, _east(100.0), T0)
+    assert outcome == OUTLIER
+    assert distance == pytest.approx(50.0)
+    assert estimator.predict("a", T0)["longitude"] == 0.0
+
+    assert estimator.update("a", 0.0, _east(100.0), T0)[0] == OUTLIER
+    # The third consecutive outlier restarts the track at the reading
+    assert estimator.update("a", 0.0, _east(100.0), T0)[0] == RESTARTED
+    assert estimator.predict("a", T0)["longitude"] == pytest.approx(_east(100.0))
+
+def test_applied_reading_resets_the_outlier_count():
+    estimator = _estimator(max_outliers=2)
+    estimator.update("a", 0.0, 0.0, T0)
+
+    assert estimator.update("a", 0.0, _east(100.0), T0)[0] == OUTLIER
+    assert estimator.update("a", 0.0, _east(1.0), T0)[0] == APPLIED
+    assert estimator.update("a", 0.0, _east(100.0), T0)[0] == OUTLIER
+
+def test_max_tracks_reuses_least_recently_updated_slot():
+    estimator = _estimator(max_tracks=2)
+    estimator.update("a", 0.0, 0.0, T0)
+    estimator.update("b", 0.0, 0.0, T0)
+    estimator.update("a", 0.0, 0.0, T0 + timedelta(seconds=1))  # "b" is now the least recently updated
+
+    estimator.update("c", 1.0, 1.0, T0)
+
+    assert len(estimator) == 2
+    assert "b" not in estimator
+    assert len(estimator._data) == 2 * 14
+    assert estimator.predict("c", T0)["latitude"] == 1.0
+    assert estimator.predict("a", T0 + timedelta(seconds=1))["latitude"] == pytest.approx(0.0)
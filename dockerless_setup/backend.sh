@@ -121,7 +121,7 @@ start_backend() {
 
     # Start server with hot reload
     echo -e "${YELLOW}Starting in development mode with hot reload...${NC}"
-    uvicorn main:app --host 0.0.0.0 --port 8000 --reload 2>&1 | tee "$LOG_FILE" &
+    uvicorn main:app --host 0.0.0.0 --port 8000 --ws-ping-interval "${WS_PING_INTERVAL_SECONDS:-20}" --ws-ping-timeout "${WS_PING_TIMEOUT_SECONDS:-20}" --reload 2>&1 | tee "$LOG_FILE" &
 
     # Store PID
     echo $! > backend.pid
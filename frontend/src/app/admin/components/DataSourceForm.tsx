@@ -81,7 +81,7 @@ const DataSourceForm: React.FC<DataSourceFormProps> = ({
         await api.dataSources.updateSource(dataSource.id, {
           name: formData.name,
           description: formData.description || undefined,
-          type: formData.type as 'websocket' | 'rest',
+          type: formData.type as 'websocket' | 'rest' | 'file-tail',
           connection_info: parsedConnectionInfo,
           is_active: formData.is_active
         });
@@ -90,7 +90,7 @@ const DataSourceForm: React.FC<DataSourceFormProps> = ({
         await api.dataSources.createSource({
           name: formData.name,
           description: formData.description || undefined,
-          type: formData.type as 'websocket' | 'rest',
+          type: formData.type as 'websocket' | 'rest' | 'file-tail',
           connection_info: parsedConnectionInfo,
           is_active: formData.is_active
         });
@@ -163,6 +163,7 @@ const DataSourceForm: React.FC<DataSourceFormProps> = ({
             >
               <option value="websocket">WebSocket</option>
               <option value="rest">REST API</option>
+              <option value="file-tail">File (JSON lines)</option>
             </select>
           </div>
           
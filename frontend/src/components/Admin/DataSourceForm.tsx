@@ -16,7 +16,7 @@ export const DataSourceForm: React.FC<DataSourceFormProps> = ({
 }) => {
   const [name, setName] = useState(initialData?.name || '');
   const [description, setDescription] = useState(initialData?.description || '');
-  const [type, setType] = useState<'websocket' | 'rest'>(initialData?.type || 'websocket');
+  const [type, setType] = useState<'websocket' | 'rest' | 'file-tail'>(initialData?.type || 'websocket');
   const [connectionInfo, setConnectionInfo] = useState<string>(
     initialData ? JSON.stringify(initialData.connection_info, null, 2) : JSON.stringify({ url: '' }, null, 2)
   );
@@ -112,12 +112,13 @@ export const DataSourceForm: React.FC<DataSourceFormProps> = ({
             <select
               id="type"
               value={type}
-              onChange={(e) => setType(e.target.value as 'websocket' | 'rest')}
+              onChange={(e) => setType(e.target.value as 'websocket' | 'rest' | 'file-tail')}
               className="w-full rounded-md border border-gray-300 py-2 px-3 focus:outline-none focus:ring-1 focus:ring-primary focus:border-primary"
               required
             >
               <option value="websocket">WebSocket</option>
               <option value="rest">REST API</option>
+              <option value="file-tail">File (JSON lines)</option>
             </select>
           </div>
           
@@ -18,6 +18,18 @@ export interface TrackedObject {
   created_at: string;
   updated_at: string;
   custom_type?: CustomObjectType;  // Optional associated styling
+  state?: ObjectState;  // Current position, returned for single objects
+}
+
+export interface ObjectState {
+  latitude: number;
+  longitude: number;
+  altitude?: number;
+  timestamp?: string;
+  speed?: number;  // m/s
+  heading?: number;  // Degrees clockwise from north
+  distance_total: number;  // Metres travelled
+  dwell_seconds: number;
 }
 
 export interface SensorData {
@@ -62,27 +74,39 @@ export interface DataSource {
   id: string;
   name: string;
   description?: string;
-  type: 'websocket' | 'rest';
+  type: 'websocket' | 'rest' | 'file-tail';
   connection_info: Record<string, any>;
   is_active: boolean;
   created_at: string;
   updated_at: string;
+  rate_limit: number | null;  // Readings per second
+  rate_limit_burst: number | null;
+  sensor_rate_limit: number | null;  // Readings per second per sensor
+  is_critical: boolean;
 }
 
 export interface DataSourceCreate {
   name: string;
   description?: string;
-  type: 'websocket' | 'rest';
+  type: 'websocket' | 'rest' | 'file-tail';
   connection_info: Record<string, any>;
   is_active?: boolean;
+  rate_limit?: number | null;  // Readings per second
+  rate_limit_burst?: number | null;
+  sensor_rate_limit?: number | null;  // Readings per second per sensor
+  is_critical?: boolean;
 }
 
 export interface DataSourceUpdate {
   name?: string;
   description?: string;
-  type?: 'websocket' | 'rest';
+  type?: 'websocket' | 'rest' | 'file-tail';
   connection_info?: Record<string, any>;
   is_active?: boolean;
+  rate_limit?: number | null;  // Readings per second
+  rate_limit_burst?: number | null;
+  sensor_rate_limit?: number | null;  // Readings per second per sensor
+  is_critical?: boolean;
 }
 
 export interface DataValidationLog {